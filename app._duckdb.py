@@ -1,12 +1,20 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
+import hashlib
 import json
-import duckdb
 import os
-from pathlib import Path
 from dotenv import load_dotenv
 
+from datalk.config import resolver_duckdb
+from datalk.pipeline import (
+    CHART_AGGREGATIONS,
+    CHART_TYPES,
+    FILTER_OPERATORS,
+    NUMERIC_TYPE_PREFIXES,
+    TEMPORAL_TYPE_PREFIXES,
+    DuckDBPipeline,
+    validate_identifier,
+)
+
 # ========= Configuração do Ambiente =========
 load_dotenv()
 DUCKDB_PATH = os.getenv("DUCKDB_PATH")
@@ -14,165 +22,57 @@ if DUCKDB_PATH is None:
     st.error("DUCKDB_PATH não está definido no arquivo .env")
     st.stop()
 
-full_duckdb_path = Path('D:/Projetos/Data_Lk/data') / DUCKDB_PATH
-full_duckdb_path = full_duckdb_path.resolve()
-
-# ========= Pipeline do DuckDB =========
-class DuckDBPipeline:
-    def __init__(self, db_path: str):
-        self.conn = duckdb.connect(db_path)
-        self.create_metadata_table()
-
-    def create_metadata_table(self):
-        """Cria a tabela de metadados usando table_name como PRIMARY KEY."""
-        self.conn.execute("""
-            CREATE TABLE IF NOT EXISTS table_metadata (
-                table_name VARCHAR PRIMARY KEY,
-                schema_json VARCHAR,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            );
-        """)
-
-    def create_table_dynamic(self, table_name: str, fields: list):
-        """Cria tabelas dinamicamente com base em um schema fornecido."""
-        existing = self.conn.execute(
-            "SELECT table_name FROM table_metadata WHERE table_name = ?;",
-            (table_name,)
-        ).fetchone()
-        if existing:
-            raise ValueError(f"A tabela '{table_name}' já existe na pipeline.")
-
-        column_defs = []
-        schema_for_metadata = {}
-
-        for field in fields:
-            col_name = field.get("name")
-            if not col_name:
-                raise ValueError("Cada campo deve ter um 'name' definido.")
-           
-            data_type = field.get("data_type", "").strip() or "VARCHAR"
-            col_def = f"{col_name} {data_type}"
-            schema_for_metadata[col_name] = {"data_type": data_type}
-
-            if field.get("primary_key", False):
-                col_def += " PRIMARY KEY"
-                schema_for_metadata[col_name]["primary_key"] = True
-            else:
-                schema_for_metadata[col_name]["primary_key"] = False
-
-            fk = field.get("foreign_key")
-            if fk:
-                fk_table, fk_column = fk.get("table"), fk.get("column")
-                if fk_table and fk_column:
-                    col_def += f" REFERENCES {fk_table}({fk_column})"
-                    schema_for_metadata[col_name]["foreign_key"] = {"table": fk_table, "column": fk_column}
-                else:
-                    raise ValueError(f"Definição de chave estrangeira para a coluna '{col_name}' está incompleta.")
-            else:
-                schema_for_metadata[col_name]["foreign_key"] = None
+full_duckdb_path = resolver_duckdb(DUCKDB_PATH)
+SAMPLE_SIZE = 5000
 
-            column_defs.append(col_def)
+# ========= Cache entre reruns =========
+# Uma única pipeline por processo; os resultados entram no cache com a versão da tabela na chave,
+# então qualquer escrita pela pipeline invalida as leituras antigas daquela tabela.
+@st.cache_resource
+def get_pipeline(db_path: str):
+    return DuckDBPipeline(db_path)
 
-        sql = f"CREATE TABLE {table_name} ({', '.join(column_defs)});"
-        self.conn.execute(sql)
-        self.conn.execute(
-            "INSERT INTO table_metadata (table_name, schema_json) VALUES (?, ?);",
-            (table_name, json.dumps(schema_for_metadata))
-        )
 
-    def insert_data(self, table_name: str, data: dict):
-        """Insere dados na tabela garantindo que a chave primária não seja duplicada.
-        Se o campo 'id' for chave primária e não for fornecido, ele será atribuído automaticamente."""
-        metadata = self.get_table_metadata(table_name)
-        primary_keys = [col for col, info in metadata.items() if info.get("primary_key")]
+@st.cache_data(max_entries=64, show_spinner=False)
+def cached_schema(_pipeline, table_name: str, version: int):
+    return _pipeline.get_table_schema(table_name)
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def cached_stats(_pipeline, table_name: str, version: int):
+    return _pipeline.get_table_stats(table_name)
+
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def cached_count(_pipeline, table_name: str, version: int, filters: tuple):
+    return _pipeline.count_rows(table_name, list(filters))
 
-        if primary_keys:
-            
-            if "id" in primary_keys and "id" not in data:
-                max_id = self.conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table_name};").fetchone()[0]
-                data["id"] = max_id + 1
-            else:
-                
-                for pk in primary_keys:
-                    if pk not in data:
-                        st.error(f"O valor para a chave primária '{pk}' não foi fornecido.")
-                        return
-
-            
-            pk_conditions = " AND ".join([f"{pk} = ?" for pk in primary_keys])
-            pk_values = tuple(data[pk] for pk in primary_keys)
-            exists = self.conn.execute(
-                f"SELECT 1 FROM {table_name} WHERE {pk_conditions} LIMIT 1;",
-                pk_values
-            ).fetchone()
-            if exists:
-                st.error(f"Erro: O registro com chave primária {primary_keys} = {pk_values} já existe.")
-                return
-
-        columns = ", ".join(data.keys())
-        placeholders = ", ".join(["?" for _ in data])
-        sql = f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders});"
-        self.conn.execute(sql, tuple(data.values()))
-        st.success("Dados inseridos com sucesso!")
-
-    def update_data(self, table_name: str, set_data: dict, where_clause: str, where_params: tuple):
-        set_str = ", ".join([f"{col} = ?" for col in set_data.keys()])
-        sql = f"UPDATE {table_name} SET {set_str} WHERE {where_clause};"
-        values = tuple(set_data.values()) + where_params
-        self.conn.execute(sql, values)
-
-    def delete_data(self, table_name: str, where_clause: str, where_params: tuple):
-        sql = f"DELETE FROM {table_name} WHERE {where_clause};"
-        self.conn.execute(sql, where_params)
-
-    def delete_table(self, table_name: str):
-        self.conn.execute(f"DROP TABLE IF EXISTS {table_name};")
-        self.conn.execute("DELETE FROM table_metadata WHERE table_name = ?;", (table_name,))
-
-    def alter_table_add_column(self, table_name: str, column_name: str, data_type: str):
-        self.conn.execute(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {data_type};")
-        metadata = self.get_table_metadata(table_name)
-        metadata[column_name] = {"data_type": data_type, "primary_key": False, "foreign_key": None}
-        self.update_metadata(table_name, metadata)
-
-    def alter_table_drop_column(self, table_name: str, column_name: str):
-        self.conn.execute(f"ALTER TABLE {table_name} DROP COLUMN {column_name};")
-        metadata = self.get_table_metadata(table_name)
-        metadata.pop(column_name, None)
-        self.update_metadata(table_name, metadata)
-
-    def get_table_metadata(self, table_name: str):
-        row = self.conn.execute(
-            "SELECT schema_json FROM table_metadata WHERE table_name = ?;",
-            (table_name,)
-        ).fetchone()
-        return json.loads(row[0]) if row else {}
-
-    def update_metadata(self, table_name: str, metadata: dict):
-        self.conn.execute(
-            "UPDATE table_metadata SET schema_json = ? WHERE table_name = ?;",
-            (json.dumps(metadata), table_name)
-        )
-
-    def list_tables(self):
-        rows = self.conn.execute("SELECT table_name FROM table_metadata;").fetchall()
-        return [r[0] for r in rows]
-
-    def get_table_data(self, table_name: str):
-        return self.conn.execute(f"SELECT * FROM {table_name};").fetchdf()
-
-    def close(self):
-        self.conn.close()
-
-
-pipeline = DuckDBPipeline(str(full_duckdb_path))
+
+@st.cache_data(max_entries=128, show_spinner=False)
+def cached_page(_pipeline, table_name: str, version: int, page_size: int, sort_column, descending: bool,
+                filters: tuple, after):
+    return _pipeline.get_table_page(table_name, page_size, sort_column, descending, list(filters), after)
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def cached_chart(_pipeline, table_name: str, version: int, chart_type: str, x: str, y, aggregation: str, bins: int):
+    return _pipeline.aggregate_for_chart(table_name, chart_type, x, y, aggregation, bins)
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def cached_sample(_pipeline, table_name: str, version: int, size: int, columns: tuple):
+    return _pipeline.sample_table(table_name, size, list(columns))
+
+
+pipeline = get_pipeline(str(full_duckdb_path))
+pipeline.sync_metadata_cache()
 
 # ========= Interface Streamlit =========
 st.title("Interface Dinâmica para Gerenciamento de Tabelas (DuckDB Pipeline)")
 
 # Menu lateral
 operation = st.sidebar.radio("Selecione a operação", 
-                             ("Criar Tabela", "Inserir Dados", "Atualizar Dados", "Deletar Dados", 
+                             ("Criar Tabela", "Inserir Dados", "Importar Arquivos", "Atualizar Dados", "Deletar Dados",
                               "Dropar Tabela", "Visualizar Tabela", "Listar Tabelas"))
 
 # ----- CRIAR TABELA -----
@@ -180,6 +80,7 @@ if operation == "Criar Tabela":
     st.header("Criar Tabela")
     create_mode = st.radio("Modo de Criação", ("Formulário Manual", "Colar JSON do Schema"))
     table_name = st.text_input("Nome da Tabela", key="create_table_name")
+    use_sequences = st.checkbox("Gerar chave primária inteira por sequência", value=True, key="create_use_sequences")
     
     if create_mode == "Formulário Manual":
         st.subheader("Defina os campos da tabela")
@@ -213,7 +114,7 @@ if operation == "Criar Tabela":
                     if field["foreign_key_table"] and field["foreign_key_column"]:
                         f["foreign_key"] = {"table": field["foreign_key_table"], "column": field["foreign_key_column"]}
                     fields.append(f)
-                pipeline.create_table_dynamic(table_name, fields)
+                pipeline.create_table_dynamic(table_name, fields, use_sequences=use_sequences)
                 st.success(f"Tabela '{table_name}' criada com sucesso!")
                 st.session_state.fields = []  # Limpa os campos
             except Exception as e:
@@ -225,7 +126,7 @@ if operation == "Criar Tabela":
         if st.button("Criar Tabela (JSON)"):
             try:
                 fields = json.loads(json_schema)
-                pipeline.create_table_dynamic(table_name, fields)
+                pipeline.create_table_dynamic(table_name, fields, use_sequences=use_sequences)
                 st.success(f"Tabela '{table_name}' criada com sucesso!")
             except Exception as e:
                 st.error(f"Erro: {e}")
@@ -246,7 +147,51 @@ elif operation == "Inserir Dados":
                 data[col] = st.text_input(f"Valor para '{col}'")
             submitted = st.form_submit_button("Inserir")
             if submitted:
-                pipeline.insert_data(table_name, data)
+                try:
+                    pipeline.insert_data(table_name, data)
+                    st.success("Dados inseridos com sucesso!")
+                except ValueError as e:
+                    st.error(str(e))
+
+# ----- IMPORTAR ARQUIVOS -----
+elif operation == "Importar Arquivos":
+    st.header("Importar Arquivos (CSV, JSON, Parquet)")
+    tables = pipeline.list_tables()
+    target = st.selectbox("Tabela de destino", ["(nova tabela)"] + tables, key="ingest_target")
+    table_name = st.text_input("Nome da nova tabela", key="ingest_new_table") if target == "(nova tabela)" else target
+    source = st.text_input("Arquivo, glob ou diretório no servidor (ex.: D:/dados/vendas/*.csv)", key="ingest_source")
+    uploads = st.file_uploader("Ou envie arquivos", type=["csv", "tsv", "txt", "json", "jsonl", "ndjson", "parquet"],
+                               accept_multiple_files=True, key="ingest_uploads")
+    json_schema = st.text_area("Schema JSON (opcional, lista de campos como no exemplo.json)", height=120,
+                               key="ingest_schema")
+    if st.button("Importar"):
+        try:
+            if uploads:
+                # Os envios ficam em data/uploads/<tabela>; o ledger pula os que já foram importados.
+                # O nome é validado antes de virar caminho ('../x' sairia da pasta de uploads)
+                upload_dir = full_duckdb_path.parent / "uploads" / validate_identifier(table_name)
+                upload_dir.mkdir(parents=True, exist_ok=True)
+                for upload in uploads:
+                    path = upload_dir / upload.name
+                    # Compara o conteúdo: um arquivo novo com o mesmo nome e tamanho substitui o antigo
+                    # (e o mtime novo faz o ledger importá-lo)
+                    content = upload.getvalue()
+                    if not path.is_file() or hashlib.sha256(path.read_bytes()).digest() != hashlib.sha256(content).digest():
+                        path.write_bytes(content)
+                source = str(upload_dir)
+            if not table_name or not source:
+                st.error("Informe a tabela e os arquivos.")
+            else:
+                fields = json.loads(json_schema) if json_schema.strip() else None
+                bar = st.progress(0.0)
+                result = pipeline.ingest_files(table_name, source, fields,
+                                               progress=lambda fraction, message: bar.progress(fraction, text=message))
+                st.success(f"{result['inserted']} linhas importadas em '{table_name}' "
+                           f"({len(result['files'])} arquivos, {len(result['skipped'])} já importados antes).")
+                if result["files"]:
+                    st.dataframe([{"arquivo": path, "linhas": rows} for path, rows in result["files"].items()])
+        except (ValueError, json.JSONDecodeError) as e:
+            st.error(str(e))
 
 # ----- ATUALIZAR DADOS -----
 elif operation == "Atualizar Dados":
@@ -274,6 +219,26 @@ elif operation == "Atualizar Dados":
                     pipeline.update_data(table_name, set_data, where_clause, (where_value,))
                     st.success("Dados atualizados com sucesso!")
 
+        st.subheader("Atualização em Lote (CSV)")
+        st.caption("Uma linha por registro: as colunas-chave identificam o registro e as demais recebem o novo valor (célula vazia vira NULL).")
+        primary_keys = [col for col, info in metadata.items() if info.get("primary_key")]
+        bulk_keys = st.multiselect("Colunas-chave", list(metadata.keys()), default=primary_keys, key="upd_bulk_keys")
+        bulk_file = st.file_uploader("Arquivo CSV com as correções", type=["csv"], key="upd_bulk_file")
+        if st.button("Aplicar Atualização em Lote", key="upd_bulk_submit"):
+            if bulk_file is None or not bulk_keys:
+                st.error("Envie o arquivo e escolha as colunas-chave.")
+            else:
+                try:
+                    import pandas as pd
+
+                    corrections = pd.read_csv(bulk_file, dtype=str)
+                    updated = pipeline.update_many(table_name, corrections, bulk_keys)
+                    st.success(f"{updated} de {len(corrections)} registros atualizados.")
+                    if updated < len(corrections):
+                        st.warning(f"{len(corrections) - updated} chaves do arquivo não foram encontradas na tabela.")
+                except Exception as e:
+                    st.error(f"Erro: {e}")
+
 # ----- DELETAR DADOS -----
 elif operation == "Deletar Dados":
     st.header("Deletar Dados")
@@ -293,6 +258,24 @@ elif operation == "Deletar Dados":
                     pipeline.delete_data(table_name, where_clause, (where_value,))
                     st.success("Dados deletados com sucesso!")
 
+        st.subheader("Deleção em Lote (CSV)")
+        st.caption("Todas as linhas cujas chaves aparecem no arquivo são removidas; outras colunas do arquivo são ignoradas.")
+        metadata = pipeline.get_table_metadata(table_name)
+        primary_keys = [col for col, info in metadata.items() if info.get("primary_key")]
+        bulk_keys = st.multiselect("Colunas-chave", list(metadata.keys()), default=primary_keys, key="del_bulk_keys")
+        bulk_file = st.file_uploader("Arquivo CSV com as chaves", type=["csv"], key="del_bulk_file")
+        if st.button("Aplicar Deleção em Lote", key="del_bulk_submit"):
+            if bulk_file is None or not bulk_keys:
+                st.error("Envie o arquivo e escolha as colunas-chave.")
+            else:
+                try:
+                    import pandas as pd
+
+                    deleted = pipeline.delete_many(table_name, pd.read_csv(bulk_file, dtype=str), bulk_keys)
+                    st.success(f"{deleted} registros deletados.")
+                except Exception as e:
+                    st.error(f"Erro: {e}")
+
 # ----- DROPAR TABELA -----
 elif operation == "Dropar Tabela":
     st.header("Dropar Tabela")
@@ -317,21 +300,144 @@ elif operation == "Visualizar Tabela":
     else:
         table_name = st.selectbox("Selecione a Tabela", tables, key="view_table")
         try:
-            df = pipeline.get_table_data(table_name)
+            version = pipeline.table_version(table_name)
+            schema = cached_schema(pipeline, table_name, version)
+            column_names = [col for col, _ in schema]
+            st.caption(" | ".join(f"{col}: {dtype}" for col, dtype in schema))
+
+            # Perfil das colunas vem do catálogo de estatísticas, sem ler a tabela
+            stats = cached_stats(pipeline, table_name, version)
+            with st.expander("Perfil das Colunas"):
+                if stats is None:
+                    st.info("Tabela ainda sem estatísticas.")
+                else:
+                    if stats["columns_stale"]:
+                        st.warning("Houve atualizações/deleções desde a última análise: nulos, distintos e min/max são aproximados.")
+                    import pandas as pd
+
+                    st.dataframe(pd.DataFrame.from_dict(stats["columns"], orient="index"))
+                    st.caption(f"Última análise: {stats['analyzed_at'] or 'nunca'} — atualizado em {stats['updated_at']}")
+                if st.button("Atualizar Estatísticas (ANALYZE)", key="view_analyze"):
+                    pipeline.analyze_table(table_name)
+                    st.rerun()
+
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                page_size = st.selectbox("Linhas por página", (50, 100, 500, 1000), index=1, key="view_page_size")
+            with col2:
+                sort_column = st.selectbox("Ordenar por", ["(nenhuma)"] + column_names, key="view_sort")
+                sort_column = None if sort_column == "(nenhuma)" else sort_column
+            with col3:
+                descending = st.checkbox("Decrescente", key="view_desc")
+
+            if "view_filters" not in st.session_state:
+                st.session_state.view_filters = []
+            if st.button("Adicionar Filtro"):
+                st.session_state.view_filters.append({"column": column_names[0], "operator": "=", "value": ""})
+            for idx, flt in enumerate(st.session_state.view_filters):
+                fcol1, fcol2, fcol3 = st.columns(3)
+                with fcol1:
+                    flt["column"] = st.selectbox(f"Coluna (filtro {idx+1})", column_names,
+                                                 index=column_names.index(flt["column"]) if flt["column"] in column_names else 0,
+                                                 key=f"view_filter_col_{idx}")
+                with fcol2:
+                    flt["operator"] = st.selectbox(f"Operador (filtro {idx+1})", FILTER_OPERATORS,
+                                                   index=FILTER_OPERATORS.index(flt["operator"]),
+                                                   key=f"view_filter_op_{idx}")
+                with fcol3:
+                    flt["value"] = st.text_input(f"Valor (filtro {idx+1})", value=flt["value"], key=f"view_filter_val_{idx}")
+            if st.session_state.view_filters and st.button("Limpar Filtros"):
+                st.session_state.view_filters = []
+                st.rerun()
+            filters = [(f["column"], f["operator"], f["value"]) for f in st.session_state.view_filters if f["value"] != ""]
+
+            # Pilha de cursores da paginação; reinicia quando tabela, ordenação ou filtros mudam
+            view_key = (table_name, page_size, sort_column, descending, tuple(filters))
+            if st.session_state.get("view_key") != view_key:
+                st.session_state.view_key = view_key
+                st.session_state.view_cursors = [None]
+
+            total = cached_count(pipeline, table_name, version, tuple(filters))
+            df, next_cursor = cached_page(
+                pipeline, table_name, version, page_size, sort_column, descending, tuple(filters),
+                st.session_state.view_cursors[-1]
+            )
+            page_number = len(st.session_state.view_cursors)
+            st.write(f"{total} linhas — página {page_number} de {max(1, -(-total // page_size))}")
             st.dataframe(df)
-            num_cols = df.select_dtypes(include='number').columns.tolist()
-            cat_cols = df.select_dtypes(include='object').columns.tolist()
-            if num_cols and cat_cols:
-                st.subheader("Gráfico de Dispersão (Exemplo)")
-                fig = px.scatter(df, x=cat_cols[0], y=num_cols[0], title=f"{table_name} - {cat_cols[0]} vs {num_cols[0]}")
-                st.plotly_chart(fig)
+
+            nav1, nav2 = st.columns(2)
+            with nav1:
+                if page_number > 1 and st.button("Página Anterior"):
+                    st.session_state.view_cursors.pop()
+                    st.rerun()
+            with nav2:
+                if next_cursor is not None and st.button("Próxima Página"):
+                    st.session_state.view_cursors.append(next_cursor)
+                    st.rerun()
+
+            num_cols = [col for col, dtype in schema if dtype.upper().startswith(NUMERIC_TYPE_PREFIXES)]
+            time_cols = [col for col, dtype in schema if dtype.upper().startswith(TEMPORAL_TYPE_PREFIXES)]
+            if column_names:
+                # plotly só é importado quando a página de gráficos é aberta
+                import plotly.express as px
+
+                st.subheader("Gráfico")
+                chart_type = st.selectbox("Tipo de gráfico", CHART_TYPES, key="chart_type")
+                # Só o resultado agregado no DuckDB (algumas centenas/milhares de pontos) vai para o plotly
+                if chart_type == "Barras":
+                    # Colunas categóricas (poucos distintos) primeiro
+                    distinct = {col: info["distinct_estimate"] for col, info in (stats or {}).get("columns", {}).items()}
+                    group_cols = sorted(column_names, key=lambda col: distinct.get(col, float("inf")))
+                    x = st.selectbox("Agrupar por", group_cols, key="chart_x")
+                    aggregation = st.selectbox("Agregação", CHART_AGGREGATIONS, key="chart_agg")
+                    y = None if aggregation == "count" or not num_cols else st.selectbox("Valor", num_cols, key="chart_y")
+                    bins = st.slider("Máximo de grupos", 5, 200, 30, key="chart_bins")
+                    data = cached_chart(pipeline, table_name, version, chart_type, x, y, aggregation, bins)
+                    fig = px.bar(data, x=x, y="valor", title=f"{table_name} - {aggregation}({y or '*'}) por {x}")
+                    st.plotly_chart(fig)
+                elif chart_type == "Histograma" and (num_cols or time_cols):
+                    x = st.selectbox("Coluna", num_cols + time_cols, key="chart_x")
+                    bins = st.slider("Bins", 5, 500, 50, key="chart_bins")
+                    data = cached_chart(pipeline, table_name, version, chart_type, x, None, "count", bins)
+                    fig = px.bar(data, x="inicio", y="quantidade", title=f"{table_name} - distribuição de {x}")
+                    st.plotly_chart(fig)
+                elif chart_type == "Dispersão (bins 2D)" and len(num_cols + time_cols) >= 1 and num_cols:
+                    x = st.selectbox("X", num_cols + time_cols, key="chart_x")
+                    y = st.selectbox("Y", num_cols, key="chart_y")
+                    bins = st.slider("Bins por eixo", 5, 100, 40, key="chart_bins")
+                    data = cached_chart(pipeline, table_name, version, chart_type, x, y, "count", bins)
+                    fig = px.scatter(data, x=x, y=y, size="quantidade", color="quantidade",
+                                     title=f"{table_name} - {x} vs {y} (densidade)")
+                    st.plotly_chart(fig)
+                elif chart_type == "Linha (min/max)" and num_cols:
+                    x = st.selectbox("X", time_cols + num_cols, key="chart_x")
+                    y = st.selectbox("Y", num_cols, key="chart_y")
+                    bins = st.slider("Buckets", 50, 2000, 500, key="chart_bins")
+                    data = cached_chart(pipeline, table_name, version, chart_type, x, y, "count", bins)
+                    fig = px.line(data, x=x, y=y, title=f"{table_name} - {y} por {x}")
+                    st.plotly_chart(fig)
+                elif chart_type == "Dispersão (amostra)" and num_cols:
+                    x = st.selectbox("X", column_names, key="chart_x")
+                    y = st.selectbox("Y", num_cols, key="chart_y")
+                    sample = cached_sample(pipeline, table_name, version, SAMPLE_SIZE, (x, y))
+                    fig = px.scatter(sample, x=x, y=y, title=f"{table_name} - {x} vs {y} (amostra de até {SAMPLE_SIZE} linhas)")
+                    st.plotly_chart(fig)
+                else:
+                    st.info("A tabela não tem colunas do tipo necessário para este gráfico.")
         except Exception as e:
             st.error(f"Erro ao carregar dados: {e}")
 
 # ----- LISTAR TABELAS -----
 elif operation == "Listar Tabelas":
     st.header("Listar Tabelas")
-    tables = pipeline.list_tables()
-    st.write(tables)
+    # Tamanhos lidos do catálogo de estatísticas; nenhuma tabela é varrida
+    st.dataframe(pipeline.list_table_stats())
+    if st.button("Atualizar Estatísticas de Todas (ANALYZE)"):
+        try:
+            pipeline.analyze()
+            st.rerun()
+        except Exception as e:
+            st.error(f"Erro: {e}")
 
 st.sidebar.info("Interface integrada com a pipeline do DuckDB.")
@@ -0,0 +1,15 @@
+# Importar o pacote não carrega duckdb, pandas nem psycopg2: os nomes abaixo são resolvidos no primeiro acesso
+_EXPORTADOS = {
+    "Configuracao": "config",
+    "DuckDBPipeline": "pipeline",
+}
+
+__all__ = list(_EXPORTADOS)
+
+
+def __getattr__(nome):
+    if nome not in _EXPORTADOS:
+        raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
+    from importlib import import_module
+
+    return getattr(import_module(f".{_EXPORTADOS[nome]}", __name__), nome)
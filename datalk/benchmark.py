@@ -0,0 +1,408 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import duckdb
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+CENARIOS = ("startup", "sync", "insert_unitario", "insert_lote", "viewer")
+TABELA = "bench_dados"
+
+# Expressões SQL que geram valores sintéticos determinísticos a partir do número da linha (i)
+_GERADORES = {
+    "BOOLEAN": "hash(i, {k}) % 2 = 0",
+    "TINYINT": "CAST(hash(i, {k}) % 100 AS TINYINT)",
+    "SMALLINT": "CAST(hash(i, {k}) % 30000 AS SMALLINT)",
+    "INTEGER": "CAST(hash(i, {k}) % 1000000 AS INTEGER)",
+    "BIGINT": "CAST(hash(i, {k}) % 1000000000 AS BIGINT)",
+    "DOUBLE": "(hash(i, {k}) % 10000000) / 100.0",
+    "FLOAT": "CAST((hash(i, {k}) % 100000) / 10.0 AS FLOAT)",
+    "DATE": "DATE '2020-01-01' + CAST(hash(i, {k}) % 3650 AS INTEGER)",
+    "TIMESTAMP": "TIMESTAMP '2020-01-01' + to_seconds(CAST(i AS BIGINT))",
+    "VARCHAR": "'txt_' || CAST(hash(i, {k}) % 100000 AS VARCHAR)",
+}
+
+
+def _expressao(tipo, k):
+    tipo = tipo.upper()
+    if tipo.startswith("DECIMAL"):
+        return f"CAST((hash(i, {k}) % 10000000) / 100.0 AS {tipo})"
+    return _GERADORES.get(tipo, _GERADORES["VARCHAR"]).format(k=k)
+
+
+# Campos no mesmo formato do exemplo.json; chaves estrangeiras são ignoradas no dado sintético
+def montar_campos(schema_path=None, colunas=8, tipos="INTEGER,VARCHAR,DOUBLE,TIMESTAMP"):
+    if schema_path:
+        campos = json.loads(Path(schema_path).read_text(encoding="utf-8"))
+        return [
+            {"name": c["name"], "data_type": c.get("data_type") or "VARCHAR", "primary_key": c.get("primary_key", False)}
+            for c in campos
+        ]
+    lista_tipos = [t.strip().upper() for t in tipos.split(",") if t.strip()]
+    campos = [{"name": "id", "data_type": "BIGINT", "primary_key": True}]
+    for indice in range(1, colunas):
+        campos.append({"name": f"c{indice}", "data_type": lista_tipos[(indice - 1) % len(lista_tipos)]})
+    return campos
+
+
+def _select_sintetico(campos, inicio, linhas):
+    expressoes = []
+    for k, campo in enumerate(campos):
+        if campo.get("primary_key"):
+            expressoes.append(f"CAST(i AS {campo['data_type']}) AS {campo['name']}")
+        else:
+            expressoes.append(f"{_expressao(campo['data_type'], k)} AS {campo['name']}")
+    return f"SELECT {', '.join(expressoes)} FROM range({inicio}, {inicio + linhas}) t(i)"
+
+
+def preparar_base(caminho, campos, linhas):
+    from .pipeline import DuckDBPipeline
+
+    pipeline = DuckDBPipeline(str(caminho))
+    pipeline.create_table_dynamic(TABELA, campos)
+    pipeline.conn.execute(f"INSERT INTO {TABELA} {_select_sintetico(campos, 1, linhas)}")
+    # Dados gerados fora dos métodos de escrita: o catálogo de estatísticas precisa do analyze
+    pipeline.analyze_table(TABELA)
+    pipeline.create_table_dynamic(f"{TABELA}_vazia", campos)
+    pipeline.close()
+
+
+def _pico_rss_mb():
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KB, macOS bytes
+    return round(pico / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _cronometrar(funcao, repeticoes=1):
+    tempos = []
+    resultado = None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos), resultado
+
+
+# PYTHONPATH com a raiz do repositório, para os subprocessos importarem o pacote de qualquer diretório
+def _ambiente_filho():
+    caminhos = [str(RAIZ)] + ([os.environ["PYTHONPATH"]] if os.getenv("PYTHONPATH") else [])
+    return dict(os.environ, PYTHONPATH=os.pathsep.join(caminhos))
+
+
+# ===== Cenários (cada um roda em um subprocesso próprio para isolar o pico de RSS) =====
+def cenario_startup(config):
+    # Partida a frio em processo novo: o que um cron paga antes de mover qualquer dado
+    comandos = {
+        "python_vazio_s": ["-c", "pass"],
+        "import_pacote_s": ["-c", "import datalk"],
+        "import_loader_s": ["-c", "import datalk.loader"],
+        "import_pipeline_s": ["-c", "import datalk.pipeline"],
+        "cli_ajuda_s": ["-m", "datalk", "--help"],
+        "cli_sync_ajuda_s": ["-m", "datalk", "sync", "--help"],
+    }
+    metricas = {}
+    for nome, argumentos in comandos.items():
+        metricas[nome], _ = _cronometrar(
+            lambda: subprocess.run(
+                [sys.executable, *argumentos], check=True, capture_output=True, env=_ambiente_filho()
+            ),
+            config["repeticoes"],
+        )
+    return metricas
+
+
+def cenario_sync(config):
+    variaveis = ("BENCH_DB_HOST", "BENCH_DB_NAME", "BENCH_DB_USER", "BENCH_DB_PASSWORD")
+    if not all(os.getenv(v) for v in variaveis):
+        return {"ignorado": "defina BENCH_DB_HOST, BENCH_DB_NAME, BENCH_DB_USER e BENCH_DB_PASSWORD (Postgres local)"}
+
+    import psycopg2
+
+    from . import loader
+    from .config import Configuracao
+    from .pipeline import DuckDBPipeline
+
+    # Ajustes do loader (MAX_WORKERS, FILA_LOTES...) continuam vindo do ambiente; o destino é o Postgres local
+    config_loader = Configuracao.do_ambiente(
+        duckdb_path=str(Path(config["base"]).resolve()),
+        db_host=os.environ["BENCH_DB_HOST"],
+        db_name=os.environ["BENCH_DB_NAME"],
+        db_user=os.environ["BENCH_DB_USER"],
+        db_password=os.environ["BENCH_DB_PASSWORD"],
+        db_port=os.getenv("BENCH_DB_PORT", "5432"),
+        supabase_url=os.getenv("SUPABASE_URL", "bench"),
+        supabase_key=os.getenv("SUPABASE_KEY", "bench"),
+    )
+
+    # Destino limpo: remove as tabelas da base de benchmark e seus registros de controle
+    with duckdb.connect(config["base"], read_only=True) as conn_duckdb:
+        tabelas = [t[0] for t in conn_duckdb.execute("SHOW TABLES").fetchall()]
+    with psycopg2.connect(**config_loader.parametros_postgres()) as conn:
+        with conn.cursor() as cursor:
+            for tabela in tabelas:
+                cursor.execute(f"DROP TABLE IF EXISTS {tabela}")
+            cursor.execute("SELECT to_regclass('controle_cargas') IS NOT NULL")
+            if cursor.fetchone()[0]:
+                cursor.execute("DELETE FROM controle_cargas WHERE tabela_nome = ANY(%s)", (tabelas,))
+    conn.close()
+
+    # Tabelas com erro não derrubam loader.main: sem esta checagem o tempo de uma carga falha seria medido
+    def sincronizar():
+        falhas = loader.main()
+        if falhas:
+            raise RuntimeError(f"Sincronização com falhas: {', '.join(falhas)}")
+
+    loader.configurar(config_loader)
+    metricas = {}
+    try:
+        tempo, _ = _cronometrar(sincronizar)
+        metricas["carga_completa_s"] = tempo
+        metricas["carga_completa_linhas_por_s"] = config["linhas"] / tempo
+
+        delta = config["delta"]
+        campos = config["campos"]
+        pipeline = DuckDBPipeline(config["base"])
+        pipeline.conn.execute(f"INSERT INTO {TABELA} {_select_sintetico(campos, config['linhas'] + 1, delta)}")
+        pipeline.analyze_table(TABELA)
+        pipeline.close()
+        tempo, _ = _cronometrar(sincronizar)
+        metricas["incremental_s"] = tempo
+        metricas["incremental_linhas_por_s"] = delta / tempo
+
+        tempo, _ = _cronometrar(sincronizar)
+        metricas["sem_mudancas_s"] = tempo
+
+        pool = loader._obter_pool()
+        metricas["pool_espera_s"] = pool.tempo_espera
+        metricas["pool_conexao_s"] = pool.tempo_conexao
+    finally:
+        loader.fechar_conexoes()
+    return metricas
+
+
+def cenario_insert_unitario(config):
+    from .pipeline import DuckDBPipeline
+
+    pipeline = DuckDBPipeline(config["base"])
+    linhas = min(config["linhas"], config["linhas_unitario"])
+    registros = pipeline.conn.execute(_select_sintetico(config["campos"], 1, linhas)).fetchdf().to_dict("records")
+    tabela = f"{TABELA}_vazia"
+
+    def inserir():
+        for registro in registros:
+            pipeline.insert_data(tabela, dict(registro))
+
+    tempo, _ = _cronometrar(inserir)
+    pipeline.close()
+    return {"insert_unitario_s": tempo, "insert_unitario_linhas_por_s": linhas / tempo}
+
+
+def cenario_insert_lote(config):
+    from .pipeline import DuckDBPipeline
+
+    pipeline = DuckDBPipeline(config["base"])
+    df = pipeline.conn.execute(_select_sintetico(config["campos"], 1, config["linhas"])).fetchdf()
+    tempo, (inseridas, rejeitadas) = _cronometrar(lambda: pipeline.insert_many(f"{TABELA}_vazia", df))
+    pipeline.close()
+    return {
+        "insert_lote_s": tempo,
+        "insert_lote_linhas_por_s": inseridas / tempo,
+        "insert_lote_rejeitadas": len(rejeitadas),
+    }
+
+
+def cenario_viewer(config):
+    from .pipeline import DuckDBPipeline
+
+    pipeline = DuckDBPipeline(config["base"])
+    repeticoes = config["repeticoes"]
+    campos = config["campos"]
+    chave = next((c["name"] for c in campos if c.get("primary_key")), campos[0]["name"])
+    ordenacao = next((c["name"] for c in campos if not c.get("primary_key")), None)
+    numerica = next(
+        (c["name"] for c in campos if c["data_type"].upper() in ("INTEGER", "BIGINT", "DOUBLE", "FLOAT")
+         and not c.get("primary_key")),
+        None,
+    )
+    metricas = {}
+
+    metricas["count_s"], _ = _cronometrar(lambda: pipeline.count_rows(TABELA), repeticoes)
+    metricas["primeira_pagina_s"], _ = _cronometrar(lambda: pipeline.get_table_page(TABELA, 100), repeticoes)
+
+    # Custo de uma página profunda: segue 20 cursores e mede só a última
+    cursor = None
+    for _ in range(19):
+        _, cursor = pipeline.get_table_page(TABELA, 100, after=cursor)
+        if cursor is None:
+            break
+    metricas["pagina_20_s"], _ = _cronometrar(lambda: pipeline.get_table_page(TABELA, 100, after=cursor), repeticoes)
+
+    if ordenacao:
+        metricas["pagina_ordenada_s"], _ = _cronometrar(
+            lambda: pipeline.get_table_page(TABELA, 100, sort_column=ordenacao, descending=True), repeticoes
+        )
+    metricas["amostra_s"], _ = _cronometrar(lambda: pipeline.sample_table(TABELA, 5000), repeticoes)
+    if numerica:
+        metricas["histograma_s"], _ = _cronometrar(
+            lambda: pipeline.aggregate_for_chart(TABELA, "Histograma", numerica, bins=50), repeticoes
+        )
+        metricas["linha_minmax_s"], _ = _cronometrar(
+            lambda: pipeline.aggregate_for_chart(TABELA, "Linha (min/max)", chave, numerica, bins=500), repeticoes
+        )
+    pipeline.close()
+    return metricas
+
+
+_FUNCOES_CENARIO = {
+    "startup": cenario_startup,
+    "sync": cenario_sync,
+    "insert_unitario": cenario_insert_unitario,
+    "insert_lote": cenario_insert_lote,
+    "viewer": cenario_viewer,
+}
+
+
+def _executar_filho(nome, config):
+    metricas = _FUNCOES_CENARIO[nome](config)
+    metricas["pico_rss_mb"] = _pico_rss_mb()
+    print(json.dumps(metricas, default=str))
+
+
+def executar(cenarios, config, diretorio):
+    base = Path(diretorio) / "base.duckdb"
+    inicio = time.perf_counter()
+    preparar_base(base, config["campos"], config["linhas"])
+    preparacao = time.perf_counter() - inicio
+
+    resultados = {}
+    for nome in cenarios:
+        # Cada cenário trabalha em uma cópia da base para não contaminar os demais
+        copia = Path(diretorio) / f"{nome}.duckdb"
+        shutil.copyfile(base, copia)
+        config_filho = dict(config, base=str(copia))
+        processo = subprocess.run(
+            [sys.executable, "-m", "datalk.benchmark", "--_filho", nome, "--_config", json.dumps(config_filho)],
+            capture_output=True,
+            text=True,
+            cwd=diretorio,
+            env=_ambiente_filho(),
+        )
+        if processo.returncode != 0:
+            resultados[nome] = {"erro": processo.stderr.strip().splitlines()[-1:] or ["falhou"]}
+        else:
+            resultados[nome] = json.loads(processo.stdout.strip().splitlines()[-1])
+        print(f"{nome}: {json.dumps(resultados[nome], default=str)}")
+    return {"preparacao_s": preparacao, "cenarios": resultados}
+
+
+def _commit_atual():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=RAIZ
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+# ===== Comparação entre execuções =====
+def _pior(nome, anterior, atual, tolerancia):
+    if not isinstance(anterior, (int, float)) or not isinstance(atual, (int, float)) or anterior <= 0:
+        return None
+    variacao = (atual - anterior) / anterior
+    if nome.endswith("_por_s"):
+        variacao = -variacao  # vazão: cair é piorar
+    elif not (nome.endswith("_s") or nome.endswith("_mb")):
+        return None
+    return variacao if variacao > tolerancia else None
+
+
+def comparar(anterior, atual, tolerancia):
+    regressoes = []
+    for cenario, metricas in atual["cenarios"].items():
+        base = anterior.get("cenarios", {}).get(cenario, {})
+        for nome, valor in metricas.items():
+            piora = _pior(nome, base.get(nome), valor, tolerancia)
+            if piora is not None:
+                regressoes.append((cenario, nome, base[nome], valor, piora))
+    for cenario, nome, antes, depois, piora in regressoes:
+        print(f"REGRESSÃO {cenario}.{nome}: {antes:.4g} -> {depois:.4g} ({piora:+.0%})")
+    if not regressoes:
+        print(f"Nenhuma regressão acima de {tolerancia:.0%}.")
+    return regressoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="datalk bench", description="Benchmark do loader e da DuckDBPipeline com dados sintéticos."
+    )
+    parser.add_argument("--linhas", type=int, default=100_000)
+    parser.add_argument("--colunas", type=int, default=8)
+    parser.add_argument("--tipos", default="INTEGER,VARCHAR,DOUBLE,TIMESTAMP", help="tipos das colunas, em rodízio")
+    parser.add_argument("--schema", help="lista de campos no formato do exemplo.json (substitui --colunas/--tipos)")
+    parser.add_argument("--delta", type=int, default=10_000, help="linhas novas para a etapa incremental do sync")
+    parser.add_argument("--linhas-unitario", type=int, default=2_000, help="limite de linhas do insert linha a linha")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--cenarios", default=",".join(CENARIOS))
+    parser.add_argument("--saida", default="benchmark_resultados.json")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior para detectar regressões")
+    parser.add_argument("--tolerancia", type=float, default=0.10)
+    parser.add_argument("--_filho", help=argparse.SUPPRESS)
+    parser.add_argument("--_config", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args._filho:
+        _executar_filho(args._filho, json.loads(args._config))
+        return 0
+
+    config = {
+        "linhas": args.linhas,
+        "delta": args.delta,
+        "linhas_unitario": args.linhas_unitario,
+        "repeticoes": args.repeticoes,
+        "campos": montar_campos(args.schema, args.colunas, args.tipos),
+    }
+    cenarios = [c.strip() for c in args.cenarios.split(",") if c.strip()]
+    invalidos = [c for c in cenarios if c not in CENARIOS]
+    if invalidos:
+        parser.error(f"cenários inválidos: {invalidos}")
+
+    with tempfile.TemporaryDirectory(prefix="datalk_bench_") as diretorio:
+        resultado = executar(cenarios, config, diretorio)
+    resultado["meta"] = {
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "commit": _commit_atual(),
+        "python": platform.python_version(),
+        "duckdb": duckdb.__version__,
+        "plataforma": platform.platform(),
+        "config": config,
+    }
+    Path(args.saida).write_text(json.dumps(resultado, indent=2, default=str), encoding="utf-8")
+    print(f"Resultados gravados em {args.saida}")
+
+    if args.comparar:
+        anterior = json.loads(Path(args.comparar).read_text(encoding="utf-8"))
+        if comparar(anterior, resultado, args.tolerancia):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+import argparse
+import logging
+import sys
+
+
+# Só argparse/logging no topo: cada subcomando importa o que usa (duckdb, psycopg2, pandas) ao executar,
+# então "--help" e erros de argumento não pagam o custo dessas bibliotecas.
+def _configurar_log():
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        handlers=[logging.FileHandler("pipeline.log"), logging.StreamHandler()],
+    )
+
+
+# Configuração inválida encerra com a mensagem, sem traceback. Um --env-file por destino Postgres.
+def _configuracoes(args, postgres=True):
+    from .config import Configuracao
+
+    try:
+        # --env-file antes e depois do subcomando somam destinos, nessa ordem
+        arquivos = (args.env_file or []) + (args.env_file_comando or [])
+        return [Configuracao.do_ambiente(arquivo).validar(postgres) for arquivo in arquivos or [None]]
+    except (ValueError, FileNotFoundError) as e:
+        sys.exit(f"Erro de configuração: {e}")
+
+
+# O primeiro .env define o DuckDB e os parâmetros da carga; todos são destinos
+def _configurar_loader(loader, args):
+    configuracoes = _configuracoes(args)
+    try:
+        loader.configurar(configuracoes[0], configuracoes)
+    except ValueError as e:
+        sys.exit(f"Erro de configuração: {e}")
+
+
+def _sync(args):
+    from . import loader
+
+    try:
+        _configurar_loader(loader, args)
+        if args.status:
+            loader.exibir_status()
+        elif loader.main(args.modo, args.reiniciar, args.somente_plano):
+            return 1
+    finally:
+        loader.fechar_conexoes()
+
+
+def _plan(args):
+    from . import loader
+
+    try:
+        _configurar_loader(loader, args)
+        if loader.main(args.modo, somente_plano=True):
+            return 1
+    finally:
+        loader.fechar_conexoes()
+
+
+def _export(args):
+    from . import parquet_export
+
+    if parquet_export.main(args.tabelas, config=_configuracoes(args, postgres=False)[0]):
+        return 1
+
+
+def _bench(args, argumentos):
+    from . import benchmark
+
+    return benchmark.main(argumentos)
+
+
+def _argumento_modo(parser):
+    parser.add_argument(
+        "--modo",
+        choices=("incremental", "diff"),
+        default="incremental",
+        help="incremental: só linhas novas; diff: também updates e deletes via hash por chunk",
+    )
+
+
+def criar_parser():
+    ajuda_env = (
+        "arquivo .env com a configuração (padrão: .env do diretório atual ou do mais próximo acima dele); "
+        "repita para sincronizar vários destinos Postgres numa só leitura do DuckDB (o primeiro define o DuckDB "
+        "e a carga)"
+    )
+    # No subcomando o --env-file vai para outro destino: o namespace do subparser sobrescreveria a lista
+    # dada antes dele
+    comum = argparse.ArgumentParser(add_help=False)
+    comum.add_argument("--env-file", dest="env_file_comando", action="append", help=ajuda_env)
+
+    parser = argparse.ArgumentParser(prog="datalk", description="Sincronização e exportação das tabelas do DuckDB.")
+    parser.add_argument("--env-file", action="append", help=ajuda_env)
+    subcomandos = parser.add_subparsers(dest="comando", required=True)
+
+    sync = subcomandos.add_parser("sync", parents=[comum], help="sincroniza as tabelas do DuckDB com o Supabase")
+    _argumento_modo(sync)
+    retomada = sync.add_mutually_exclusive_group()
+    retomada.add_argument(
+        "--resume",
+        dest="reiniciar",
+        action="store_false",
+        help="cargas parciais continuam do último checkpoint (padrão)",
+    )
+    retomada.add_argument(
+        "--restart",
+        dest="reiniciar",
+        action="store_true",
+        help="cargas parciais são descartadas: a primeira carga recomeça do zero e um delta volta à última "
+        "carga concluída",
+    )
+    retomada.add_argument("--status", action="store_true", help="só lista as cargas parciais e sai")
+    sync.add_argument(
+        "--plan",
+        "--dry-run",
+        dest="somente_plano",
+        action="store_true",
+        help="mostra o plano (ações, ALTERs e ordem de execução) sem mover dados",
+    )
+    # Sem --resume/--restart, as cargas parciais são retomadas
+    sync.set_defaults(executar=_sync, reiniciar=False)
+
+    plan = subcomandos.add_parser("plan", parents=[comum], help="mostra o plano da sincronização sem mover dados")
+    _argumento_modo(plan)
+    plan.set_defaults(executar=_plan)
+
+    export = subcomandos.add_parser(
+        "export", parents=[comum], help="exporta as tabelas do DuckDB para Parquet particionado (Hive)"
+    )
+    export.add_argument("tabelas", nargs="*", help="tabelas a exportar (padrão: todas)")
+    export.set_defaults(executar=_export)
+
+    # Os argumentos do bench são repassados inteiros para o parser do benchmark
+    subcomandos.add_parser(
+        "bench", add_help=False, help="benchmark do loader e da DuckDBPipeline (argumentos: datalk bench --help)"
+    )
+    return parser
+
+
+def main(argv=None):
+    parser = criar_parser()
+    args, extras = parser.parse_known_args(argv)
+    if args.comando == "bench":
+        return _bench(args, extras)
+    if extras:
+        parser.error(f"argumentos não reconhecidos: {' '.join(extras)}")
+    _configurar_log()
+    return args.executar(args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+import os
+from pathlib import Path
+
+
+# Pasta base dos caminhos relativos de DUCKDB_PATH; caminhos absolutos não passam por ela
+PASTA_DADOS_PADRAO = "D:/Projetos/Data_Lk/data"
+
+
+def resolver_duckdb(caminho, pasta_dados=None):
+    pasta = pasta_dados or os.getenv("DATA_DIR") or PASTA_DADOS_PADRAO
+    return (Path(pasta) / caminho).resolve()
+
+
+# Lê valores no formato "tabela:coluna,tabela2:coluna2"
+def _mapa(texto):
+    return {
+        tabela.strip(): coluna.strip()
+        for tabela, coluna in (item.split(":", 1) for item in (texto or "").split(",") if ":" in item)
+    }
+
+
+def _booleano(texto):
+    return texto.strip().lower() not in ("0", "false", "nao", "não")
+
+
+# Configuração do loader e da exportação Parquet. Nada é lido do ambiente nem aberto na construção:
+# quem importa o pacote monta a Configuracao explicitamente; a CLI usa do_ambiente().
+class Configuracao:
+    # nome: (variável de ambiente, conversão, padrão)
+    CAMPOS = {
+        "duckdb_path": ("DUCKDB_PATH", str, None),
+        "pasta_dados": ("DATA_DIR", str, None),
+        "supabase_url": ("SUPABASE_URL", str, None),
+        "supabase_key": ("SUPABASE_KEY", str, None),
+        "db_host": ("DB_HOST", str, None),
+        "db_name": ("DB_NAME", str, None),
+        "db_user": ("DB_USER", str, None),
+        "db_password": ("DB_PASSWORD", str, None),
+        "db_port": ("DB_PORT", str, "5432"),
+        "batch_size": ("BATCH_SIZE", int, 10000),
+        "usar_copy": ("USAR_COPY", _booleano, True),
+        "max_workers": ("MAX_WORKERS", int, 4),
+        "pg_pool_min": ("PG_POOL_MIN", int, 1),
+        # Sem valor, pg_pool_max e particoes acompanham max_workers
+        "pg_pool_max": ("PG_POOL_MAX", int, None),
+        # Tabelas com pelo menos limiar_particao linhas são carregadas em particoes faixas de rowid em paralelo
+        "limiar_particao": ("LIMIAR_PARTICAO", int, 5000000),
+        "particoes": ("PARTICOES", int, None),
+        # Teto de memória (MB) para os lotes em trânsito somando todos os workers; 0 desativa
+        "memoria_maxima_mb": ("MEMORIA_MAXIMA_MB", int, 0),
+        # Lotes lidos e serializados à frente da escrita (fila limitada entre leitor e escritor); 0 desativa
+        "fila_lotes": ("FILA_LOTES", int, 4),
+        # Cargas em streaming fazem commit (dados + progresso em controle_cargas) a cada checkpoint_linhas; 0 desativa
+        "checkpoint_linhas": ("CHECKPOINT_LINHAS", int, 1000000),
+        # Colunas monotônicas (PK ou timestamp) por tabela, ex.: "vendas:id,eventos:criado_em"
+        "watermarks": ("WATERMARKS", _mapa, {}),
+        # Chave inteira usada no modo diff, ex.: "clientes:id"; sem entrada, usa a coluna de watermarks
+        "chaves_diff": ("CHAVES_DIFF", _mapa, {}),
+        # Largura (em valores de chave) de cada chunk comparado por hash no modo diff
+        "tamanho_chunk_hash": ("TAMANHO_CHUNK_HASH", int, 10000),
+        # Saídas das métricas por tabela/fase: arquivo .jsonl (além do pipeline.log) e arquivo .prom
+        # para o textfile collector do node exporter; vazio desativa
+        "metricas_jsonl": ("METRICAS_JSONL", str, ""),
+        "metricas_prom": ("METRICAS_PROM", str, ""),
+        "metricas_top": ("METRICAS_TOP", int, 10),
+        # Raiz da camada Parquet; padrão: pasta "lake" ao lado do arquivo DuckDB
+        "lago_dir": ("LAGO_DIR", str, None),
+        "parquet_compressao": ("PARQUET_COMPRESSAO", str, "zstd"),
+        # Coluna de partição Hive por tabela, ex.: "vendas:data_venda"; timestamps são particionados por dia
+        "particoes_parquet": ("PARTICOES_PARQUET", _mapa, {}),
+        # Nome do destino Postgres nos logs e métricas quando há vários (padrão: host/banco)
+        "destino_nome": ("DESTINO_NOME", str, None),
+        # Segundos que a leitura compartilhada espera um destino com a fila cheia antes de desligá-lo;
+        # o destino desligado segue sozinho, relendo a consulta do ponto onde parou
+        "espera_destino_lento": ("ESPERA_DESTINO_LENTO", float, 30.0),
+    }
+
+    def __init__(self, **valores):
+        desconhecidos = set(valores) - set(self.CAMPOS)
+        if desconhecidos:
+            raise ValueError(f"Opções de configuração desconhecidas: {sorted(desconhecidos)}")
+        for nome, (_, _, padrao) in self.CAMPOS.items():
+            valor = valores.get(nome, padrao)
+            setattr(self, nome, dict(valor) if isinstance(valor, dict) else valor)
+        if self.pg_pool_max is None:
+            self.pg_pool_max = self.max_workers
+        if self.particoes is None:
+            self.particoes = self.max_workers
+
+    @classmethod
+    def do_ambiente(cls, arquivo_env=None, **sobrescritas):
+        """Lê as variáveis de ambiente e o .env; argumentos nomeados têm precedência.
+        Um arquivo_env explícito (um por destino) vale sobre o ambiente do processo; o .env padrão não."""
+        from dotenv import dotenv_values, find_dotenv
+
+        # O arquivo não é carregado em os.environ: cada .env (um por destino) gera a sua Configuracao.
+        # Sem arquivo, o .env é procurado a partir do diretório atual (não da pasta do pacote).
+        arquivo = {
+            chave: valor for chave, valor in dotenv_values(arquivo_env or find_dotenv(usecwd=True)).items()
+            if valor is not None
+        }
+        ambiente = {**os.environ, **arquivo} if arquivo_env else {**arquivo, **os.environ}
+        valores = {}
+        for nome, (variavel, converter, _) in cls.CAMPOS.items():
+            texto = ambiente.get(variavel)
+            if texto not in (None, ""):
+                valores[nome] = converter(texto)
+        valores.update(sobrescritas)
+        return cls(**valores)
+
+    @property
+    def caminho_duckdb(self):
+        if not self.duckdb_path:
+            raise ValueError("DUCKDB_PATH não está definido. Verifique o arquivo .env.")
+        return resolver_duckdb(self.duckdb_path, self.pasta_dados)
+
+    @property
+    def caminho_lago(self):
+        return Path(self.lago_dir).resolve() if self.lago_dir else self.caminho_duckdb.parent / "lake"
+
+    @property
+    def nome_destino(self):
+        return self.destino_nome or f"{self.db_host}/{self.db_name}"
+
+    def parametros_postgres(self):
+        return {
+            "host": self.db_host,
+            "database": self.db_name,
+            "user": self.db_user,
+            "password": self.db_password,
+            "port": self.db_port,
+        }
+
+    def validar(self, postgres=True):
+        obrigatorios = ["duckdb_path"]
+        if postgres:
+            obrigatorios += ["supabase_url", "supabase_key", "db_host", "db_name", "db_user", "db_password"]
+        ausentes = [self.CAMPOS[nome][0] for nome in obrigatorios if not getattr(self, nome)]
+        if ausentes:
+            raise ValueError(f"Variáveis de ambiente ausentes: {', '.join(ausentes)}. Verifique o arquivo .env.")
+        if not self.caminho_duckdb.is_file():
+            raise FileNotFoundError(f"Arquivo DuckDB não encontrado: {self.caminho_duckdb}")
+        return self
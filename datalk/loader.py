@@ -0,0 +1,1741 @@
+import duckdb
+import psycopg2
+from psycopg2 import extras, pool
+import io
+import json
+import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .metricas import METRICAS
+from .pipeline import INTERNAL_TABLES
+
+
+logger = logging.getLogger(__name__)
+
+
+# Configuração ativa; importar o módulo não lê o ambiente nem abre conexões
+_config = None
+_destinos = []
+conn_duckdb = None
+_conn_lock = threading.Lock()
+
+
+def configurar(config, destinos=None):
+    """Ativa uma Configuracao (validada) e descarta as conexões abertas com a anterior.
+
+    config define o DuckDB e os parâmetros da carga; destinos (padrão: [config]) são as
+    Configuracao de cada Postgres que recebe as tabelas, cada um com o seu controle_cargas.
+    """
+    global _config, _destinos
+    destinos = list(destinos or [config])
+    config.validar(postgres=True)
+    for destino in destinos:
+        destino.validar(postgres=True)
+        if destino.caminho_duckdb != config.caminho_duckdb:
+            raise ValueError(
+                f"Destino {destino.nome_destino} aponta para outro DuckDB ({destino.caminho_duckdb}): "
+                "uma execução lê um único arquivo."
+            )
+    bancos = [(d.db_host, str(d.db_port), d.db_name) for d in destinos]
+    if len(set(bancos)) < len(bancos):
+        raise ValueError("Destinos repetidos: dois destinos apontam para o mesmo banco Postgres.")
+    nomes = [d.nome_destino for d in destinos]
+    if len(set(nomes)) < len(nomes):
+        raise ValueError(f"Nomes de destino repetidos: {nomes}. Use DESTINO_NOME para diferenciá-los.")
+    fechar_conexoes()
+    _config = config
+    _destinos = [Destino(d) for d in destinos]
+    logger.info(f"DUCKDB_PATH: {config.caminho_duckdb}")
+    if len(_destinos) > 1:
+        logger.info(f"Destinos: {', '.join(nomes)}.")
+
+
+def _ativar(config=None, destinos=None):
+    if config is not None:
+        configurar(config, destinos)
+    elif _config is None:
+        raise ValueError("Loader sem configuração: passe config ou chame configurar(Configuracao(...)).")
+
+
+# Conexão DuckDB aberta na primeira leitura, não no import
+def _conexao_duckdb():
+    global conn_duckdb
+    with _conn_lock:
+        if conn_duckdb is None:
+            conn_duckdb = duckdb.connect(str(_config.caminho_duckdb))
+        return conn_duckdb
+
+
+# Pool limitado de conexões Postgres: bloqueia quando esgotado em vez de falhar
+class PoolPostgres:
+    def __init__(self, minimo, maximo, **parametros):
+        inicio = time.perf_counter()
+        self._pool = pool.ThreadedConnectionPool(minimo, maximo, **parametros)
+        self._vagas = threading.BoundedSemaphore(maximo)
+        self._lock = threading.Lock()
+        self.tempo_conexao = time.perf_counter() - inicio
+        self.tempo_espera = 0.0
+        self.maior_espera = 0.0
+        self.emprestimos = 0
+
+    @contextmanager
+    def conexao(self, nome_tabela=None):
+        inicio = time.perf_counter()
+        self._vagas.acquire()
+        espera = time.perf_counter() - inicio
+        if nome_tabela:
+            METRICAS.somar(nome_tabela, "espera_conexao_segundos", espera)
+        conn = None
+        try:
+            inicio_conexao = time.perf_counter()
+            conn = self._pool.getconn()
+            with self._lock:
+                self.tempo_espera += espera
+                self.maior_espera = max(self.maior_espera, espera)
+                self.tempo_conexao += time.perf_counter() - inicio_conexao
+                self.emprestimos += 1
+            yield conn
+        finally:
+            if conn is not None:
+                if not conn.closed:
+                    # Descarta transação pendente (commit é sempre explícito)
+                    conn.rollback()
+                self._pool.putconn(conn, close=bool(conn.closed))
+            self._vagas.release()
+
+    def resumo(self):
+        return (
+            f"Pool Postgres: {self.emprestimos} empréstimos, conexão {self.tempo_conexao:.2f}s, "
+            f"espera total {self.tempo_espera:.2f}s (maior {self.maior_espera:.2f}s)."
+        )
+
+    def fechar(self):
+        self._pool.closeall()
+
+
+def _commit(conn_supabase, nome_tabela):
+    with METRICAS.fase(nome_tabela, "commit"):
+        conn_supabase.commit()
+
+
+# Um destino Postgres: pool próprio, reaproveitado entre tabelas e execuções
+class Destino:
+    def __init__(self, config):
+        self.config = config
+        self.nome = config.nome_destino
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = PoolPostgres(
+                    self.config.pg_pool_min, self.config.pg_pool_max, **self.config.parametros_postgres()
+                )
+            return self._pool
+
+    def fechar(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.fechar()
+                self._pool = None
+
+
+_local = threading.local()
+
+
+# Destino e leitura compartilhada da thread atual. Workers e threads auxiliares (faixas, leitor da fila)
+# recebem os da thread que os criou; sem destino definido vale o primeiro.
+def _contexto():
+    return getattr(_local, "destino", None), getattr(_local, "leitura", None)
+
+
+@contextmanager
+def _no_contexto(destino, leitura=None):
+    anterior = _contexto()
+    _local.destino, _local.leitura = destino, leitura
+    # Com um só destino as métricas ficam como antes, só por tabela
+    rotulo = destino.nome if destino is not None and len(_destinos) > 1 else None
+    try:
+        with METRICAS.no_destino(rotulo):
+            yield
+    finally:
+        _local.destino, _local.leitura = anterior
+
+
+def _com_contexto(funcao):
+    destino, leitura = _contexto()
+
+    def executar(*args, **kwargs):
+        with _no_contexto(destino, leitura):
+            return funcao(*args, **kwargs)
+
+    return executar
+
+
+def _obter_pool():
+    return (_contexto()[0] or _destinos[0]).pool()
+
+
+# Um cursor DuckDB (conexão duplicada) por thread worker; refeito se a conexão foi trocada por configurar()
+def _cursor_duckdb():
+    conn = _conexao_duckdb()
+    if getattr(_local, "conn_duckdb", None) is not conn:
+        _local.conn_duckdb, _local.cursor_duckdb = conn, conn.cursor()
+    return _local.cursor_duckdb
+
+
+def fechar_conexoes():
+    global conn_duckdb
+    for destino in _destinos:
+        destino.fechar()
+    with _conn_lock:
+        if conn_duckdb is not None:
+            conn_duckdb.close()
+            conn_duckdb = None
+
+
+def criar_tabela_controle(cursor_supabase):
+    tabela_controle = "controle_cargas"
+    query_criar_tabela = f"""
+    CREATE TABLE IF NOT EXISTS {tabela_controle} (
+        tabela_nome TEXT PRIMARY KEY,
+        ultima_carga TIMESTAMP,
+        linhas_carregadas INT
+    );
+    """
+    try:
+        cursor_supabase.execute(query_criar_tabela)
+        cursor_supabase.execute(f"ALTER TABLE {tabela_controle} ADD COLUMN IF NOT EXISTS coluna_watermark TEXT")
+        cursor_supabase.execute(f"ALTER TABLE {tabela_controle} ADD COLUMN IF NOT EXISTS ultimo_watermark TEXT")
+        # 'carregando' enquanto uma carga em streaming tem checkpoints mas ainda não terminou
+        cursor_supabase.execute(
+            f"ALTER TABLE {tabela_controle} ADD COLUMN IF NOT EXISTS status TEXT NOT NULL DEFAULT 'concluida'"
+        )
+        # Linhas e watermark da última carga concluída: o --restart descarta só o que veio depois deles.
+        # Nulos enquanto a primeira carga da tabela não termina.
+        cursor_supabase.execute(f"ALTER TABLE {tabela_controle} ADD COLUMN IF NOT EXISTS linhas_concluidas BIGINT")
+        cursor_supabase.execute(f"ALTER TABLE {tabela_controle} ADD COLUMN IF NOT EXISTS watermark_concluido TEXT")
+        cursor_supabase.execute(
+            f"""
+            UPDATE {tabela_controle} SET linhas_concluidas = linhas_carregadas, watermark_concluido = ultimo_watermark
+            WHERE status = 'concluida' AND linhas_concluidas IS NULL
+            """
+        )
+        cursor_supabase.execute(
+            """
+            CREATE TABLE IF NOT EXISTS controle_particoes (
+                tabela_nome TEXT,
+                particao INT,
+                rowid_inicio BIGINT,
+                rowid_fim BIGINT,
+                linhas BIGINT,
+                concluida_em TIMESTAMP,
+                PRIMARY KEY (tabela_nome, particao)
+            );
+            """
+        )
+        cursor_supabase.execute(
+            """
+            CREATE TABLE IF NOT EXISTS controle_hashes (
+                tabela_nome TEXT,
+                chunk BIGINT,
+                hash TEXT,
+                linhas BIGINT,
+                PRIMARY KEY (tabela_nome, chunk)
+            );
+            """
+        )
+        logger.info(f"Tabela de controle '{tabela_controle}' criada ou verificada.")
+    except psycopg2.Error as e:
+        logger.error(f"Erro ao criar tabela de controle: {e}")
+        raise
+
+
+# Serialização no formato texto do COPY (tab como separador, \N para nulo)
+def _valor_copy(valor):
+    if valor is None:
+        return "\\N"
+    if isinstance(valor, bool):
+        return "t" if valor else "f"
+    if isinstance(valor, (bytes, bytearray, memoryview)):
+        return "\\\\x" + bytes(valor).hex()
+    if isinstance(valor, (list, tuple)):
+        texto = "{" + ",".join(_elemento_array(v) for v in valor) + "}"
+    elif isinstance(valor, dict):
+        texto = json.dumps(valor, default=str)
+    elif isinstance(valor, datetime):
+        texto = valor.isoformat(sep=" ")
+    elif isinstance(valor, date):
+        texto = valor.isoformat()
+    else:
+        texto = str(valor)
+    return texto.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+def _elemento_array(valor):
+    if valor is None:
+        return "NULL"
+    # Arrays aninhados (multidimensionais) ficam como {...} sem aspas, um nível dentro do outro
+    if isinstance(valor, (list, tuple)):
+        return "{" + ",".join(_elemento_array(v) for v in valor) + "}"
+    texto = valor.isoformat(sep=" ") if isinstance(valor, datetime) else str(valor)
+    return '"' + texto.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _buffer_copy(lote):
+    buffer = io.StringIO()
+    for linha in lote:
+        buffer.write("\t".join(_valor_copy(v) for v in linha))
+        buffer.write("\n")
+    buffer.seek(0)
+    return buffer
+
+
+# Bytes do texto em UTF-8 (o que segue para o Postgres); texto só ASCII dispensa a codificação
+def _bytes_texto(texto):
+    return len(texto) if texto.isascii() else len(texto.encode())
+
+
+def _copiar(cursor_supabase, query_copy, nome_tabela, lote):
+    texto = getattr(lote, "texto", None)
+    buffer = io.StringIO(texto) if texto is not None else _buffer_copy(lote)
+    cursor_supabase.copy_expert(query_copy, buffer)
+    METRICAS.somar(nome_tabela, "bytes_enviados", _bytes_texto(texto if texto is not None else buffer.getvalue()))
+
+
+# Estimativa grosseira do tamanho em memória (objetos Python) de um valor por tipo DuckDB
+_BYTES_POR_TIPO = {
+    "BOOLEAN": 8,
+    "TINYINT": 32,
+    "SMALLINT": 32,
+    "INTEGER": 32,
+    "BIGINT": 36,
+    "HUGEINT": 44,
+    "FLOAT": 24,
+    "DOUBLE": 24,
+    "DATE": 40,
+    "TIME": 48,
+    "TIMESTAMP": 56,
+    "TIMESTAMP WITH TIME ZONE": 64,
+    "UUID": 64,
+}
+_BYTES_TIPO_VARIAVEL = 128
+
+
+def _bytes_por_linha(duck_schema):
+    total = 56 + 8 * len(duck_schema)  # tupla + ponteiros
+    for col in duck_schema:
+        tipo = col[1].upper()
+        if tipo.startswith("DECIMAL"):
+            total += 104
+        else:
+            total += _BYTES_POR_TIPO.get(tipo, _BYTES_TIPO_VARIAVEL)
+    return total
+
+
+def _tamanho_lote(duck_schema):
+    if _config.memoria_maxima_mb <= 0:
+        return _config.batch_size
+    # Cada stream ativo segura uma conexão do pool e, por lote em trânsito (fila + leitor + escritor),
+    # o lote em Python e o buffer do COPY. Cada destino tem pool e filas próprios: o teto é repartido entre eles
+    lotes_em_transito = _config.fila_lotes + 2 if _config.fila_lotes > 0 else 1
+    streams = max(_config.max_workers, _config.pg_pool_max) * 2 * lotes_em_transito * max(len(_destinos), 1)
+    orcamento_worker = _config.memoria_maxima_mb * 1024 * 1024 // streams
+    return max(1, min(_config.batch_size, orcamento_worker // _bytes_por_linha(duck_schema)))
+
+
+# Leitura em streaming do DuckDB: um cursor próprio por leitura (o resultado fica aberto
+# enquanto o cursor do worker segue livre) e fetchmany em blocos fixos. Com vários destinos
+# na mesma tabela, a leitura passa pela _LeituraCompartilhada da thread.
+def _ler_lotes(query, tamanho_lote, params=None):
+    leitura = _contexto()[1]
+    if leitura is not None:
+        return leitura.ler(query, tamanho_lote, params)
+    return _ler_duckdb(query, tamanho_lote, params)
+
+
+# ORDER BY das leituras de carga. Na leitura compartilhada o rowid entra como desempate: um destino
+# desligado refaz a consulta e pula pela posição os lotes já recebidos, o que exige a mesma ordem nas
+# duas leituras. Lendo sozinho, a ordem de inserção do DuckDB basta e o sort extra não é pago.
+def _ordem_leitura(coluna_watermark=None):
+    colunas = [coluna_watermark] if coluna_watermark else []
+    if _contexto()[1] is not None:
+        colunas.append("rowid")
+    return f" ORDER BY {', '.join(colunas)}" if colunas else ""
+
+
+def _ler_duckdb(query, tamanho_lote, params=None):
+    cursor_duckdb = _conexao_duckdb().cursor()
+    try:
+        resultado = cursor_duckdb.execute(query, params or [])
+        while True:
+            lote = resultado.fetchmany(tamanho_lote)
+            if not lote:
+                break
+            yield lote
+    finally:
+        cursor_duckdb.close()
+
+
+# Lote com o texto do COPY já montado pela thread leitora (o mesmo texto serve a todos os destinos)
+class _LoteSerializado(list):
+    texto = None
+
+
+def _serializar(lote):
+    lote = _LoteSerializado(lote)
+    lote.texto = _buffer_copy(lote).getvalue()
+    return lote
+
+
+_FIM_LOTES = object()
+
+
+# Leitor em thread própria: lê (e serializa) os lotes enquanto o escritor envia os anteriores.
+# A fila limitada segura o leitor quando a escrita atrasa, e um erro em qualquer lado encerra os dois.
+def _sobrepor_leitura(lotes, nome_tabela, serializar):
+    fila = queue.Queue(maxsize=_config.fila_lotes)
+    cancelado = threading.Event()
+
+    def entregar(item):
+        inicio = time.perf_counter()
+        while not cancelado.is_set():
+            try:
+                fila.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        METRICAS.somar(nome_tabela, "bloqueio_fila_segundos", time.perf_counter() - inicio)
+
+    def produzir():
+        try:
+            for lote in lotes:
+                if cancelado.is_set():
+                    break
+                if serializar and lote and not isinstance(lote, _LoteSerializado):
+                    lote = _serializar(lote)
+                entregar(lote)
+            entregar(_FIM_LOTES)
+        except BaseException as e:
+            entregar(e)
+        finally:
+            if hasattr(lotes, "close"):
+                lotes.close()
+
+    leitor = threading.Thread(target=_com_contexto(produzir), name=f"leitor-{nome_tabela}", daemon=True)
+    leitor.start()
+    try:
+        while True:
+            item = fila.get()
+            if item is _FIM_LOTES:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        cancelado.set()
+        # Esvazia a fila para liberar um put() pendente e espera o leitor fechar o cursor DuckDB
+        while leitor.is_alive():
+            try:
+                fila.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        leitor.join()
+
+
+# ===== Vários destinos: uma leitura do DuckDB repartida entre os escritores =====
+# Destinos no mesmo ponto da carga de uma tabela (mesma ação, mesmo controle) emitem as mesmas consultas.
+# Cada consulta roda uma vez: quem chega primeiro espera os demais (até _ESPERA_ENCONTRO segundos) e
+# uma thread lê e serializa os lotes, pondo cada um na fila de cada destino. Quem chega depois, ou
+# está em outro ponto, lê sozinho.
+_ESPERA_ENCONTRO = 5.0
+
+
+class _Assinatura:
+    def __init__(self):
+        self.fila = queue.Queue(maxsize=max(_config.fila_lotes, 1))
+        self.ativa = True
+        self.desligada = False
+        self.bloqueio = 0.0
+
+
+class _Difusao:
+    def __init__(self, query, tamanho_lote, params):
+        self.query, self.tamanho_lote, self.params = query, tamanho_lote, params
+        self.assinaturas = []
+        self.iniciada = False
+
+    def iniciar(self):
+        threading.Thread(target=self._difundir, name="leitura-compartilhada", daemon=True).start()
+
+    # Fila cheia segura a leitura de todos. Só conta como atraso a espera enquanto outro destino está
+    # com a fila vazia (parado por causa deste); quem acumula espera_destino_lento segundos assim é
+    # desligado e continua com leitura própria
+    def _entregar(self, assinatura, item):
+        while assinatura.ativa:
+            inicio = time.perf_counter()
+            try:
+                assinatura.fila.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                if any(outra.fila.empty() for outra in self._ligadas() if outra is not assinatura):
+                    assinatura.bloqueio += time.perf_counter() - inicio
+                    if assinatura.bloqueio >= _config.espera_destino_lento:
+                        assinatura.desligada = True
+                        return
+
+    def _ligadas(self):
+        return [a for a in self.assinaturas if a.ativa and not a.desligada]
+
+    def _difundir(self):
+        lotes = _ler_duckdb(self.query, self.tamanho_lote, self.params)
+        fim = _FIM_LOTES
+        try:
+            for lote in lotes:
+                ligadas = self._ligadas()
+                if not ligadas:
+                    break
+                if _config.usar_copy:
+                    lote = _serializar(lote)
+                for assinatura in ligadas:
+                    self._entregar(assinatura, lote)
+        except BaseException as e:
+            fim = e
+        finally:
+            lotes.close()
+        for assinatura in self._ligadas():
+            self._entregar(assinatura, fim)
+
+    def lotes(self, assinatura):
+        recebidos = 0
+        try:
+            while True:
+                try:
+                    item = assinatura.fila.get(timeout=0.1)
+                except queue.Empty:
+                    if assinatura.desligada:
+                        break
+                    continue
+                if item is _FIM_LOTES:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                recebidos += 1
+                yield item
+            # Desligado por lentidão: refaz a consulta sozinho e pula os lotes já recebidos
+            destino = _contexto()[0]
+            logger.warning(
+                f"Destino {destino.nome if destino else ''} desligado da leitura compartilhada por lentidão "
+                f"após {recebidos} lotes; seguindo com leitura própria."
+            )
+            lotes = _ler_duckdb(self.query, self.tamanho_lote, self.params)
+            try:
+                for indice, lote in enumerate(lotes):
+                    if indice >= recebidos:
+                        yield lote
+            finally:
+                lotes.close()
+        finally:
+            assinatura.ativa = False
+
+
+class _LeituraCompartilhada:
+    def __init__(self, participantes):
+        self._cond = threading.Condition()
+        self._participantes = participantes
+        self._abertas = {}
+        self._atendidos = {}
+
+    # Destino terminou a tabela (ou falhou): ninguém mais espera por ele
+    def sair(self):
+        with self._cond:
+            self._participantes -= 1
+            self._cond.notify_all()
+
+    def ler(self, query, tamanho_lote, params=None):
+        chave = (query, tamanho_lote, repr(params))
+        assinatura = _Assinatura()
+        with self._cond:
+            difusao = self._abertas.get(chave)
+            if difusao is None:
+                difusao = self._abertas[chave] = _Difusao(query, tamanho_lote, params)
+            difusao.assinaturas.append(assinatura)
+            self._cond.notify_all()
+            prazo = time.monotonic() + _ESPERA_ENCONTRO
+            while not difusao.iniciada:
+                restante = prazo - time.monotonic()
+                esperados = self._participantes - self._atendidos.get(chave, 0)
+                if len(difusao.assinaturas) >= esperados or restante <= 0:
+                    difusao.iniciada = True
+                    del self._abertas[chave]
+                    self._atendidos[chave] = self._atendidos.get(chave, 0) + len(difusao.assinaturas)
+                    difusao.iniciar()
+                    break
+                self._cond.wait(restante)
+        yield from difusao.lotes(assinatura)
+
+
+# Escrita em massa: COPY ... FROM STDIN por lote, com fallback para INSERT multi-linha
+def _escrever_lotes(cursor_supabase, nome_tabela, colunas_nomes, lotes, progresso=None):
+    colunas_sql = ", ".join(colunas_nomes)
+    query_copy = f"COPY {nome_tabela} ({colunas_sql}) FROM STDIN"
+    query_inserir = f"INSERT INTO {nome_tabela} ({colunas_sql}) VALUES %s"
+
+    usar_copy = _config.usar_copy
+    copy_verificado = False
+    total = 0
+    qtd_lotes = 0
+    inicio = time.perf_counter()
+    lotes = iter(_sobrepor_leitura(lotes, nome_tabela, usar_copy) if _config.fila_lotes > 0 else lotes)
+
+    try:
+        while True:
+            # Tempo parado no next() = leitura no DuckDB (ou espera pela fila); o resto = escrita no Postgres
+            with METRICAS.fase(nome_tabela, "leitura"):
+                lote = next(lotes, None)
+            if lote is None:
+                break
+            if not lote:
+                continue
+            METRICAS.somar(nome_tabela, "linhas_lidas", len(lote))
+            if progresso:
+                progresso.antes_do_lote(lote)
+            with METRICAS.fase(nome_tabela, "escrita"):
+                if usar_copy and not copy_verificado:
+                    # Só o primeiro lote usa savepoint: depois que o COPY funciona,
+                    # qualquer erro é de dados e deve abortar a carga.
+                    cursor_supabase.execute("SAVEPOINT copy_lote")
+                    try:
+                        _copiar(cursor_supabase, query_copy, nome_tabela, lote)
+                        cursor_supabase.execute("RELEASE SAVEPOINT copy_lote")
+                        copy_verificado = True
+                    except psycopg2.Error as e:
+                        cursor_supabase.execute("ROLLBACK TO SAVEPOINT copy_lote")
+                        logger.warning(f"COPY indisponível para {nome_tabela} ({e}). Usando INSERT em lotes.")
+                        METRICAS.somar(nome_tabela, "retentativas")
+                        usar_copy = False
+                elif usar_copy:
+                    _copiar(cursor_supabase, query_copy, nome_tabela, lote)
+                if not usar_copy:
+                    extras.execute_values(cursor_supabase, query_inserir, lote, page_size=len(lote))
+                    # page_size=len(lote): um único INSERT por lote, e cursor.query é o comando enviado
+                    METRICAS.somar(nome_tabela, "bytes_enviados", len(cursor_supabase.query or b""))
+            total += len(lote)
+            qtd_lotes += 1
+            METRICAS.somar(nome_tabela, "linhas_escritas", len(lote))
+            METRICAS.somar(nome_tabela, "lotes")
+            if progresso:
+                progresso.depois_do_lote(lote)
+    finally:
+        # Encerra a leitura também quando a escrita falha: cursor DuckDB e thread leitora não ficam para trás
+        if hasattr(lotes, "close"):
+            lotes.close()
+
+    duracao = time.perf_counter() - inicio
+    taxa = total / duracao if duracao > 0 else 0.0
+    logger.info(
+        f"{nome_tabela}: {total} linhas em {qtd_lotes} lotes, {duracao:.2f}s "
+        f"({taxa:,.0f} linhas/s, {'COPY' if usar_copy else 'INSERT em lotes'})."
+    )
+    return total
+
+
+# Watermark: guarda o maior valor visto da coluna monotônica enquanto os lotes passam
+def _texto_watermark(valor):
+    if valor is None:
+        return None
+    return valor.isoformat(sep=" ") if isinstance(valor, datetime) else str(valor)
+
+
+def _registrar_progresso(cursor_supabase, nome_tabela, linhas_carregadas, coluna_watermark, ultimo_watermark, status):
+    cursor_supabase.execute(
+        """
+        INSERT INTO controle_cargas
+            (tabela_nome, ultima_carga, linhas_carregadas, coluna_watermark, ultimo_watermark, status,
+             linhas_concluidas, watermark_concluido)
+        VALUES (%s, %s, %s, %s, %s, %s,
+                CASE WHEN %s = 'concluida' THEN %s END, CASE WHEN %s = 'concluida' THEN %s END)
+        ON CONFLICT (tabela_nome) DO UPDATE SET
+            ultima_carga = EXCLUDED.ultima_carga,
+            linhas_carregadas = EXCLUDED.linhas_carregadas,
+            coluna_watermark = EXCLUDED.coluna_watermark,
+            ultimo_watermark = COALESCE(EXCLUDED.ultimo_watermark, controle_cargas.ultimo_watermark),
+            status = EXCLUDED.status,
+            linhas_concluidas = CASE WHEN EXCLUDED.status = 'concluida'
+                THEN EXCLUDED.linhas_carregadas ELSE controle_cargas.linhas_concluidas END,
+            watermark_concluido = CASE WHEN EXCLUDED.status = 'concluida'
+                THEN COALESCE(EXCLUDED.ultimo_watermark, controle_cargas.ultimo_watermark)
+                ELSE controle_cargas.watermark_concluido END
+        """,
+        (nome_tabela, datetime.now(), linhas_carregadas, coluna_watermark, ultimo_watermark, status,
+         status, linhas_carregadas, status, ultimo_watermark),
+    )
+
+
+# Progresso de uma carga em streaming. A cada checkpoint_linhas linhas grava o total e o watermark
+# em controle_cargas e faz commit junto com os dados: uma nova execução retoma do último checkpoint
+# (pelo watermark, ou pelo OFFSET de linhas_carregadas nas tabelas sem watermark).
+class _ProgressoCarga:
+    def __init__(self, conn_supabase, cursor_supabase, nome_tabela, linhas_carregadas,
+                 coluna_watermark=None, indice_watermark=None, ultimo_watermark=None):
+        self.conn_supabase = conn_supabase
+        self.cursor_supabase = cursor_supabase
+        self.nome_tabela = nome_tabela
+        self.coluna_watermark = coluna_watermark
+        self.indice_watermark = indice_watermark
+        self.linhas = linhas_carregadas or 0
+        self.escritas = 0
+        self.pendentes = 0
+        self.ultimo_valor = None
+        self.ultimo_watermark = ultimo_watermark
+
+    @property
+    def watermark(self):
+        return _texto_watermark(self.ultimo_valor) or self.ultimo_watermark
+
+    def antes_do_lote(self, lote):
+        if _config.checkpoint_linhas <= 0 or self.pendentes < _config.checkpoint_linhas:
+            return
+        # Com ORDER BY watermark, só fecha o checkpoint quando o próximo lote começa em outro valor:
+        # a retomada usa "> watermark" e pularia linhas empatadas no limite
+        if self.indice_watermark is not None and lote[0][self.indice_watermark] == self.ultimo_valor:
+            return
+        self.gravar("carregando")
+        _commit(self.conn_supabase, self.nome_tabela)
+        METRICAS.somar(self.nome_tabela, "checkpoints")
+        self.pendentes = 0
+
+    def depois_do_lote(self, lote):
+        self.linhas += len(lote)
+        self.escritas += len(lote)
+        self.pendentes += len(lote)
+        if self.indice_watermark is not None:
+            # Ordem crescente com NULLs no fim: o último valor não nulo é o maior até aqui
+            for linha in reversed(lote):
+                if linha[self.indice_watermark] is not None:
+                    self.ultimo_valor = linha[self.indice_watermark]
+                    break
+
+    def gravar(self, status):
+        _registrar_progresso(
+            self.cursor_supabase, self.nome_tabela, self.linhas, self.coluna_watermark, self.watermark, status
+        )
+
+
+# Adiciona no Supabase as colunas que só existem no DuckDB
+def _sincronizar_schema(cursor_supabase, cursor_duckdb, nome_tabela):
+    # Schema do DuckDB
+    duck_schema = cursor_duckdb.execute(f"DESCRIBE {nome_tabela}").fetchall()
+    duck_columns = {col[0]: col[1] for col in duck_schema}
+
+    # Schema Supabase
+    cursor_supabase.execute(
+        """
+        SELECT column_name, data_type
+        FROM information_schema.columns
+        WHERE table_schema = 'public' AND table_name = %s
+        """,
+        (nome_tabela,),
+    )
+    supa_schema = cursor_supabase.fetchall()
+    supa_columns = {col[0]: col[1] for col in supa_schema}
+
+    # Adiciona colunas DuckDB x Supabase
+    for col, dt in duck_columns.items():
+        if col not in supa_columns:
+            query_alter = f"ALTER TABLE {nome_tabela} ADD COLUMN {col} {dt};"
+            logger.info(f"Adicionando coluna '{col}' em {nome_tabela} no Supabase.")
+            cursor_supabase.execute(query_alter)
+    return duck_schema
+
+
+def _deve_particionar(cursor_duckdb, nome_tabela, plano=None, linhas=None):
+    if _config.limiar_particao <= 0 or _config.particoes <= 1:
+        return False
+    if linhas is not None:
+        return linhas >= _config.limiar_particao
+    if plano:
+        return plano["linhas_estimadas"] >= _config.limiar_particao
+    estimativa = cursor_duckdb.execute(
+        "SELECT estimated_size FROM duckdb_tables() WHERE table_name = ?", [nome_tabela]
+    ).fetchone()
+    return bool(estimativa) and estimativa[0] >= _config.limiar_particao
+
+
+# Contagem mantida pela DuckDBPipeline em table_stats; COUNT(*) só para tabelas fora do catálogo.
+# Dados alterados fora da pipeline exigem analyze_table/analyze antes da sincronização.
+def _contar_linhas(cursor_duckdb, nome_tabela, plano=None):
+    if plano:
+        linhas = plano["linhas_catalogo"]
+    else:
+        try:
+            linha = cursor_duckdb.execute(
+                "SELECT row_count FROM table_stats WHERE table_name = ?", [nome_tabela]
+            ).fetchone()
+        except duckdb.CatalogException:
+            linha = None
+        linhas = linha[0] if linha else None
+    if linhas is None:
+        linhas = cursor_duckdb.execute(f"SELECT COUNT(*) FROM {nome_tabela}").fetchone()[0]
+    return linhas
+
+
+def _faixas_gravadas(cursor_supabase, nome_tabela):
+    cursor_supabase.execute(
+        """
+        SELECT particao, rowid_inicio, rowid_fim, concluida_em IS NOT NULL
+        FROM controle_particoes WHERE tabela_nome = %s ORDER BY particao
+        """,
+        (nome_tabela,),
+    )
+    return cursor_supabase.fetchall()
+
+
+# Faixas de rowid da carga particionada. Se uma execução anterior parou no meio,
+# as faixas gravadas são reaproveitadas e só as pendentes são refeitas.
+# limites: (menor, maior) rowid do delta, para as faixas não varrerem a tabela inteira.
+def _preparar_particoes(cursor_supabase, cursor_duckdb, nome_tabela, limites=None):
+    particoes = _faixas_gravadas(cursor_supabase, nome_tabela)
+    if particoes:
+        logger.info(f"Retomando carga particionada de {nome_tabela}: {sum(1 for p in particoes if not p[3])} faixas pendentes.")
+        return particoes
+
+    if limites is None:
+        limites = cursor_duckdb.execute(f"SELECT MIN(rowid), MAX(rowid) FROM {nome_tabela}").fetchone()
+    menor, maior = limites
+    if menor is None:
+        return []
+    passo = (maior - menor) // _config.particoes + 1
+    particoes = [
+        (indice, inicio, min(inicio + passo - 1, maior), False)
+        for indice, inicio in enumerate(range(menor, maior + 1, passo))
+    ]
+    extras.execute_values(
+        cursor_supabase,
+        "INSERT INTO controle_particoes (tabela_nome, particao, rowid_inicio, rowid_fim) VALUES %s",
+        [(nome_tabela, indice, inicio, fim) for indice, inicio, fim, _ in particoes],
+    )
+    return particoes
+
+
+# Cada faixa usa sua própria conexão do pool e grava dados + checkpoint na mesma transação
+def _carregar_particao(nome_tabela, colunas_nomes, tamanho_lote, particao, filtro, params, ordem):
+    indice, inicio, fim, _ = particao
+    condicoes = " AND ".join(["rowid BETWEEN ? AND ?"] + ([filtro] if filtro else []))
+    query = f"SELECT * FROM {nome_tabela} WHERE {condicoes}{ordem}"
+    with _obter_pool().conexao(nome_tabela) as conn_supabase:
+        with conn_supabase.cursor() as cursor_supabase:
+            linhas = _escrever_lotes(
+                cursor_supabase,
+                nome_tabela,
+                colunas_nomes,
+                _ler_lotes(query, tamanho_lote, [inicio, fim] + list(params or [])),
+            )
+            cursor_supabase.execute(
+                """
+                UPDATE controle_particoes SET linhas = %s, concluida_em = %s
+                WHERE tabela_nome = %s AND particao = %s
+                """,
+                (linhas, datetime.now(), nome_tabela, indice),
+            )
+        _commit(conn_supabase, nome_tabela)
+    return linhas
+
+
+def _carregar_particionado(tarefa):
+    nome_tabela = tarefa["nome_tabela"]
+    coluna_watermark = tarefa["coluna_watermark"]
+    filtro, params = tarefa["filtro"], tarefa["params"]
+    ordem = _ordem_leitura(coluna_watermark)
+    pendentes = [p for p in tarefa["particoes"] if not p[3]]
+    logger.info(f"Tabela {nome_tabela}: carregando {len(pendentes)} faixas em paralelo.")
+
+    with ThreadPoolExecutor(max_workers=_config.particoes) as executor:
+        futures = [
+            executor.submit(
+                _com_contexto(_carregar_particao),
+                nome_tabela,
+                tarefa["colunas_nomes"],
+                tarefa["tamanho_lote"],
+                particao,
+                filtro,
+                params,
+                ordem,
+            )
+            for particao in pendentes
+        ]
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception:
+                # Uma faixa falhou: as que ainda não começaram nem saem da fila (as concluídas ficam no checkpoint)
+                for pendente in futures:
+                    pendente.cancel()
+                raise
+
+    # Só com todas as faixas concluídas o controle_cargas avança
+    maximo = None
+    if coluna_watermark and tarefa["particoes"]:
+        primeira, ultima = tarefa["particoes"][0], tarefa["particoes"][-1]
+        condicoes = " AND ".join(["rowid BETWEEN ? AND ?"] + ([filtro] if filtro else []))
+        maximo = _cursor_duckdb().execute(
+            f"SELECT MAX({coluna_watermark}) FROM {nome_tabela} WHERE {condicoes}",
+            [primeira[1], ultima[2]] + list(params or []),
+        ).fetchone()[0]
+
+    with _obter_pool().conexao(nome_tabela) as conn_supabase:
+        with conn_supabase.cursor() as cursor_supabase:
+            cursor_supabase.execute(
+                "SELECT COALESCE(SUM(linhas), 0) FROM controle_particoes WHERE tabela_nome = %s",
+                (nome_tabela,),
+            )
+            linhas = cursor_supabase.fetchone()[0]
+            cursor_supabase.execute(
+                """
+                INSERT INTO controle_cargas
+                    (tabela_nome, ultima_carga, linhas_carregadas, coluna_watermark, ultimo_watermark, status,
+                     linhas_concluidas, watermark_concluido)
+                VALUES (%s, %s, %s, %s, %s, 'concluida', %s, %s)
+                ON CONFLICT (tabela_nome) DO UPDATE SET
+                    ultima_carga = EXCLUDED.ultima_carga,
+                    linhas_carregadas = controle_cargas.linhas_carregadas + EXCLUDED.linhas_carregadas,
+                    coluna_watermark = EXCLUDED.coluna_watermark,
+                    ultimo_watermark = COALESCE(EXCLUDED.ultimo_watermark, controle_cargas.ultimo_watermark),
+                    status = EXCLUDED.status,
+                    linhas_concluidas = controle_cargas.linhas_carregadas + EXCLUDED.linhas_carregadas,
+                    watermark_concluido = COALESCE(EXCLUDED.ultimo_watermark, controle_cargas.ultimo_watermark)
+                """,
+                (nome_tabela, datetime.now(), linhas, coluna_watermark, _texto_watermark(maximo), linhas,
+                 _texto_watermark(maximo)),
+            )
+            cursor_supabase.execute("DELETE FROM controle_particoes WHERE tabela_nome = %s", (nome_tabela,))
+        _commit(conn_supabase, nome_tabela)
+    logger.info(f"Tabela {nome_tabela}: carga particionada concluída ({linhas} linhas).")
+
+
+# Sincronizar DB x Supabase. Com um item do plano (planejar_sincronizacao), controle e schema
+# já vêm lidos e os ALTERs já foram aplicados
+def processar_tabela(nome_tabela, plano=None):
+    try:
+        cursor_duckdb = _cursor_duckdb()
+        tarefa_particionada = None
+        with _obter_pool().conexao(nome_tabela) as conn_supabase:
+            with conn_supabase.cursor() as cursor_supabase:
+                
+                if plano:
+                    controle = plano["controle"]
+                else:
+                    with METRICAS.fase(nome_tabela, "controle"):
+                        cursor_supabase.execute(
+                            """
+                            SELECT ultima_carga, linhas_carregadas, ultimo_watermark, status
+                            FROM controle_cargas WHERE tabela_nome = %s
+                            """,
+                            (nome_tabela,),
+                        )
+                        controle = cursor_supabase.fetchone()
+                existe = controle is not None
+
+                if existe:
+                    # Alterações no schema e dados
+                    ultima_carga, linhas_carregadas, ultimo_watermark, status = controle
+                    if status != "concluida":
+                        logger.info(f"Tabela {nome_tabela}: retomando carga parcial ({linhas_carregadas} linhas já gravadas).")
+                    
+                    if plano:
+                        duck_schema = plano["duck_schema"]
+                    else:
+                        with METRICAS.fase(nome_tabela, "schema"):
+                            duck_schema = _sincronizar_schema(cursor_supabase, cursor_duckdb, nome_tabela)
+                        _commit(conn_supabase, nome_tabela)
+                    duck_columns = {col[0]: col[1] for col in duck_schema}
+
+                    colunas_nomes = [col[0] for col in duck_schema]
+                    coluna_watermark = _config.watermarks.get(nome_tabela)
+                    if coluna_watermark:
+                        if coluna_watermark not in duck_columns:
+                            raise ValueError(f"Coluna de watermark '{coluna_watermark}' não existe em {nome_tabela}.")
+                        # Delta por watermark: lê só o que passou do último valor carregado
+                        if ultimo_watermark is None:
+                            # Tabela carregada antes de ter watermark: parte do máximo já presente no destino
+                            cursor_supabase.execute(f"SELECT MAX({coluna_watermark}) FROM {nome_tabela}")
+                            ultimo_watermark = _texto_watermark(cursor_supabase.fetchone()[0])
+
+                        tipo_watermark = duck_columns[coluna_watermark]
+                        if ultimo_watermark is None:
+                            filtro_delta, params_delta = None, None
+                        else:
+                            filtro_delta = f"{coluna_watermark} > CAST(? AS {tipo_watermark})"
+                            params_delta = [ultimo_watermark]
+
+                        if filtro_delta:
+                            # Delta: decide e fatia pelas linhas após o watermark, não pela tabela inteira
+                            linhas_delta, *limites = cursor_duckdb.execute(
+                                f"SELECT COUNT(*), MIN(rowid), MAX(rowid) FROM {nome_tabela} WHERE {filtro_delta}",
+                                params_delta,
+                            ).fetchone()
+                            particionar = _deve_particionar(cursor_duckdb, nome_tabela, linhas=linhas_delta)
+                        else:
+                            limites = None
+                            particionar = _deve_particionar(cursor_duckdb, nome_tabela, plano)
+                        # Faixas gravadas por uma execução interrompida são retomadas mesmo abaixo do limiar
+                        if particionar or _faixas_gravadas(cursor_supabase, nome_tabela):
+                            tarefa_particionada = {
+                                "nome_tabela": nome_tabela,
+                                "colunas_nomes": colunas_nomes,
+                                "tamanho_lote": _tamanho_lote(duck_schema),
+                                "coluna_watermark": coluna_watermark,
+                                "filtro": filtro_delta,
+                                "params": params_delta,
+                                "particoes": _preparar_particoes(cursor_supabase, cursor_duckdb, nome_tabela, limites),
+                            }
+                            _commit(conn_supabase, nome_tabela)
+                        else:
+                            where_delta = f" WHERE {filtro_delta}" if filtro_delta else ""
+                            novos_dados = _ler_lotes(
+                                f"SELECT * FROM {nome_tabela}{where_delta}{_ordem_leitura(coluna_watermark)}",
+                                _tamanho_lote(duck_schema),
+                                params_delta,
+                            )
+                            progresso = _ProgressoCarga(
+                                conn_supabase,
+                                cursor_supabase,
+                                nome_tabela,
+                                linhas_carregadas,
+                                coluna_watermark,
+                                colunas_nomes.index(coluna_watermark),
+                                ultimo_watermark,
+                            )
+                            _escrever_lotes(cursor_supabase, nome_tabela, colunas_nomes, novos_dados, progresso)
+                            if progresso.escritas or status != "concluida":
+                                progresso.gravar("concluida")
+                                _commit(conn_supabase, nome_tabela)
+                            else:
+                                conn_supabase.rollback()
+                                logger.info(f"Tabela {nome_tabela} não teve novas linhas após o watermark {ultimo_watermark}.")
+                    else:
+                        # Novas linhas
+                        with METRICAS.fase(nome_tabela, "contagem"):
+                            total_linhas = _contar_linhas(cursor_duckdb, nome_tabela, plano)
+                        if total_linhas > linhas_carregadas:
+                            logger.info(f"Tabela {nome_tabela} tem novas linhas. Carregando...")
+                            novos_dados = _ler_lotes(
+                                f"SELECT * FROM {nome_tabela}{_ordem_leitura()} "
+                                f"LIMIT {total_linhas - linhas_carregadas} OFFSET {linhas_carregadas}",
+                                _tamanho_lote(duck_schema),
+                            )
+
+                            # Novos dados e controle na mesma transação (e nos checkpoints intermediários)
+                            progresso = _ProgressoCarga(conn_supabase, cursor_supabase, nome_tabela, linhas_carregadas)
+                            _escrever_lotes(cursor_supabase, nome_tabela, colunas_nomes, novos_dados, progresso)
+                            progresso.gravar("concluida")
+                            _commit(conn_supabase, nome_tabela)
+                        elif status != "concluida":
+                            _registrar_progresso(
+                                cursor_supabase, nome_tabela, linhas_carregadas, None, None, "concluida"
+                            )
+                            _commit(conn_supabase, nome_tabela)
+                        else:
+                            logger.info(f"Tabela {nome_tabela} não teve alterações em linhas.")
+                else:
+                    # Criar tabela e carregar os dados
+                    logger.info(f"Tabela {nome_tabela} é nova. Carregando...")
+                    with METRICAS.fase(nome_tabela, "schema"):
+                        if plano:
+                            duck_schema = plano["duck_schema"]
+                        else:
+                            duck_schema = cursor_duckdb.execute(f"DESCRIBE {nome_tabela}").fetchall()
+                        colunas_supabase = [f"{col[0]} {col[1]}" for col in duck_schema]
+                        # IF NOT EXISTS: uma carga particionada interrompida já deixou a tabela criada
+                        query_criar_tabela_supabase = f"CREATE TABLE IF NOT EXISTS {nome_tabela} ({', '.join(colunas_supabase)})"
+                        cursor_supabase.execute(query_criar_tabela_supabase)
+                    colunas_nomes = [col[0] for col in duck_schema]
+                    coluna_watermark = _config.watermarks.get(nome_tabela)
+                    _commit(conn_supabase, nome_tabela)
+
+                    # Faixas gravadas por uma execução interrompida são retomadas mesmo abaixo do limiar
+                    if _deve_particionar(cursor_duckdb, nome_tabela, plano) or _faixas_gravadas(cursor_supabase, nome_tabela):
+                        tarefa_particionada = {
+                            "nome_tabela": nome_tabela,
+                            "colunas_nomes": colunas_nomes,
+                            "tamanho_lote": _tamanho_lote(duck_schema),
+                            "coluna_watermark": coluna_watermark,
+                            "filtro": None,
+                            "params": None,
+                            "particoes": _preparar_particoes(cursor_supabase, cursor_duckdb, nome_tabela),
+                        }
+                        _commit(conn_supabase, nome_tabela)
+                    else:
+                        dados = _ler_lotes(
+                            f"SELECT * FROM {nome_tabela}{_ordem_leitura(coluna_watermark)}", _tamanho_lote(duck_schema)
+                        )
+
+                        # A linha de controle nasce 'carregando' e sai no primeiro checkpoint: se a carga cair,
+                        # a próxima execução trata a tabela como existente e retoma do checkpoint
+                        progresso = _ProgressoCarga(
+                            conn_supabase,
+                            cursor_supabase,
+                            nome_tabela,
+                            0,
+                            coluna_watermark,
+                            colunas_nomes.index(coluna_watermark) if coluna_watermark else None,
+                        )
+                        progresso.gravar("carregando")
+                        _escrever_lotes(cursor_supabase, nome_tabela, colunas_nomes, dados, progresso)
+                        progresso.gravar("concluida")
+                        _commit(conn_supabase, nome_tabela)
+
+        # A conexão da tabela já voltou ao pool: as faixas disputam o pool sem deadlock
+        if tarefa_particionada:
+            _carregar_particionado(tarefa_particionada)
+
+    except Exception as e:
+        logger.error(f"Erro ao processar tabela {nome_tabela}: {e}")
+        raise
+
+
+# ===== Modo diff: detecta updates e deletes comparando hashes por chunk de chave =====
+TIPOS_CHAVE_DIFF = ("TINYINT", "SMALLINT", "INTEGER", "BIGINT", "UTINYINT", "USMALLINT", "UINTEGER", "UBIGINT")
+
+
+# Texto de uma coluna para o hash, igual nos dois lados. O CAST para texto não serve para floats
+# (DuckDB escreve 1.0 como '1.0', o Postgres como '1') nem para timestamps com fuso: floats vão para
+# notação científica com os dígitos que o Postgres mantém ao converter para numeric (15 no DOUBLE,
+# 6 no REAL) e timestamps para um formato fixo com microssegundos, em UTC quando têm fuso.
+_FORMATO_FLOAT = {"DOUBLE": 14, "FLOAT8": 14, "FLOAT": 5, "REAL": 5, "FLOAT4": 5}
+_FORMATO_TIMESTAMP_DUCKDB = "%Y-%m-%d %H:%M:%S.%f"
+_FORMATO_TIMESTAMP_POSTGRES = "YYYY-MM-DD HH24:MI:SS.US"
+
+
+def _texto_hash(coluna, tipo, postgres):
+    tipo = tipo.upper()
+    if tipo in _FORMATO_FLOAT:
+        digitos = _FORMATO_FLOAT[tipo]
+        if postgres:
+            return f"ltrim(to_char({coluna}::numeric, '9.{'9' * digitos}EEEE'))"
+        # + 0.0 transforma -0.0 em 0.0, como a conversão para numeric do Postgres
+        return f"printf('%.{digitos}e', CAST({coluna} AS DOUBLE) + 0.0)"
+    if tipo.startswith("TIMESTAMP"):
+        valor = f"({coluna} AT TIME ZONE 'UTC')" if "TIME ZONE" in tipo or tipo == "TIMESTAMPTZ" else coluna
+        if postgres:
+            return f"to_char({valor}, '{_FORMATO_TIMESTAMP_POSTGRES}')"
+        return f"strftime({valor}, '{_FORMATO_TIMESTAMP_DUCKDB}')"
+    return f"CAST({coluna} AS {'TEXT' if postgres else 'VARCHAR'})"
+
+
+# Hash de linha com a mesma representação textual nos dois lados (NULL vira \N, separador chr(31))
+def _hash_linha_sql(duck_schema, postgres):
+    partes = " || chr(31) || ".join(
+        f"COALESCE({_texto_hash(col[0], col[1], postgres)}, '\\N')" for col in duck_schema
+    )
+    return f"md5({partes})"
+
+
+def _hashes_chunks(cursor, nome_tabela, chave, duck_schema, postgres, expr_chunk):
+    cursor.execute(
+        f"""
+        SELECT {expr_chunk} AS chunk,
+               md5(string_agg({_hash_linha_sql(duck_schema, postgres)}, '' ORDER BY {chave})),
+               COUNT(*)
+        FROM {nome_tabela}
+        GROUP BY 1
+        """
+    )
+    return {chunk: (hash_chunk, linhas) for chunk, hash_chunk, linhas in cursor.fetchall()}
+
+
+def _hashes_linhas(cursor, nome_tabela, chave, duck_schema, postgres, chunk):
+    placeholder = "%s" if postgres else "?"
+    inicio, fim = chunk * _config.tamanho_chunk_hash, (chunk + 1) * _config.tamanho_chunk_hash
+    cursor.execute(
+        f"""
+        SELECT {chave}, {_hash_linha_sql(duck_schema, postgres)}
+        FROM {nome_tabela}
+        WHERE {chave} >= {placeholder} AND {chave} < {placeholder}
+        """,
+        (inicio, fim),
+    )
+    return dict(cursor.fetchall())
+
+
+def diferenciar_tabela(nome_tabela, plano=None):
+    try:
+        chave = _config.chaves_diff.get(nome_tabela) or _config.watermarks.get(nome_tabela)
+        if not chave:
+            logger.info(f"Tabela {nome_tabela} sem chave para diff (CHAVES_DIFF). Usando carga incremental.")
+            processar_tabela(nome_tabela, plano)
+            return
+
+        cursor_duckdb = _cursor_duckdb()
+        if plano:
+            existe = plano["controle"] is not None
+            duck_schema = plano["duck_schema"]
+        else:
+            with _obter_pool().conexao(nome_tabela) as conn_supabase:
+                with conn_supabase.cursor() as cursor_supabase:
+                    cursor_supabase.execute(
+                        "SELECT EXISTS(SELECT 1 FROM controle_cargas WHERE tabela_nome = %s)",
+                        (nome_tabela,),
+                    )
+                    existe = cursor_supabase.fetchone()[0]
+                    if existe:
+                        with METRICAS.fase(nome_tabela, "schema"):
+                            duck_schema = _sincronizar_schema(cursor_supabase, cursor_duckdb, nome_tabela)
+                        _commit(conn_supabase, nome_tabela)
+
+        if not existe:
+            logger.info(f"Tabela {nome_tabela} ainda não foi carregada. Fazendo carga completa.")
+            processar_tabela(nome_tabela, plano)
+            return
+
+        duck_columns = {col[0]: col[1] for col in duck_schema}
+        if duck_columns.get(chave, "").upper() not in TIPOS_CHAVE_DIFF:
+            raise ValueError(f"Chave de diff '{chave}' de {nome_tabela} precisa ser uma coluna inteira.")
+        coluna_watermark = _config.watermarks.get(nome_tabela)
+        if coluna_watermark not in duck_columns:
+            coluna_watermark = None
+
+        # Máximo do watermark, hashes e linhas comparadas saem do mesmo snapshot do DuckDB: o watermark
+        # gravado no fim cobre exatamente o que o diff escreveu, e o incremental seguinte parte dele
+        cursor_duckdb.begin()
+        try:
+            _aplicar_diff(cursor_duckdb, nome_tabela, chave, duck_schema, coluna_watermark)
+        finally:
+            cursor_duckdb.rollback()
+
+    except Exception as e:
+        logger.error(f"Erro ao diferenciar tabela {nome_tabela}: {e}")
+        raise
+
+
+def _aplicar_diff(cursor_duckdb, nome_tabela, chave, duck_schema, coluna_watermark):
+    colunas_nomes = [col[0] for col in duck_schema]
+    maximo = None
+    if coluna_watermark:
+        maximo = cursor_duckdb.execute(f"SELECT MAX({coluna_watermark}) FROM {nome_tabela}").fetchone()[0]
+
+    with METRICAS.fase(nome_tabela, "hash"):
+        hashes_duck = _hashes_chunks(
+            cursor_duckdb,
+            nome_tabela,
+            chave,
+            duck_schema,
+            False,
+            f"CAST(floor({chave} / {_config.tamanho_chunk_hash}) AS BIGINT)",
+        )
+
+    with _obter_pool().conexao(nome_tabela) as conn_supabase:
+        with conn_supabase.cursor() as cursor_supabase:
+            # Hashes guardados = estado do destino após o último diff; sem eles, calcula no Postgres
+            cursor_supabase.execute(
+                "SELECT chunk, hash, linhas FROM controle_hashes WHERE tabela_nome = %s",
+                (nome_tabela,),
+            )
+            hashes_destino = {chunk: (hash_chunk, linhas) for chunk, hash_chunk, linhas in cursor_supabase.fetchall()}
+            if not hashes_destino:
+                with METRICAS.fase(nome_tabela, "hash"):
+                    hashes_destino = _hashes_chunks(
+                        cursor_supabase,
+                        nome_tabela,
+                        chave,
+                        duck_schema,
+                        True,
+                        f"floor({chave}::numeric / {_config.tamanho_chunk_hash})::bigint",
+                    )
+                hashes_guardados = False
+            else:
+                hashes_guardados = True
+
+            chunks_diferentes = sorted(
+                chunk
+                for chunk in set(hashes_duck) | set(hashes_destino)
+                if hashes_duck.get(chunk, (None,))[0] != hashes_destino.get(chunk, (None,))[0]
+            )
+            logger.info(
+                f"Tabela {nome_tabela}: {len(chunks_diferentes)} de {len(hashes_duck)} chunks com diferença."
+            )
+
+            inseridas = removidas = 0
+            colunas_sql = ", ".join(colunas_nomes)
+            for chunk in chunks_diferentes:
+                linhas_duck = _hashes_linhas(cursor_duckdb, nome_tabela, chave, duck_schema, False, chunk)
+                linhas_destino = _hashes_linhas(cursor_supabase, nome_tabela, chave, duck_schema, True, chunk)
+
+                # Alteradas saem e voltam; só no destino saem; só no DuckDB entram
+                upserts = [k for k, h in linhas_duck.items() if linhas_destino.get(k) != h]
+                remover = [k for k in linhas_destino if k not in linhas_duck or k in upserts]
+                if remover:
+                    with METRICAS.fase(nome_tabela, "escrita"):
+                        cursor_supabase.execute(f"DELETE FROM {nome_tabela} WHERE {chave} = ANY(%s)", (remover,))
+                    removidas += len(remover)
+                    METRICAS.somar(nome_tabela, "linhas_removidas", len(remover))
+                if upserts:
+                    inseridas += _escrever_lotes(
+                        cursor_supabase,
+                        nome_tabela,
+                        colunas_nomes,
+                        _ler_lotes(
+                            f"SELECT {colunas_sql} FROM {nome_tabela} WHERE {chave} IN (SELECT UNNEST(?))",
+                            _tamanho_lote(duck_schema),
+                            [upserts],
+                        ),
+                    )
+
+            # Grava os hashes do DuckDB, que agora valem para o destino
+            if hashes_guardados:
+                cursor_supabase.execute(
+                    "DELETE FROM controle_hashes WHERE tabela_nome = %s AND chunk = ANY(%s)",
+                    (nome_tabela, chunks_diferentes),
+                )
+                novos_hashes = [(c, *hashes_duck[c]) for c in chunks_diferentes if c in hashes_duck]
+            else:
+                novos_hashes = [(c, h, n) for c, (h, n) in hashes_duck.items()]
+            if novos_hashes:
+                extras.execute_values(
+                    cursor_supabase,
+                    "INSERT INTO controle_hashes (tabela_nome, chunk, hash, linhas) VALUES %s",
+                    [(nome_tabela, c, h, n) for c, h, n in novos_hashes],
+                )
+            # Destino igual ao snapshot: o watermark avança até o máximo comparado e cargas parciais
+            # (checkpoints ou faixas pendentes) ficam resolvidas, na mesma transação dos dados
+            _registrar_progresso(
+                cursor_supabase,
+                nome_tabela,
+                sum(n for _, n in hashes_duck.values()),
+                coluna_watermark,
+                _texto_watermark(maximo),
+                "concluida",
+            )
+            cursor_supabase.execute("DELETE FROM controle_particoes WHERE tabela_nome = %s", (nome_tabela,))
+        _commit(conn_supabase, nome_tabela)
+    logger.info(f"Tabela {nome_tabela}: diff aplicado ({inseridas} linhas gravadas, {removidas} removidas).")
+
+
+# Tabelas com carga pela metade: streaming com checkpoints ('carregando') ou faixas particionadas pendentes
+def status_cargas(cursor_supabase):
+    cursor_supabase.execute(
+        """
+        SELECT tabela_nome, COALESCE(c.status, 'carregando'), c.linhas_carregadas, c.ultimo_watermark,
+               c.ultima_carga, COALESCE(p.faixas_pendentes, 0), COALESCE(p.faixas, 0)
+        FROM controle_cargas c
+        FULL JOIN (
+            SELECT tabela_nome,
+                   COUNT(*) FILTER (WHERE concluida_em IS NULL) AS faixas_pendentes,
+                   COUNT(*) AS faixas
+            FROM controle_particoes
+            GROUP BY tabela_nome
+        ) p USING (tabela_nome)
+        WHERE c.status IS DISTINCT FROM 'concluida' OR p.faixas_pendentes > 0
+        ORDER BY tabela_nome
+        """
+    )
+    return cursor_supabase.fetchall()
+
+
+# --restart: descarta dados e checkpoints das cargas parciais. Só a primeira carga interrompida perde a
+# tabela inteira; um delta interrompido volta à última carga concluída (linhas acima do watermark dela)
+def reiniciar_cargas_parciais(cursor_supabase):
+    for tabela in [linha[0] for linha in status_cargas(cursor_supabase)]:
+        cursor_supabase.execute(
+            "SELECT coluna_watermark, linhas_concluidas, watermark_concluido FROM controle_cargas WHERE tabela_nome = %s",
+            (tabela,),
+        )
+        coluna_watermark, linhas_concluidas, watermark_concluido = cursor_supabase.fetchone() or (None, None, None)
+        if linhas_concluidas is None:
+            logger.warning(f"Reiniciando a primeira carga de {tabela}: tabela e checkpoints descartados.")
+            cursor_supabase.execute(f"DROP TABLE IF EXISTS {tabela}")
+            for controle in ("controle_cargas", "controle_particoes", "controle_hashes"):
+                cursor_supabase.execute(f"DELETE FROM {controle} WHERE tabela_nome = %s", (tabela,))
+            continue
+        if coluna_watermark and watermark_concluido is not None:
+            cursor_supabase.execute(f"DELETE FROM {tabela} WHERE {coluna_watermark} > %s", (watermark_concluido,))
+        elif linhas_concluidas == 0:
+            cursor_supabase.execute(f"DELETE FROM {tabela}")
+        else:
+            # Sem watermark o destino não diz quais linhas vieram do delta: ele continua sendo retomado
+            logger.warning(f"{tabela}: delta parcial sem watermark não pode ser descartado; a carga será retomada.")
+            continue
+        logger.warning(
+            f"Reiniciando delta parcial de {tabela}: linhas após o watermark {watermark_concluido} descartadas."
+        )
+        cursor_supabase.execute(
+            """
+            UPDATE controle_cargas
+            SET linhas_carregadas = linhas_concluidas, ultimo_watermark = watermark_concluido, status = 'concluida'
+            WHERE tabela_nome = %s
+            """,
+            (tabela,),
+        )
+        for controle in ("controle_particoes", "controle_hashes"):
+            cursor_supabase.execute(f"DELETE FROM {controle} WHERE tabela_nome = %s", (tabela,))
+
+
+def exibir_status(config=None, destinos=None):
+    _ativar(config, destinos)
+    for destino in _destinos:
+        if len(_destinos) > 1:
+            logger.info(f"Destino {destino.nome}:")
+        try:
+            with _no_contexto(destino):
+                _exibir_status_destino()
+        except psycopg2.Error as e:
+            if len(_destinos) == 1:
+                raise
+            logger.error(f"Destino {destino.nome}: erro ao ler o status: {e}")
+
+
+# Só leitura: nenhum DDL nem commit no destino. Sem as tabelas de controle (ou com as de uma versão
+# anterior às cargas retomáveis, sem a coluna status) não há carga parcial para mostrar.
+def _exibir_status_destino():
+    with _obter_pool().conexao() as conn_supabase:
+        with conn_supabase.cursor() as cursor_supabase:
+            cursor_supabase.execute(
+                """
+                SELECT to_regclass('controle_cargas') IS NOT NULL, to_regclass('controle_particoes') IS NOT NULL,
+                       EXISTS (
+                           SELECT 1 FROM information_schema.columns
+                           WHERE table_schema = current_schema() AND table_name = 'controle_cargas'
+                             AND column_name = 'status'
+                       )
+                """
+            )
+            cargas, particoes, coluna_status = cursor_supabase.fetchone()
+            parciais = status_cargas(cursor_supabase) if cargas and particoes and coluna_status else []
+    if not cargas:
+        logger.info("Nenhuma carga registrada neste destino.")
+        return
+    if not (particoes and coluna_status):
+        logger.info("Tabelas de controle de uma versão anterior, sem cargas retomáveis: nenhuma carga parcial.")
+        return
+    if not parciais:
+        logger.info("Nenhuma carga parcial.")
+        return
+    logger.info(f"{len(parciais)} cargas parciais:")
+    for tabela, status, linhas, watermark, ultima_carga, pendentes, faixas in parciais:
+        faixas_texto = f", faixas pendentes {pendentes}/{faixas}" if faixas else ""
+        logger.info(
+            f"  {tabela}: {status}, {linhas or 0} linhas gravadas, watermark {watermark}, "
+            f"último checkpoint {ultima_carga}{faixas_texto}"
+        )
+
+
+# ===== Planejamento: catálogo lido em lote antes de mover dados =====
+# Uma consulta para todo o controle_cargas, uma para todas as colunas do destino e o catálogo do
+# DuckDB para schemas e estimativas de linhas. O plano pula tabelas sem mudança, reúne os ALTERs
+# e ordena as tabelas da maior para a menor (LPT), para as grandes não ficarem para o fim.
+# O catálogo do DuckDB é lido uma vez e serve o plano de todos os destinos.
+def ler_catalogo():
+    cursor_duckdb = _cursor_duckdb()
+    todas = [tabela[0] for tabela in cursor_duckdb.execute("SHOW TABLES").fetchall()]
+    # As tabelas de controle da DuckDBPipeline não vão para o Postgres
+    nomes_tabelas = [nome for nome in todas if nome not in INTERNAL_TABLES]
+    estimativas = dict(
+        cursor_duckdb.execute(
+            "SELECT table_name, estimated_size FROM duckdb_tables() "
+            "WHERE database_name = current_database() AND schema_name = current_schema()"
+        ).fetchall()
+    )
+    schemas_duck = {}
+    for tabela, coluna, tipo in cursor_duckdb.execute(
+        "SELECT table_name, column_name, data_type FROM duckdb_columns() "
+        "WHERE database_name = current_database() AND schema_name = current_schema() "
+        "ORDER BY table_name, column_index"
+    ).fetchall():
+        schemas_duck.setdefault(tabela, []).append((coluna, tipo))
+    # Contagens exatas do catálogo de estatísticas da DuckDBPipeline, quando existir
+    contagens = {}
+    if "table_stats" in todas:
+        contagens = dict(cursor_duckdb.execute("SELECT table_name, row_count FROM table_stats").fetchall())
+    return {
+        "nomes_tabelas": nomes_tabelas,
+        "estimativas": estimativas,
+        "schemas_duck": schemas_duck,
+        "contagens": contagens,
+        # Maior valor (texto) de cada coluna de watermark, calculado na primeira vez que um destino precisa
+        "maximos": {},
+    }
+
+
+def planejar_sincronizacao(cursor_supabase, modo="incremental", catalogo=None):
+    catalogo = catalogo or ler_catalogo()
+    cursor_duckdb = _cursor_duckdb()
+    nomes_tabelas, estimativas = catalogo["nomes_tabelas"], catalogo["estimativas"]
+    schemas_duck, contagens, maximos = catalogo["schemas_duck"], catalogo["contagens"], catalogo["maximos"]
+
+    cursor_supabase.execute(
+        "SELECT table_name, column_name FROM information_schema.columns WHERE table_schema = 'public'"
+    )
+    colunas_destino = {}
+    for tabela, coluna in cursor_supabase.fetchall():
+        colunas_destino.setdefault(tabela, set()).add(coluna)
+    # O --plan não roda criar_tabela_controle: sem controle_cargas nenhuma tabela foi carregada, e
+    # colunas ainda não migradas valem o padrão que o ALTER daria a elas
+    colunas_controle = colunas_destino.get("controle_cargas", set())
+    controles = {}
+    if colunas_controle:
+        selecao = ", ".join(
+            coluna if coluna in colunas_controle else f"{padrao} AS {coluna}"
+            for coluna, padrao in (
+                ("ultima_carga", "NULL"), ("linhas_carregadas", "NULL"),
+                ("ultimo_watermark", "NULL"), ("status", "'concluida'"),
+            )
+        )
+        cursor_supabase.execute(f"SELECT tabela_nome, {selecao} FROM controle_cargas")
+        controles = {linha[0]: linha[1:] for linha in cursor_supabase.fetchall()}
+
+    # Tabelas com watermark: uma consulta lê os máximos que faltam e outra (sem varrer tabelas)
+    # diz quais têm valores além do último carregado
+    com_watermark = [
+        nome for nome in nomes_tabelas
+        if modo != "diff" and nome in controles and controles[nome][3] == "concluida"
+        and controles[nome][2] is not None and _config.watermarks.get(nome) in dict(schemas_duck.get(nome, []))
+    ]
+    novidades = {}
+    faltantes = [nome for nome in com_watermark if nome not in maximos]
+    if faltantes:
+        partes = [f"SELECT ? AS tabela, CAST(MAX({_config.watermarks[nome]}) AS VARCHAR) FROM {nome}" for nome in faltantes]
+        maximos.update(cursor_duckdb.execute(" UNION ALL ".join(partes), faltantes).fetchall())
+    if com_watermark:
+        partes, params = [], []
+        for nome in com_watermark:
+            tipo = dict(schemas_duck[nome])[_config.watermarks[nome]]
+            partes.append(f"SELECT ? AS tabela, COALESCE(CAST(? AS {tipo}) > CAST(? AS {tipo}), false)")
+            params += [nome, maximos[nome], controles[nome][2]]
+        novidades = dict(cursor_duckdb.execute(" UNION ALL ".join(partes), params).fetchall())
+
+    # Sem watermark e fora de table_stats, a estimativa do DuckDB não serve para decidir (nem cai após
+    # deletes): uma consulta conta essas tabelas, e a contagem fica no catálogo para os outros destinos
+    sem_contagem = [
+        nome for nome in nomes_tabelas
+        if modo != "diff" and nome in controles and controles[nome][3] == "concluida"
+        and not _config.watermarks.get(nome) and nome not in contagens
+    ]
+    if sem_contagem:
+        partes = [f"SELECT ? AS tabela, COUNT(*) FROM {nome}" for nome in sem_contagem]
+        contagens.update(cursor_duckdb.execute(" UNION ALL ".join(partes), sem_contagem).fetchall())
+
+    plano = []
+    for nome in nomes_tabelas:
+        duck_schema = schemas_duck.get(nome, [])
+        controle = controles.get(nome)
+        linhas_catalogo = contagens.get(nome)
+        linhas_estimadas = linhas_catalogo if linhas_catalogo is not None else estimativas.get(nome) or 0
+        alteracoes = []
+        if controle is None:
+            acao = "carga completa"
+        else:
+            alteracoes = [
+                f"ALTER TABLE {nome} ADD COLUMN {coluna} {tipo};"
+                for coluna, tipo in duck_schema if coluna not in colunas_destino.get(nome, set())
+            ]
+            if controle[3] != "concluida":
+                acao = "retomar carga parcial"
+            elif modo == "diff":
+                acao = "diff"
+            elif nome in novidades:
+                acao = "delta por watermark" if novidades[nome] else "sem alterações"
+            elif _config.watermarks.get(nome):
+                acao = "delta por watermark"
+            else:
+                # Contagem exata: de table_stats ou do COUNT(*) feito acima
+                acao = "novas linhas" if linhas_estimadas != controle[1] else "sem alterações"
+        plano.append(
+            {
+                "nome_tabela": nome,
+                "acao": acao,
+                "linhas_estimadas": linhas_estimadas,
+                "linhas_catalogo": linhas_catalogo,
+                "duck_schema": duck_schema,
+                "controle": controle,
+                "alteracoes": alteracoes,
+            }
+        )
+
+    plano.sort(key=lambda item: item["linhas_estimadas"], reverse=True)
+    return plano
+
+
+def aplicar_alteracoes(cursor_supabase, plano):
+    for item in plano:
+        for query_alter in item["alteracoes"]:
+            logger.info(f"Adicionando coluna em {item['nome_tabela']} no Supabase: {query_alter}")
+            cursor_supabase.execute(query_alter)
+
+
+def exibir_plano(plano):
+    executar = [item for item in plano if item["acao"] != "sem alterações"]
+    logger.info(f"Plano: {len(executar)} de {len(plano)} tabelas, {_config.max_workers} workers, maiores primeiro.")
+    for ordem, item in enumerate(executar, start=1):
+        # Só a carga nova é decidida aqui; o delta por watermark decide pelas linhas do delta, ao executar
+        usa_faixas = item["controle"] is None
+        particionada = " (particionada)" if usa_faixas and _deve_particionar(None, item["nome_tabela"], item) else ""
+        logger.info(
+            f"  {ordem:>3}. {item['nome_tabela']}: {item['acao']}{particionada}, ~{item['linhas_estimadas']:,} linhas"
+        )
+    for item in plano:
+        if item["acao"] == "sem alterações":
+            logger.info(f"    -  {item['nome_tabela']}: sem alterações")
+    for item in plano:
+        for query_alter in item["alteracoes"]:
+            logger.info(f"  ALTER: {query_alter}")
+
+
+# Mede a espera na fila do executor (submit -> início) e o tempo total de cada tabela
+def _sincronizar_medindo(sincronizar, nome_tabela, enfileirada_em, plano=None):
+    METRICAS.somar(nome_tabela, "espera_fila_segundos", time.perf_counter() - enfileirada_em)
+    try:
+        with METRICAS.fase(nome_tabela, "total"):
+            sincronizar(nome_tabela, plano)
+    except Exception as e:
+        METRICAS.registrar_erro(nome_tabela, e)
+        raise
+
+
+def _exportar_metricas():
+    try:
+        METRICAS.exportar_json(logger, _config.metricas_jsonl or None)
+        if _config.metricas_prom:
+            METRICAS.exportar_prometheus(_config.metricas_prom)
+        logger.info(METRICAS.resumo(_config.metricas_top))
+    except OSError as e:
+        logger.error(f"Erro ao exportar métricas: {e}")
+
+
+# Controle, reinício de parciais, plano e ALTERs de um destino (o da thread)
+def _planejar_destino(modo, reiniciar, somente_plano, catalogo):
+    with _obter_pool().conexao() as conn_supabase:
+        with conn_supabase.cursor() as cursor_supabase:
+            # O plano só lê: nem DDL das tabelas de controle nem commit no destino
+            if not somente_plano:
+                criar_tabela_controle(cursor_supabase)
+                if reiniciar:
+                    reiniciar_cargas_parciais(cursor_supabase)
+                conn_supabase.commit()
+
+            # Catálogo inteiro lido de uma vez; os workers recebem controle e schema prontos
+            plano = planejar_sincronizacao(cursor_supabase, modo, catalogo)
+            exibir_plano(plano)
+            if somente_plano:
+                return plano
+            aplicar_alteracoes(cursor_supabase, plano)
+        conn_supabase.commit()
+    return plano
+
+
+# Destinos com a mesma ação e o mesmo controle (sem a data) fazem as mesmas leituras. O diff compara
+# hashes do próprio destino e não compartilha.
+def _ponto_carga(item):
+    if item["acao"] == "diff":
+        return None
+    return item["acao"], tuple(item["controle"][1:]) if item["controle"] else None
+
+
+# Uma tabela em todos os destinos: cada destino na sua thread, com a leitura compartilhada pelos que
+# estão no mesmo ponto. O erro de um destino fica no log e nas métricas dele e não para os outros.
+def _sincronizar_tabela(sincronizar, nome_tabela, membros, enfileirada_em):
+    if len(membros) == 1:
+        destino, item = membros[0]
+        with _no_contexto(destino):
+            _sincronizar_medindo(sincronizar, nome_tabela, enfileirada_em, item)
+        return
+
+    grupos = {}
+    for destino, item in membros:
+        ponto = _ponto_carga(item)
+        grupos.setdefault(ponto if ponto is not None else destino.nome, []).append((destino, item))
+
+    def executar(destino, item, leitura):
+        try:
+            with _no_contexto(destino, leitura):
+                _sincronizar_medindo(sincronizar, nome_tabela, enfileirada_em, item)
+        finally:
+            if leitura is not None:
+                leitura.sair()
+
+    with ThreadPoolExecutor(max_workers=len(membros), thread_name_prefix=f"destinos-{nome_tabela}") as executor:
+        futures = {}
+        for grupo in grupos.values():
+            leitura = _LeituraCompartilhada(len(grupo)) if len(grupo) > 1 else None
+            for destino, item in grupo:
+                futures[executor.submit(executar, destino, item, leitura)] = destino
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                logger.error(f"Destino {futures[future].nome}: erro em {nome_tabela}: {e}")
+
+
+# Devolve as falhas da execução (destinos ignorados e tabelas com erro, "destino: tabela" quando há
+# vários); lista vazia = tudo sincronizado. A CLI transforma falhas em código de saída diferente de zero.
+def main(modo="incremental", reiniciar=False, somente_plano=False, config=None, destinos=None):
+    _ativar(config, destinos)
+    METRICAS.reiniciar()
+    falhas = []
+    try:
+        catalogo = ler_catalogo()
+        planos = []
+        for destino in _destinos:
+            if len(_destinos) > 1:
+                logger.info(f"Destino {destino.nome}:")
+            try:
+                with _no_contexto(destino):
+                    planos.append((destino, _planejar_destino(modo, reiniciar, somente_plano, catalogo)))
+            except psycopg2.Error as e:
+                # Um destino fora do ar não impede a carga dos outros
+                if len(_destinos) == 1:
+                    raise
+                logger.error(f"Destino {destino.nome} ignorado nesta execução: {e}")
+                falhas.append(destino.nome)
+        if not planos:
+            raise RuntimeError("Nenhum destino disponível.")
+        if somente_plano:
+            return falhas
+
+        membros = {}
+        for destino, plano in planos:
+            for item in plano:
+                if item["acao"] != "sem alterações":
+                    membros.setdefault(item["nome_tabela"], []).append((destino, item))
+        ordem = sorted(membros, key=lambda nome: membros[nome][0][1]["linhas_estimadas"], reverse=True)
+
+        # A fila do executor é FIFO: submeter em ordem decrescente de tamanho dá o escalonamento LPT
+        with ThreadPoolExecutor(max_workers=_config.max_workers) as executor:
+            sincronizar = diferenciar_tabela if modo == "diff" else processar_tabela
+            futures = {
+                executor.submit(_sincronizar_tabela, sincronizar, nome, membros[nome], time.perf_counter()): nome
+                for nome in ordem
+            }
+            com_erro = set()
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.error(f"Erro durante a execução: {e}")
+                    com_erro.add(futures[future])
+
+        for destino, _ in planos:
+            prefixo = f"{destino.nome}: " if len(_destinos) > 1 else ""
+            logger.info(prefixo + destino.pool().resumo())
+        _exportar_metricas()
+
+        # Erros por destino ficam só nas métricas (_sincronizar_tabela não os propaga)
+        for tabela in METRICAS.tabelas():
+            if tabela["erro"]:
+                com_erro.discard(tabela["tabela"])
+                falhas.append(f"{tabela['destino']}: {tabela['tabela']}" if "destino" in tabela else tabela["tabela"])
+        falhas += sorted(com_erro)
+        if falhas:
+            logger.error(f"Sincronização com falhas: {', '.join(falhas)}")
+        return falhas
+
+    except Exception as e:
+        logger.error(f"Erro no pipeline: {e}")
+        raise
+    finally:
+        logger.info("Pipeline concluído.")
@@ -0,0 +1,161 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+
+# Métricas por tabela e por fase da sincronização, seguras para os workers do executor.
+# Com vários destinos Postgres, cada (destino, tabela) tem as suas; o destino vem da thread (no_destino).
+class MetricasTabela:
+    def __init__(self, nome_tabela, destino=None):
+        self.nome_tabela = nome_tabela
+        self.destino = destino
+        self.fases = {}
+        self.contadores = {}
+        self.erro = None
+
+    def como_dict(self):
+        return {
+            "tabela": self.nome_tabela,
+            **({"destino": self.destino} if self.destino else {}),
+            "fases": {fase: round(segundos, 6) for fase, segundos in self.fases.items()},
+            "contadores": dict(self.contadores),
+            "erro": self.erro,
+        }
+
+
+class RegistroMetricas:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tabelas = {}
+        self._local = threading.local()
+        self.inicio = datetime.now()
+
+    def reiniciar(self):
+        with self._lock:
+            self._tabelas = {}
+            self.inicio = datetime.now()
+
+    @contextmanager
+    def no_destino(self, destino):
+        anterior = getattr(self._local, "destino", None)
+        self._local.destino = destino
+        try:
+            yield
+        finally:
+            self._local.destino = anterior
+
+    def tabela(self, nome_tabela):
+        chave = (getattr(self._local, "destino", None), nome_tabela)
+        with self._lock:
+            if chave not in self._tabelas:
+                self._tabelas[chave] = MetricasTabela(nome_tabela, chave[0])
+            return self._tabelas[chave]
+
+    def somar_fase(self, nome_tabela, fase, segundos):
+        metricas = self.tabela(nome_tabela)
+        with self._lock:
+            metricas.fases[fase] = metricas.fases.get(fase, 0.0) + segundos
+
+    def somar(self, nome_tabela, contador, valor=1):
+        metricas = self.tabela(nome_tabela)
+        with self._lock:
+            metricas.contadores[contador] = metricas.contadores.get(contador, 0) + valor
+
+    def registrar_erro(self, nome_tabela, erro):
+        metricas = self.tabela(nome_tabela)
+        with self._lock:
+            metricas.erro = str(erro)
+
+    @contextmanager
+    def fase(self, nome_tabela, fase):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.somar_fase(nome_tabela, fase, time.perf_counter() - inicio)
+
+    def tabelas(self):
+        with self._lock:
+            return [metricas.como_dict() for metricas in self._tabelas.values()]
+
+    # Um registro JSON por tabela, no log e (opcionalmente) em um arquivo .jsonl
+    def exportar_json(self, logger, caminho=None):
+        registros = [dict(evento="metricas_tabela", inicio_execucao=self.inicio.isoformat(), **t) for t in self.tabelas()]
+        for registro in registros:
+            logger.info(json.dumps(registro, ensure_ascii=False))
+        if caminho:
+            with open(caminho, "a", encoding="utf-8") as arquivo:
+                for registro in registros:
+                    arquivo.write(json.dumps(registro, ensure_ascii=False) + "\n")
+
+    # Formato texto do Prometheus para o textfile collector do node exporter.
+    # Grava em arquivo temporário e renomeia para o coletor nunca ler um arquivo pela metade.
+    def exportar_prometheus(self, caminho):
+        linhas = []
+        tabelas = self.tabelas()
+
+        def rotulos(t, **outros):
+            return {"tabela": t["tabela"], **({"destino": t["destino"]} if "destino" in t else {}), **outros}
+
+        def metrica(nome, ajuda, amostras):
+            linhas.append(f"# HELP {nome} {ajuda}")
+            linhas.append(f"# TYPE {nome} gauge")
+            for rotulos, valor in amostras:
+                texto_rotulos = ",".join(f'{chave}="{_escapar_rotulo(v)}"' for chave, v in rotulos.items())
+                linhas.append(f"{nome}{{{texto_rotulos}}} {valor}")
+
+        metrica(
+            "datalk_sync_fase_segundos",
+            "Tempo gasto por tabela em cada fase da sincronização.",
+            [(rotulos(t, fase=fase), s) for t in tabelas for fase, s in t["fases"].items()],
+        )
+        contadores = sorted({nome for t in tabelas for nome in t["contadores"]})
+        for contador in contadores:
+            metrica(
+                f"datalk_sync_{contador}",
+                f"Contador '{contador}' da última sincronização, por tabela.",
+                [(rotulos(t), t["contadores"][contador]) for t in tabelas if contador in t["contadores"]],
+            )
+        metrica(
+            "datalk_sync_falhou",
+            "1 se a sincronização da tabela terminou com erro.",
+            [(rotulos(t), 1 if t["erro"] else 0) for t in tabelas],
+        )
+        linhas.append("# HELP datalk_sync_ultima_execucao_timestamp_segundos Início da última execução (epoch).")
+        linhas.append("# TYPE datalk_sync_ultima_execucao_timestamp_segundos gauge")
+        linhas.append(f"datalk_sync_ultima_execucao_timestamp_segundos {self.inicio.timestamp():.0f}")
+
+        temporario = f"{caminho}.tmp"
+        with open(temporario, "w", encoding="utf-8") as arquivo:
+            arquivo.write("\n".join(linhas) + "\n")
+        os.replace(temporario, caminho)
+
+    # Tabela de texto com as N tabelas mais lentas, para o fim do log
+    def resumo(self, limite=10):
+        tabelas = sorted(self.tabelas(), key=lambda t: t["fases"].get("total", 0.0), reverse=True)[:limite]
+        if not tabelas:
+            return "Nenhuma tabela processada."
+        cabecalho = f"{'tabela':<30} {'total_s':>9} {'leitura_s':>9} {'escrita_s':>9} {'commit_s':>9} {'linhas':>12} {'linhas/s':>11}"
+        linhas = [f"Tabelas mais lentas (top {len(tabelas)}):", cabecalho, "-" * len(cabecalho)]
+        for t in tabelas:
+            nome = f"{t['tabela']}@{t['destino']}" if "destino" in t else t["tabela"]
+            fases, contadores = t["fases"], t["contadores"]
+            total = fases.get("total", 0.0)
+            escritas = contadores.get("linhas_escritas", 0)
+            taxa = escritas / total if total > 0 else 0.0
+            linhas.append(
+                f"{nome[:30]:<30} {total:>9.2f} {fases.get('leitura', 0.0):>9.2f} "
+                f"{fases.get('escrita', 0.0):>9.2f} {fases.get('commit', 0.0):>9.2f} {escritas:>12,} {taxa:>11,.0f}"
+                + ("  (ERRO)" if t["erro"] else "")
+            )
+        return "\n".join(linhas)
+
+
+def _escapar_rotulo(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+METRICAS = RegistroMetricas()
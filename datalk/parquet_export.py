@@ -0,0 +1,252 @@
+import duckdb
+import json
+import logging
+import os
+from datetime import date, datetime
+from urllib.parse import unquote
+
+from .pipeline import INTERNAL_TABLES
+
+
+logger = logging.getLogger(__name__)
+
+
+TIPOS_DATA_HORA = ("TIMESTAMP", "TIMESTAMP WITH TIME ZONE", "TIMESTAMP_S", "TIMESTAMP_MS", "TIMESTAMP_NS")
+TIPOS_SEM_ESTATISTICA = ("STRUCT", "MAP", "UNION", "BLOB")
+# Nome da pasta que o DuckDB usa para valores nulos na partição Hive
+PARTICAO_NULA = "__HIVE_DEFAULT_PARTITION__"
+
+
+# Configuração ativa; definida por configurar() ou pelo main(config)
+_config = None
+lago_path = None
+manifesto_path = None
+
+
+def configurar(config):
+    global _config, lago_path, manifesto_path
+    config.validar(postgres=False)
+    _config = config
+    lago_path = config.caminho_lago
+    manifesto_path = lago_path / "manifest.json"
+
+
+def _texto(valor):
+    if valor is None:
+        return None
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    if isinstance(valor, (int, float, bool, str)):
+        return valor
+    return str(valor)
+
+
+def carregar_manifesto():
+    if not manifesto_path.is_file():
+        return {"tabelas": {}}
+    with open(manifesto_path, encoding="utf-8") as arquivo:
+        return json.load(arquivo)
+
+
+# Grava em arquivo temporário e renomeia: o manifesto nunca fica pela metade
+def salvar_manifesto(manifesto):
+    lago_path.mkdir(parents=True, exist_ok=True)
+    temporario = manifesto_path.with_suffix(".json.tmp")
+    with open(temporario, "w", encoding="utf-8") as arquivo:
+        json.dump(manifesto, arquivo, ensure_ascii=False, indent=2)
+    os.replace(temporario, manifesto_path)
+
+
+# Arquivos de uma exportação interrompida antes do manifesto ser gravado não existem para os leitores
+def _remover_orfaos(pasta_tabela, registrados):
+    for arquivo in pasta_tabela.rglob("parte_*.parquet"):
+        if arquivo.relative_to(lago_path).as_posix() not in registrados:
+            logger.warning(f"Removendo arquivo órfão de exportação anterior: {arquivo}")
+            arquivo.unlink()
+
+
+def _estatisticas_arquivo(conn, arquivo, colunas):
+    colunas_stats = [
+        (nome, tipo) for nome, tipo in colunas
+        if not tipo.upper().startswith(TIPOS_SEM_ESTATISTICA) and not tipo.endswith("]")
+    ]
+    expressoes = ["COUNT(*)"] + [f'MIN("{nome}"), MAX("{nome}")' for nome, _ in colunas_stats]
+    resultado = conn.execute(
+        f"SELECT {', '.join(expressoes)} FROM read_parquet(?, hive_partitioning = false)", [str(arquivo)]
+    ).fetchone()
+    estatisticas = {
+        nome: {"min": _texto(resultado[1 + 2 * i]), "max": _texto(resultado[2 + 2 * i])}
+        for i, (nome, _) in enumerate(colunas_stats)
+    }
+    return resultado[0], estatisticas
+
+
+def _particao_do_caminho(pasta_tabela, arquivo):
+    particao = {}
+    for parte in arquivo.parent.relative_to(pasta_tabela).parts:
+        chave, _, valor = parte.partition("=")
+        particao[unquote(chave)] = unquote(valor)
+    return particao
+
+
+def exportar_tabela(conn, nome_tabela, manifesto, lote):
+    schema = conn.execute(f"DESCRIBE {nome_tabela}").fetchall()
+    colunas = {col[0]: col[1] for col in schema}
+    coluna_particao = _config.particoes_parquet.get(nome_tabela)
+    coluna_watermark = _config.watermarks.get(nome_tabela)
+    for coluna in (coluna_particao, coluna_watermark):
+        if coluna and coluna not in colunas:
+            raise ValueError(f"Coluna '{coluna}' não existe em {nome_tabela}.")
+
+    estado = manifesto["tabelas"].setdefault(
+        nome_tabela,
+        {"coluna_particao": coluna_particao, "coluna_watermark": coluna_watermark, "ultimo_watermark": None, "arquivos": []},
+    )
+    if estado["coluna_particao"] != coluna_particao or estado["coluna_watermark"] != coluna_watermark:
+        raise ValueError(
+            f"Configuração de partição/watermark de {nome_tabela} mudou desde a última exportação. "
+            f"Apague a pasta e a entrada do manifesto para reexportar."
+        )
+
+    pasta_tabela = lago_path / nome_tabela
+    pasta_tabela.mkdir(parents=True, exist_ok=True)
+    _remover_orfaos(pasta_tabela, {a["caminho"] for a in estado["arquivos"]})
+
+    # Coluna de partição: timestamps viram dia para não gerar uma pasta por instante
+    nome_particao = expr_particao = None
+    if coluna_particao:
+        if colunas[coluna_particao].upper() in TIPOS_DATA_HORA:
+            nome_particao, expr_particao = f"{coluna_particao}_dia", f"CAST({coluna_particao} AS DATE)"
+        else:
+            nome_particao, expr_particao = coluna_particao, coluna_particao
+
+    filtros, params = [], []
+    maximo = None
+    substituir = False
+    reexportadas = set()
+    assinaturas = None
+    if coluna_watermark:
+        tipo_watermark = colunas[coluna_watermark]
+        if estado["ultimo_watermark"] is not None:
+            filtros.append(f"{coluna_watermark} > CAST(? AS {tipo_watermark})")
+            params.append(estado["ultimo_watermark"])
+        maximo = conn.execute(
+            f"SELECT MAX({coluna_watermark}) FROM {nome_tabela}{' WHERE ' + filtros[0] if filtros else ''}", params
+        ).fetchone()[0]
+        if maximo is None:
+            logger.info(f"Tabela {nome_tabela} sem linhas novas após o watermark {estado['ultimo_watermark']}.")
+            return 0
+        # Fecha o intervalo no máximo lido agora, para o watermark gravado bater com o conteúdo dos arquivos
+        filtros.append(f"{coluna_watermark} <= CAST(? AS {tipo_watermark})")
+        params.append(_texto(maximo))
+    elif coluna_particao:
+        # Sem watermark: cada partição tem uma assinatura (linhas e soma dos hashes das linhas) no manifesto;
+        # partições novas ou com assinatura diferente são reescritas inteiras, as que sumiram da tabela saem do lago
+        valor_particao = f"COALESCE(CAST({expr_particao} AS VARCHAR), '{PARTICAO_NULA}')"
+        hash_linha = "hash(" + ", ".join(f'"{nome}"' for nome in colunas) + ")"
+        atuais = {
+            valor: [linhas, soma] for valor, linhas, soma in conn.execute(
+                f"SELECT {valor_particao}, COUNT(*), CAST(SUM(CAST({hash_linha} AS HUGEINT)) AS VARCHAR) "
+                f"FROM {nome_tabela} GROUP BY 1"
+            ).fetchall()
+        }
+        anteriores = estado.get("assinaturas", {})
+        alteradas = sorted(valor for valor, assinatura in atuais.items() if anteriores.get(valor) != assinatura)
+        reexportadas = set(alteradas) | {
+            a["particao"][nome_particao] for a in estado["arquivos"] if a["particao"][nome_particao] not in atuais
+        }
+        if not reexportadas:
+            logger.info(f"Tabela {nome_tabela} sem partições novas ou alteradas desde a última exportação.")
+            return 0
+        filtros.append(f"{valor_particao} IN (SELECT UNNEST(?))")
+        params.append(alteradas)
+        assinaturas = atuais
+    else:
+        # Sem watermark nem partição: snapshot completo substituindo os arquivos anteriores
+        substituir = True
+
+    where = f" WHERE {' AND '.join(filtros)}" if filtros else ""
+    coluna_derivada = f", {expr_particao} AS {nome_particao}" if nome_particao != coluna_particao else ""
+    selecao = f"SELECT *{coluna_derivada} FROM {nome_tabela}{where}"
+    opcoes = [
+        "FORMAT PARQUET",
+        f"COMPRESSION {_config.parquet_compressao}",
+        f"FILENAME_PATTERN 'parte_{lote}_{{uuid}}'",
+        "APPEND",
+    ]
+    if nome_particao:
+        opcoes.append(f"PARTITION_BY ({nome_particao})")
+    else:
+        opcoes.append("PER_THREAD_OUTPUT")
+    conn.execute(f"COPY ({selecao}) TO '{pasta_tabela.as_posix()}' ({', '.join(opcoes)})", params)
+
+    colunas_arquivo = [(c[0], c[1]) for c in schema if not (nome_particao and c[0] == nome_particao)]
+    novos = []
+    for arquivo in sorted(pasta_tabela.rglob(f"parte_{lote}_*.parquet")):
+        linhas, estatisticas = _estatisticas_arquivo(conn, arquivo, colunas_arquivo)
+        if not linhas:
+            arquivo.unlink()
+            continue
+        novos.append(
+            {
+                "caminho": arquivo.relative_to(lago_path).as_posix(),
+                "particao": _particao_do_caminho(pasta_tabela, arquivo),
+                "linhas": linhas,
+                "bytes": arquivo.stat().st_size,
+                "estatisticas": estatisticas,
+                "exportado_em": datetime.now().isoformat(timespec="seconds"),
+            }
+        )
+
+    if substituir:
+        antigos, estado["arquivos"] = estado["arquivos"], novos
+    else:
+        # Partições reexportadas trocam os arquivos antigos pelos novos
+        antigos = [a for a in estado["arquivos"] if a["particao"].get(nome_particao) in reexportadas]
+        estado["arquivos"] = [a for a in estado["arquivos"] if a["particao"].get(nome_particao) not in reexportadas] + novos
+    if maximo is not None:
+        estado["ultimo_watermark"] = _texto(maximo)
+    if assinaturas is not None:
+        estado["assinaturas"] = assinaturas
+    estado["ultima_exportacao"] = datetime.now().isoformat(timespec="seconds")
+    salvar_manifesto(manifesto)
+
+    # Os arquivos substituídos só saem depois que o manifesto novo já aponta para os novos
+    for arquivo in antigos:
+        (lago_path / arquivo["caminho"]).unlink(missing_ok=True)
+
+    linhas = sum(a["linhas"] for a in novos)
+    logger.info(f"Tabela {nome_tabela}: {linhas} linhas exportadas em {len(novos)} arquivos Parquet.")
+    return linhas
+
+
+def main(tabelas=None, config=None):
+    if config is not None:
+        configurar(config)
+    elif _config is None:
+        raise ValueError("Exportação sem configuração: passe config ou chame configurar(Configuracao(...)).")
+    # Com microssegundos, duas exportações no mesmo segundo não confundem os arquivos uma da outra
+    lote = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+    manifesto = carregar_manifesto()
+    conn = duckdb.connect(str(_config.caminho_duckdb), read_only=True)
+    # Uma tabela com erro não interrompe as demais; a lista volta para o chamador (a CLI sai com erro)
+    falhas = []
+    try:
+        nomes = [t[0] for t in conn.execute("SHOW TABLES").fetchall() if t[0] not in INTERNAL_TABLES]
+        for nome_tabela in tabelas or nomes:
+            if nome_tabela not in nomes:
+                logger.error(f"Tabela {nome_tabela} não existe no DuckDB.")
+                falhas.append(nome_tabela)
+                continue
+            try:
+                exportar_tabela(conn, nome_tabela, manifesto, lote)
+            except Exception as e:
+                logger.error(f"Erro ao exportar tabela {nome_tabela}: {e}")
+                falhas.append(nome_tabela)
+    finally:
+        conn.close()
+        logger.info(f"Exportação Parquet concluída em {lago_path}.")
+    if falhas:
+        logger.error(f"Exportação com falhas: {', '.join(falhas)}")
+    return falhas
+
@@ -0,0 +1,1098 @@
+import copy
+import glob
+import json
+import os
+import re
+import threading
+
+import duckdb
+
+# pandas é importado dentro dos métodos que o usam, para o import do módulo ficar leve
+
+FILTER_OPERATORS = ("=", "!=", ">", ">=", "<", "<=", "contém")
+NUMERIC_TYPE_PREFIXES = ("TINYINT", "SMALLINT", "INTEGER", "BIGINT", "HUGEINT", "UTINYINT", "USMALLINT",
+                         "UINTEGER", "UBIGINT", "FLOAT", "DOUBLE", "REAL", "DECIMAL")
+TEMPORAL_TYPE_PREFIXES = ("DATE", "TIMESTAMP")
+CHART_AGGREGATIONS = ("count", "sum", "avg", "min", "max")
+CHART_TYPES = ("Barras", "Histograma", "Dispersão (bins 2D)", "Linha (min/max)", "Dispersão (amostra)")
+INTEGER_TYPES = {"TINYINT", "SMALLINT", "INTEGER", "INT", "INT4", "BIGINT", "INT8", "HUGEINT",
+                 "UTINYINT", "USMALLINT", "UINTEGER", "UBIGINT"}
+# Tabelas de controle da pipeline: ficam no mesmo arquivo, mas não são dados para sincronizar ou exportar
+INTERNAL_TABLES = ("metadata_version", "ingest_ledger", "table_stats", "column_stats")
+INGEST_READERS = {".csv": "read_csv", ".tsv": "read_csv", ".txt": "read_csv", ".json": "read_json",
+                  ".jsonl": "read_json", ".ndjson": "read_json", ".parquet": "read_parquet"}
+UNORDERED_TYPE_PREFIXES = ("STRUCT", "MAP", "UNION", "BLOB")
+IDENTIFIER_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+
+def validate_identifier(name: str, kind: str = "tabela"):
+    """Nomes entram sem aspas no SQL e em caminhos (pasta de uploads): só letras, dígitos e '_'."""
+    if not isinstance(name, str) or not IDENTIFIER_PATTERN.fullmatch(name):
+        raise ValueError(f"Nome de {kind} inválido: '{name}'. Use letras, números e '_', sem começar por número.")
+    return name
+
+
+class DuckDBPipeline:
+    def __init__(self, db_path: str):
+        self._db = duckdb.connect(db_path)
+        self._local = threading.local()
+        self._metadata_cache = {}
+        self._metadata_version = None
+        self._table_versions = {}
+        self.create_metadata_table()
+        self.refresh_metadata_cache()
+        self._drop_sequence_defaults()
+
+    @property
+    def conn(self):
+        """Cursor próprio por thread: a instância pode ser compartilhada entre as sessões do Streamlit."""
+        cursor = getattr(self._local, "cursor", None)
+        if cursor is None:
+            cursor = self._db.cursor()
+            self._local.cursor = cursor
+        return cursor
+
+    def table_version(self, table_name: str):
+        """Versão em memória da tabela, incrementada a cada escrita feita por esta instância."""
+        return self._table_versions.get(table_name, 0)
+
+    def _touch_table(self, table_name: str):
+        self._table_versions[table_name] = self._table_versions.get(table_name, 0) + 1
+
+    def create_metadata_table(self):
+        """Cria a tabela de metadados usando table_name como PRIMARY KEY."""
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS table_metadata (
+                table_name VARCHAR PRIMARY KEY,
+                schema_json VARCHAR,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+        """)
+        # Contador incrementado a cada escrita em table_metadata, para detectar mudanças de outros processos
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS metadata_version (
+                id INTEGER PRIMARY KEY,
+                version BIGINT NOT NULL
+            );
+        """)
+        self.conn.execute("""
+            INSERT INTO metadata_version
+            SELECT 1, 0 WHERE NOT EXISTS (SELECT 1 FROM metadata_version);
+        """)
+        # Arquivos já importados por tabela; tamanho e mtime identificam a versão do arquivo
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS ingest_ledger (
+                table_name VARCHAR,
+                file_path VARCHAR,
+                file_size BIGINT,
+                file_mtime DOUBLE,
+                rows_loaded BIGINT,
+                loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (table_name, file_path)
+            );
+        """)
+        # Catálogo de estatísticas mantido pelas escritas da pipeline: contagens e perfis sem varrer as tabelas
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS table_stats (
+                table_name VARCHAR PRIMARY KEY,
+                row_count BIGINT NOT NULL,
+                columns_stale BOOLEAN NOT NULL DEFAULT false,
+                analyzed_at TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS column_stats (
+                table_name VARCHAR,
+                column_name VARCHAR,
+                null_count BIGINT,
+                distinct_estimate BIGINT,
+                min_value VARCHAR,
+                max_value VARCHAR,
+                PRIMARY KEY (table_name, column_name)
+            );
+        """)
+
+    def refresh_metadata_cache(self):
+        """Recarrega todo o cache de metadados com uma única consulta."""
+        rows = self.conn.execute("SELECT table_name, schema_json FROM table_metadata;").fetchall()
+        self._metadata_cache = {name: json.loads(schema) for name, schema in rows}
+        self._metadata_version = self._read_metadata_version()
+
+    def sync_metadata_cache(self):
+        """Recarrega o cache apenas se outro processo alterou os metadados."""
+        if self._read_metadata_version() != self._metadata_version:
+            self.refresh_metadata_cache()
+
+    def _read_metadata_version(self):
+        return self.conn.execute("SELECT version FROM metadata_version WHERE id = 1;").fetchone()[0]
+
+    def _bump_metadata_version(self):
+        version = self.conn.execute(
+            "UPDATE metadata_version SET version = version + 1 WHERE id = 1 RETURNING version;"
+        ).fetchone()[0]
+        if version != self._metadata_version + 1:
+            # Houve escrita de outro processo desde a última leitura: o cache inteiro pode estar velho
+            self.refresh_metadata_cache()
+        else:
+            self._metadata_version = version
+
+    def create_table_dynamic(self, table_name: str, fields: list, use_sequences: bool = False):
+        """Cria tabelas dinamicamente com base em um schema fornecido.
+        Com use_sequences, uma chave primária inteira de coluna única recebe uma SEQUENCE (registrada em
+        schema_json como 'sequence'): os inserts da pipeline chamam nextval() e não precisam de MAX().
+        A sequência não é DEFAULT da coluna, para poder ser recriada quando uma chave explícita a ultrapassa."""
+        validate_identifier(table_name)
+        existing = self.conn.execute(
+            "SELECT table_name FROM table_metadata WHERE table_name = ?;",
+            (table_name,)
+        ).fetchone()
+        if existing:
+            raise ValueError(f"A tabela '{table_name}' já existe na pipeline.")
+
+        column_defs = []
+        schema_for_metadata = {}
+        sequences = []
+        pk_fields = [field for field in fields if field.get("primary_key", False)]
+
+        for field in fields:
+            col_name = field.get("name")
+            if not col_name:
+                raise ValueError("Cada campo deve ter um 'name' definido.")
+            validate_identifier(col_name, "coluna")
+           
+            data_type = field.get("data_type", "").strip() or "VARCHAR"
+            col_def = f"{col_name} {data_type}"
+            schema_for_metadata[col_name] = {"data_type": data_type}
+
+            if field.get("primary_key", False):
+                col_def += " PRIMARY KEY"
+                schema_for_metadata[col_name]["primary_key"] = True
+                if (use_sequences or field.get("sequence")) and len(pk_fields) == 1 \
+                        and data_type.upper() in INTEGER_TYPES:
+                    sequence_name = f"{table_name}_{col_name}_seq"
+                    sequences.append(sequence_name)
+                    schema_for_metadata[col_name]["sequence"] = sequence_name
+            else:
+                schema_for_metadata[col_name]["primary_key"] = False
+
+            fk = field.get("foreign_key")
+            if fk:
+                fk_table, fk_column = fk.get("table"), fk.get("column")
+                if fk_table and fk_column:
+                    col_def += f" REFERENCES {fk_table}({fk_column})"
+                    schema_for_metadata[col_name]["foreign_key"] = {"table": fk_table, "column": fk_column}
+                else:
+                    raise ValueError(f"Definição de chave estrangeira para a coluna '{col_name}' está incompleta.")
+            else:
+                schema_for_metadata[col_name]["foreign_key"] = None
+
+            column_defs.append(col_def)
+
+        for sequence_name in sequences:
+            self.conn.execute(f"CREATE SEQUENCE IF NOT EXISTS {sequence_name} START 1;")
+        sql = f"CREATE TABLE {table_name} ({', '.join(column_defs)});"
+        self.conn.execute(sql)
+        self.conn.execute(
+            "INSERT INTO table_metadata (table_name, schema_json) VALUES (?, ?);",
+            (table_name, json.dumps(schema_for_metadata))
+        )
+        self._metadata_cache[table_name] = schema_for_metadata
+        self._bump_metadata_version()
+        self._write_stats(table_name, 0, {col: (0, 0, None, None) for col in schema_for_metadata}, False, None)
+        self._touch_table(table_name)
+
+    def insert_data(self, table_name: str, data: dict):
+        """Insere dados na tabela garantindo que a chave primária não seja duplicada.
+        Se o campo 'id' for chave primária e não for fornecido, ele será atribuído automaticamente;
+        colunas com 'sequence' no schema usam nextval() em vez de MAX(id)."""
+        metadata = self.get_table_metadata(table_name)
+        primary_keys = [col for col, info in metadata.items() if info.get("primary_key")]
+        sequence_columns = {col: info["sequence"] for col, info in metadata.items() if info.get("sequence")}
+        generated = {}
+        for col in sequence_columns:
+            if data.get(col) in (None, ""):
+                data.pop(col, None)
+                generated[col] = f"nextval('{sequence_columns[col]}')"
+            else:
+                self._advance_sequence(sequence_columns[col], data[col])
+
+        # Com a chave vinda da sequência não há MAX() nem checagem de existência
+        if primary_keys and not generated:
+            
+            if "id" in primary_keys and data.get("id") in (None, ""):
+                max_id = self.conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table_name};").fetchone()[0]
+                data["id"] = max_id + 1
+            else:
+                
+                for pk in primary_keys:
+                    if pk not in data:
+                        raise ValueError(f"O valor para a chave primária '{pk}' não foi fornecido.")
+
+            
+            pk_conditions = " AND ".join([f"{pk} = ?" for pk in primary_keys])
+            pk_values = tuple(data[pk] for pk in primary_keys)
+            try:
+                exists = self.conn.execute(
+                    f"SELECT 1 FROM {table_name} WHERE {pk_conditions} LIMIT 1;",
+                    pk_values
+                ).fetchone()
+            except duckdb.Error as e:
+                raise ValueError(f"Chave primária inválida para '{table_name}': {e}") from e
+            if exists:
+                raise ValueError(f"Erro: O registro com chave primária {primary_keys} = {pk_values} já existe.")
+
+        columns = ", ".join(list(generated) + list(data.keys()))
+        placeholders = ", ".join(list(generated.values()) + ["?" for _ in data])
+        returning = f" RETURNING {', '.join(metadata)}" if metadata else ""
+        sql = f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders}){returning};"
+        # Linha e estatísticas na mesma transação
+        self.conn.begin()
+        try:
+            inserted = self.conn.execute(sql, tuple(data.values())).fetchone()
+            # A linha devolvida (com a chave gerada) entra no perfil das colunas sem varrer a tabela
+            if metadata:
+                self._fold_row_stats(table_name, metadata, inserted)
+            self._adjust_stats(table_name, 1, columns_stale=False)
+            self.conn.commit()
+        except duckdb.Error as e:
+            self.conn.rollback()
+            raise ValueError(f"Falha ao inserir em '{table_name}': {e}") from e
+        self._touch_table(table_name)
+
+    @staticmethod
+    def _to_dataframe(rows):
+        import pandas as pd
+
+        if isinstance(rows, pd.DataFrame):
+            return rows.copy()
+        if hasattr(rows, "to_pandas"):
+            return rows.to_pandas()
+        return pd.DataFrame.from_records(list(rows))
+
+    def insert_many(self, table_name: str, rows):
+        """Insere um lote (DataFrame, tabela Arrow ou iterável de dicts) em uma única transação.
+        As checagens de tipo e de chave primária são feitas para o lote inteiro no DuckDB.
+        Retorna a quantidade inserida e um DataFrame com as linhas rejeitadas e o 'motivo'."""
+        import pandas as pd
+
+        metadata = self.get_table_metadata(table_name)
+        if not metadata:
+            raise ValueError(f"A tabela '{table_name}' não existe na pipeline.")
+
+        df = self._to_dataframe(rows)
+        if df.empty:
+            return 0, df.assign(motivo=pd.Series(dtype="object"))
+
+        unknown = [col for col in df.columns if col not in metadata]
+        if unknown:
+            raise ValueError(f"Colunas inexistentes em '{table_name}': {unknown}")
+
+        primary_keys = [col for col, info in metadata.items() if info.get("primary_key")]
+        sequence_columns = {col: info["sequence"] for col, info in metadata.items() if info.get("sequence")}
+        for col in sequence_columns:
+            if col not in df.columns:
+                df[col] = None
+        if "id" in primary_keys and "id" not in sequence_columns \
+                and ("id" not in df.columns or df["id"].isna().any()):
+            # Um único MAX(id) para o lote inteiro
+            max_id = self.conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table_name};").fetchone()[0]
+            if "id" not in df.columns:
+                df["id"] = None
+            missing = df["id"].isna()
+            df["id"] = df["id"].astype("object")
+            df.loc[missing, "id"] = range(max_id + 1, max_id + 1 + int(missing.sum()))
+
+        df["__row_number"] = range(len(df))
+        columns = [col for col in df.columns if col != "__row_number"]
+        self.conn.register("_insert_source", df)
+        try:
+            # Chaves explícitas avançam a sequência antes de o nextval() gerar as que faltam
+            for col, sequence_name in sequence_columns.items():
+                self._advance_sequence(sequence_name, self.conn.execute(
+                    f"SELECT MAX(TRY_CAST({col} AS {metadata[col].get('data_type') or 'BIGINT'})) FROM _insert_source;"
+                ).fetchone()[0])
+            # Converte para os tipos do schema; valores que não convertem viram rejeição, não erro
+            typed = ", ".join(
+                f"COALESCE(TRY_CAST({col} AS {metadata[col].get('data_type') or 'VARCHAR'}), "
+                f"nextval('{sequence_columns[col]}')) AS {col}"
+                if col in sequence_columns else
+                f"TRY_CAST({col} AS {metadata[col].get('data_type') or 'VARCHAR'}) AS {col}"
+                for col in columns
+            )
+            invalid = " OR ".join(
+                f"({col} IS NOT NULL AND TRY_CAST({col} AS {metadata[col].get('data_type') or 'VARCHAR'}) IS NULL)"
+                for col in columns
+            )
+            self.conn.execute(f"""
+                CREATE OR REPLACE TEMP TABLE _insert_staging AS
+                SELECT __row_number, {typed}, ({invalid}) AS __invalid
+                FROM _insert_source;
+            """)
+
+            if primary_keys:
+                pk_missing = " OR ".join(f"s.{pk} IS NULL" for pk in primary_keys)
+                pk_join = " AND ".join(f"t.{pk} = s.{pk}" for pk in primary_keys)
+                pk_list = ", ".join(f"s.{pk}" for pk in primary_keys)
+                reason = f"""
+                    CASE
+                        WHEN s.__invalid THEN 'valor incompatível com o tipo da coluna'
+                        WHEN {pk_missing} THEN 'chave primária ausente'
+                        WHEN EXISTS (SELECT 1 FROM {table_name} t WHERE {pk_join}) THEN 'chave primária já existe'
+                        WHEN ROW_NUMBER() OVER (PARTITION BY {pk_list} ORDER BY s.__row_number) > 1
+                            THEN 'chave primária duplicada no lote'
+                    END
+                """
+            else:
+                reason = "CASE WHEN s.__invalid THEN 'valor incompatível com o tipo da coluna' END"
+            self.conn.execute(f"""
+                CREATE OR REPLACE TEMP TABLE _insert_rejected AS
+                SELECT * FROM (SELECT s.__row_number, {reason} AS motivo FROM _insert_staging s)
+                WHERE motivo IS NOT NULL;
+            """)
+
+            column_list = ", ".join(columns)
+            self.conn.begin()
+            try:
+                inserted = self.conn.execute(f"""
+                    INSERT INTO {table_name} ({column_list})
+                    SELECT {column_list} FROM _insert_staging s
+                    WHERE NOT EXISTS (SELECT 1 FROM _insert_rejected r WHERE r.__row_number = s.__row_number);
+                """).fetchone()[0]
+                self._merge_stats(
+                    table_name,
+                    "_insert_staging s WHERE NOT EXISTS "
+                    "(SELECT 1 FROM _insert_rejected r WHERE r.__row_number = s.__row_number)",
+                    columns,
+                )
+                self.conn.commit()
+                self._touch_table(table_name)
+            except duckdb.Error as e:
+                self.conn.rollback()
+                raise ValueError(f"Falha ao inserir o lote em '{table_name}': {e}") from e
+            except Exception:
+                self.conn.rollback()
+                raise
+
+            rejected = self.conn.execute("""
+                SELECT src.* EXCLUDE (__row_number), r.motivo
+                FROM _insert_rejected r JOIN _insert_source src USING (__row_number)
+                ORDER BY r.__row_number;
+            """).fetchdf()
+        finally:
+            self.conn.unregister("_insert_source")
+            self.conn.execute("DROP TABLE IF EXISTS _insert_staging;")
+            self.conn.execute("DROP TABLE IF EXISTS _insert_rejected;")
+        return inserted, rejected
+
+    @staticmethod
+    def _expand_sources(source):
+        """Aceita um arquivo, um glob ou um diretório (arquivos com extensão conhecida, recursivo)."""
+        if os.path.isdir(source):
+            paths = [path for path in glob.glob(os.path.join(source, "**", "*"), recursive=True)
+                     if os.path.splitext(path)[1].lower() in INGEST_READERS]
+        else:
+            paths = glob.glob(source, recursive=True)
+        return sorted(os.path.abspath(path) for path in paths if os.path.isfile(path))
+
+    def ingest_files(self, table_name: str, source: str, fields: list = None, progress=None):
+        """Importa arquivos CSV/JSON/Parquet com o leitor nativo (paralelo) do DuckDB em um único INSERT.
+        Se a tabela não existir, é criada a partir de 'fields' (lista no formato do exemplo.json) ou do schema
+        inferido dos arquivos. Arquivos já registrados em ingest_ledger com o mesmo tamanho e mtime são pulados.
+        progress(fração, mensagem) é chamado a cada etapa. Retorna as linhas inseridas, as linhas por arquivo
+        e os arquivos pulados."""
+        report = progress or (lambda fraction, message: None)
+        paths = self._expand_sources(source)
+        if not paths:
+            raise ValueError(f"Nenhum arquivo encontrado em '{source}'.")
+        readers = {INGEST_READERS.get(os.path.splitext(path)[1].lower()) for path in paths}
+        if None in readers or len(readers) > 1:
+            raise ValueError("Os arquivos devem ser todos CSV, todos JSON ou todos Parquet.")
+        reader = readers.pop()
+        if fields and table_name in self._metadata_cache:
+            existing = self._metadata_cache[table_name]
+            for field in fields:
+                expected = (field.get("data_type", "").strip() or "VARCHAR").upper()
+                if existing.get(field.get("name"), {}).get("data_type", "").upper() != expected:
+                    raise ValueError(
+                        f"O campo '{field.get('name')}' ({expected}) não confere com o schema de '{table_name}'."
+                    )
+
+        loaded = {
+            path: (size, mtime) for path, size, mtime in self.conn.execute(
+                "SELECT file_path, file_size, file_mtime FROM ingest_ledger WHERE table_name = ?;", (table_name,)
+            ).fetchall()
+        }
+        signatures = {path: (os.path.getsize(path), os.path.getmtime(path)) for path in paths}
+        skipped = [path for path in paths if loaded.get(path) == signatures[path]]
+        pending = [path for path in paths if path not in skipped]
+        result = {"inserted": 0, "files": {}, "skipped": skipped}
+        if not pending:
+            report(1.0, f"Todos os {len(skipped)} arquivos já foram importados.")
+            return result
+
+        report(0.1, f"Lendo o schema de {len(pending)} arquivos ({len(skipped)} já importados)...")
+        source_sql = f"{reader}(?, union_by_name = true, filename = '__file')"
+        file_schema = {
+            col[0]: col[1] for col in self.conn.execute(f"DESCRIBE SELECT * FROM {source_sql};", (pending,)).fetchall()
+            if col[0] != "__file"
+        }
+        created = table_name not in self._metadata_cache
+        self.conn.begin()
+        try:
+            # A tabela nova é criada na mesma transação da carga: uma importação que falha não deixa tabela vazia
+            if created:
+                self.create_table_dynamic(
+                    table_name, fields or [{"name": col, "data_type": dtype} for col, dtype in file_schema.items()]
+                )
+            metadata = self.get_table_metadata(table_name)
+
+            unknown = [col for col in file_schema if col not in metadata]
+            if unknown:
+                raise ValueError(f"Colunas dos arquivos inexistentes em '{table_name}': {unknown}")
+            primary_keys = [col for col, info in metadata.items() if info.get("primary_key")]
+            columns = list(file_schema)
+            select_list = [f"CAST({col} AS {metadata[col].get('data_type') or 'VARCHAR'}) AS {col}" for col in columns]
+            for pk in primary_keys:
+                if pk in file_schema:
+                    continue
+                if metadata[pk].get("sequence"):
+                    # O nextval vai para o staging para que as estatísticas vejam as chaves geradas
+                    select_list.append(f"nextval('{metadata[pk]['sequence']}') AS {pk}")
+                    columns.append(pk)
+                    continue
+                if pk == "id" and len(primary_keys) == 1:
+                    # Mesma regra do insert_data: id ausente continua a partir do MAX(id)
+                    max_id = self.conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table_name};").fetchone()[0]
+                    select_list.append(f"{max_id} + ROW_NUMBER() OVER () AS id")
+                    columns.append("id")
+                else:
+                    raise ValueError(f"Os arquivos não têm a chave primária '{pk}'.")
+
+            if reader == "read_csv":
+                # No CSV os tipos do schema vão direto para o leitor, sem depender da detecção automática
+                types = ", ".join(f"'{col}': '{metadata[col].get('data_type') or 'VARCHAR'}'" for col in file_schema)
+                source_sql = f"read_csv(?, union_by_name = true, filename = '__file', types = {{{types}}})"
+
+            report(0.3, f"Importando {len(pending)} arquivos para '{table_name}'...")
+            # Uma leitura paralela de todos os arquivos; a coluna __file dá a contagem por arquivo para o ledger
+            self.conn.execute(
+                f"CREATE OR REPLACE TEMP TABLE _ingest_staging AS "
+                f"SELECT {', '.join(select_list)}, __file FROM {source_sql};",
+                (pending,)
+            )
+            counts = dict(self.conn.execute(
+                "SELECT __file, COUNT(*) FROM _ingest_staging GROUP BY __file;"
+            ).fetchall())
+            for pk in primary_keys:
+                if pk in file_schema and metadata[pk].get("sequence"):
+                    self._advance_sequence(
+                        metadata[pk]["sequence"],
+                        self.conn.execute(f"SELECT MAX({pk}) FROM _ingest_staging;").fetchone()[0]
+                    )
+            report(0.7, f"Gravando {sum(counts.values())} linhas...")
+            column_list = ", ".join(columns)
+            inserted = self.conn.execute(
+                f"INSERT INTO {table_name} ({column_list}) SELECT {column_list} FROM _ingest_staging;"
+            ).fetchone()[0]
+            self._merge_stats(table_name, "_ingest_staging", columns)
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO ingest_ledger (table_name, file_path, file_size, file_mtime, rows_loaded) "
+                "VALUES (?, ?, ?, ?, ?);",
+                [(table_name, path, *signatures[path], counts.get(path, 0)) for path in pending]
+            )
+            self.conn.execute("DROP TABLE _ingest_staging;")
+            self.conn.commit()
+        except Exception as e:
+            self.conn.rollback()
+            if created:
+                # O rollback desfez a tabela e a entrada em table_metadata; o cache volta a refletir o banco
+                self.refresh_metadata_cache()
+            if isinstance(e, duckdb.Error):
+                raise ValueError(f"Falha ao importar os arquivos em '{table_name}': {e}") from e
+            raise
+        self._touch_table(table_name)
+
+        result["inserted"] = inserted
+        result["files"] = {path: counts.get(path, 0) for path in pending}
+        report(1.0, f"{inserted} linhas importadas de {len(pending)} arquivos.")
+        return result
+
+    def update_data(self, table_name: str, set_data: dict, where_clause: str, where_params: tuple):
+        set_str = ", ".join([f"{col} = ?" for col in set_data.keys()])
+        sql = f"UPDATE {table_name} SET {set_str} WHERE {where_clause};"
+        values = tuple(set_data.values()) + where_params
+        self.conn.begin()
+        try:
+            self.conn.execute(sql, values)
+            self._adjust_stats(table_name)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        self._touch_table(table_name)
+
+    def delete_data(self, table_name: str, where_clause: str, where_params: tuple):
+        sql = f"DELETE FROM {table_name} WHERE {where_clause};"
+        self.conn.begin()
+        try:
+            deleted = self.conn.execute(sql, where_params).fetchone()[0]
+            self._adjust_stats(table_name, -deleted)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        self._touch_table(table_name)
+
+    def _key_columns(self, table_name: str, metadata: dict, df, key_columns):
+        keys = list(key_columns or [col for col, info in metadata.items() if info.get("primary_key")])
+        if not keys:
+            raise ValueError(f"Informe as colunas-chave: '{table_name}' não tem chave primária.")
+        missing = [col for col in keys if col not in df.columns]
+        if missing:
+            raise ValueError(f"O lote não tem as colunas-chave {missing}.")
+        if df[keys].isna().any().any():
+            raise ValueError("Há linhas com chave vazia.")
+        return keys
+
+    def update_many(self, table_name: str, rows, key_columns=None):
+        """Aplica um lote de correções (DataFrame, tabela Arrow ou iterável de dicts) com um único UPDATE ... FROM.
+        As linhas são casadas pelas colunas-chave (padrão: a chave primária) e todas as demais colunas do lote
+        são gravadas, inclusive valores vazios como NULL. Retorna a quantidade de linhas atualizadas."""
+        metadata = self.get_table_metadata(table_name)
+        if not metadata:
+            raise ValueError(f"A tabela '{table_name}' não existe na pipeline.")
+        df = self._to_dataframe(rows)
+        if df.empty:
+            return 0
+        unknown = [col for col in df.columns if col not in metadata]
+        if unknown:
+            raise ValueError(f"Colunas inexistentes em '{table_name}': {unknown}")
+        keys = self._key_columns(table_name, metadata, df, key_columns)
+        if df.duplicated(subset=keys).any():
+            raise ValueError("Há chaves repetidas no lote; cada registro deve aparecer uma vez.")
+        set_columns = [col for col in df.columns if col not in keys]
+        if not set_columns:
+            raise ValueError("O lote não tem colunas para atualizar além das chaves.")
+
+        def typed(col):
+            return f"CAST(s.{col} AS {metadata[col].get('data_type') or 'VARCHAR'})"
+
+        self.conn.register("_update_source", df)
+        try:
+            self.conn.begin()
+            try:
+                updated = self.conn.execute(f"""
+                    UPDATE {table_name} AS t
+                    SET {', '.join(f"{col} = {typed(col)}" for col in set_columns)}
+                    FROM _update_source s
+                    WHERE {' AND '.join(f"t.{col} = {typed(col)}" for col in keys)};
+                """).fetchone()[0]
+                self._adjust_stats(table_name)
+                self.conn.commit()
+            except duckdb.Error as e:
+                self.conn.rollback()
+                raise ValueError(f"Falha ao atualizar '{table_name}': {e}") from e
+        finally:
+            self.conn.unregister("_update_source")
+        self._touch_table(table_name)
+        return updated
+
+    def delete_many(self, table_name: str, keys, key_columns=None):
+        """Remove de uma vez as linhas cujas chaves estão no lote (DataFrame, tabela Arrow ou iterável de dicts).
+        Outras colunas do lote são ignoradas. Retorna a quantidade de linhas removidas."""
+        metadata = self.get_table_metadata(table_name)
+        if not metadata:
+            raise ValueError(f"A tabela '{table_name}' não existe na pipeline.")
+        df = self._to_dataframe(keys)
+        if df.empty:
+            return 0
+        key_list = self._key_columns(table_name, metadata, df, key_columns)
+        unknown = [col for col in key_list if col not in metadata]
+        if unknown:
+            raise ValueError(f"Colunas inexistentes em '{table_name}': {unknown}")
+
+        typed = [f"CAST(s.{col} AS {metadata[col].get('data_type') or 'VARCHAR'})" for col in key_list]
+        if len(key_list) == 1:
+            condition = f"{key_list[0]} IN (SELECT {typed[0]} FROM _delete_source s)"
+        else:
+            matches = " AND ".join(f"t.{col} = {expr}" for col, expr in zip(key_list, typed))
+            condition = f"EXISTS (SELECT 1 FROM _delete_source s WHERE {matches})"
+
+        self.conn.register("_delete_source", df[key_list])
+        try:
+            self.conn.begin()
+            try:
+                deleted = self.conn.execute(f"DELETE FROM {table_name} AS t WHERE {condition};").fetchone()[0]
+                self._adjust_stats(table_name, -deleted)
+                self.conn.commit()
+            except duckdb.Error as e:
+                self.conn.rollback()
+                raise ValueError(f"Falha ao deletar em '{table_name}': {e}") from e
+        finally:
+            self.conn.unregister("_delete_source")
+        self._touch_table(table_name)
+        return deleted
+
+    def delete_table(self, table_name: str):
+        sequences = [info["sequence"] for info in self.get_table_metadata(table_name).values() if info.get("sequence")]
+        self.conn.execute(f"DROP TABLE IF EXISTS {table_name};")
+        for sequence_name in sequences:
+            self.conn.execute(f"DROP SEQUENCE IF EXISTS {sequence_name};")
+        self.conn.execute("DELETE FROM table_metadata WHERE table_name = ?;", (table_name,))
+        self.conn.execute("DELETE FROM ingest_ledger WHERE table_name = ?;", (table_name,))
+        self.conn.execute("DELETE FROM table_stats WHERE table_name = ?;", (table_name,))
+        self.conn.execute("DELETE FROM column_stats WHERE table_name = ?;", (table_name,))
+        self._metadata_cache.pop(table_name, None)
+        self._bump_metadata_version()
+        self._touch_table(table_name)
+
+    def alter_table_add_column(self, table_name: str, column_name: str, data_type: str):
+        self.conn.execute(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {data_type};")
+        metadata = self.get_table_metadata(table_name)
+        metadata[column_name] = {"data_type": data_type, "primary_key": False, "foreign_key": None}
+        self.update_metadata(table_name, metadata)
+        # Coluna nova sem DEFAULT: todas as linhas existentes são nulas
+        self.conn.execute(
+            "INSERT OR REPLACE INTO column_stats (table_name, column_name, null_count, distinct_estimate) "
+            "SELECT table_name, ?, row_count, 0 FROM table_stats WHERE table_name = ?;",
+            (column_name, table_name)
+        )
+        self._touch_table(table_name)
+
+    def alter_table_drop_column(self, table_name: str, column_name: str):
+        self.conn.execute(f"ALTER TABLE {table_name} DROP COLUMN {column_name};")
+        metadata = self.get_table_metadata(table_name)
+        metadata.pop(column_name, None)
+        self.update_metadata(table_name, metadata)
+        self.conn.execute(
+            "DELETE FROM column_stats WHERE table_name = ? AND column_name = ?;", (table_name, column_name)
+        )
+        self._touch_table(table_name)
+
+    def attach_sequence(self, table_name: str, column_name: str):
+        """Migra uma tabela existente: cria a sequência a partir do MAX atual da coluna e a registra no schema."""
+        metadata = self.get_table_metadata(table_name)
+        info = metadata.get(column_name)
+        if not info or not info.get("primary_key"):
+            raise ValueError(f"A coluna '{column_name}' não é chave primária de '{table_name}'.")
+        if info.get("data_type", "").upper() not in INTEGER_TYPES:
+            raise ValueError(f"A coluna '{column_name}' não é inteira.")
+        if info.get("sequence"):
+            return info["sequence"]
+
+        sequence_name = f"{table_name}_{column_name}_seq"
+        max_value = self.conn.execute(f"SELECT COALESCE(MAX({column_name}), 0) FROM {table_name};").fetchone()[0]
+        self.conn.execute(f"CREATE SEQUENCE {sequence_name} START {max_value + 1};")
+        info["sequence"] = sequence_name
+        self.update_metadata(table_name, metadata)
+        return sequence_name
+
+    def _advance_sequence(self, sequence_name: str, value):
+        """Leva a sequência até 'value' (chave dada explicitamente) para que o nextval() seguinte não a repita."""
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            return
+        last_value, start_value = self.conn.execute(
+            "SELECT last_value, start_value FROM duckdb_sequences() WHERE sequence_name = ?;", (sequence_name,)
+        ).fetchone()
+        current = start_value - 1 if last_value is None else last_value
+        if value > current:
+            # O DuckDB não tem setval: a sequência é recriada logo após a chave, em tempo constante
+            self.conn.execute(f"CREATE OR REPLACE SEQUENCE {sequence_name} START {value + 1};")
+
+    def _drop_sequence_defaults(self):
+        """Bancos criados com a sequência como DEFAULT da coluna: o DEFAULT impede recriar a sequência."""
+        columns = {(table, col) for table, metadata in self._metadata_cache.items()
+                   for col, info in metadata.items() if info.get("sequence")}
+        if not columns:
+            return
+        with_default = self.conn.execute(
+            "SELECT table_name, column_name FROM duckdb_columns() "
+            "WHERE schema_name = 'main' AND column_default LIKE 'nextval(%';"
+        ).fetchall()
+        for table_name, column_name in with_default:
+            if (table_name, column_name) in columns:
+                self.conn.execute(f"ALTER TABLE {table_name} ALTER COLUMN {column_name} DROP DEFAULT;")
+
+    def get_table_metadata(self, table_name: str):
+        """Lê do cache em memória; devolve uma cópia para que o chamador possa alterá-la."""
+        return copy.deepcopy(self._metadata_cache.get(table_name, {}))
+
+    def update_metadata(self, table_name: str, metadata: dict):
+        self.conn.execute(
+            "UPDATE table_metadata SET schema_json = ? WHERE table_name = ?;",
+            (json.dumps(metadata), table_name)
+        )
+        if table_name in self._metadata_cache:
+            self._metadata_cache[table_name] = copy.deepcopy(metadata)
+        self._bump_metadata_version()
+
+    @staticmethod
+    def _orderable(data_type: str):
+        data_type = data_type.upper()
+        return not data_type.startswith(UNORDERED_TYPE_PREFIXES) and not data_type.endswith("]")
+
+    def _stats_select(self, types: dict, source: str, merge_bounds: bool = False):
+        """SELECT de uma única varredura: linhas e, por coluna, nulos, distintos (HLL) e min/max como texto.
+        Com merge_bounds, min/max já saem combinados com os anteriores, passados como parâmetros."""
+        expressions = ["COUNT(*)"]
+        for col, data_type in types.items():
+            expressions += [f"COUNT(*) - COUNT({col})", f"approx_count_distinct({col})"]
+            if not self._orderable(data_type):
+                expressions += ["NULL", "NULL"]
+            elif merge_bounds:
+                expressions += [f"CAST(LEAST(MIN({col}), TRY_CAST(? AS {data_type})) AS VARCHAR)",
+                                f"CAST(GREATEST(MAX({col}), TRY_CAST(? AS {data_type})) AS VARCHAR)"]
+            else:
+                expressions += [f"CAST(MIN({col}) AS VARCHAR)", f"CAST(MAX({col}) AS VARCHAR)"]
+        return f"SELECT {', '.join(expressions)} FROM {source}"
+
+    def _write_stats(self, table_name: str, row_count: int, columns: dict, columns_stale: bool, analyzed_at):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO table_stats (table_name, row_count, columns_stale, analyzed_at, updated_at) "
+            "VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP);",
+            (table_name, row_count, columns_stale, analyzed_at)
+        )
+        self.conn.execute(
+            "DELETE FROM column_stats WHERE table_name = ? AND column_name NOT IN (SELECT UNNEST(?));",
+            (table_name, list(columns))
+        )
+        if columns:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO column_stats "
+                "(table_name, column_name, null_count, distinct_estimate, min_value, max_value) "
+                "VALUES (?, ?, ?, ?, ?, ?);",
+                [(table_name, col, *values) for col, values in columns.items()]
+            )
+
+    def _merge_stats(self, table_name: str, source: str, columns: list, params=()):
+        """Soma às estatísticas as linhas recém-inseridas, lidas de 'source' (staging do lote), sem varrer a tabela.
+        Colunas ausentes do lote entram como nulas. Distintos só somam em chaves primárias; nas demais colunas
+        fica o maior dos dois valores (piso) até o próximo analyze_table."""
+        current = self.get_table_stats(table_name)
+        if current is None:
+            return
+        metadata = self.get_table_metadata(table_name)
+        types = {col: metadata.get(col, {}).get("data_type") or "VARCHAR" for col in columns}
+        empty = {"null_count": 0, "distinct_estimate": 0, "min_value": None, "max_value": None}
+        bounds = [
+            value for col, data_type in types.items() if self._orderable(data_type)
+            for value in (current["columns"].get(col, empty)["min_value"], current["columns"].get(col, empty)["max_value"])
+        ]
+        row = self.conn.execute(self._stats_select(types, source, merge_bounds=True), bounds + list(params)).fetchone()
+        added = row[0]
+        if not added:
+            return
+
+        primary_keys = [col for col, info in metadata.items() if info.get("primary_key")]
+        merged = {}
+        for col, info in current["columns"].items():
+            merged[col] = (info["null_count"] + added, info["distinct_estimate"], info["min_value"], info["max_value"])
+        for i, col in enumerate(types):
+            nulls, distinct, min_value, max_value = row[1 + 4 * i: 5 + 4 * i]
+            old = current["columns"].get(col, empty)
+            null_count = old["null_count"] + nulls
+            non_null = current["row_count"] + added - null_count
+            distinct = non_null if primary_keys == [col] else min(max(old["distinct_estimate"], distinct), non_null)
+            if not self._orderable(types[col]):
+                min_value, max_value = old["min_value"], old["max_value"]
+            merged[col] = (null_count, distinct, min_value, max_value)
+        self._write_stats(table_name, current["row_count"] + added, merged, current["columns_stale"],
+                          current["analyzed_at"])
+
+    def _fold_row_stats(self, table_name: str, metadata: dict, row):
+        """insert_data: soma uma linha ao perfil das colunas com um único UPDATE, sem ler a tabela nem o catálogo.
+        Nulos e min/max ficam exatos; distintos seguem a regra de _merge_stats (somam só na chave primária única)."""
+        values = dict(zip(metadata, row))
+        primary_keys = [col for col, info in metadata.items() if info.get("primary_key")]
+        null_columns = [col for col, value in values.items() if value is None]
+        filled_columns = [col for col, value in values.items() if value is not None]
+        unique_key = primary_keys[0] if len(primary_keys) == 1 and values.get(primary_keys[0]) is not None else None
+        min_cases, max_cases, bound_params = [], [], []
+        for col in filled_columns:
+            data_type = metadata[col].get("data_type") or "VARCHAR"
+            if self._orderable(data_type):
+                # LEAST/GREATEST ignoram o NULL de uma coluna ainda sem valores
+                new_value = f"CAST(? AS {data_type})"
+                min_cases.append(f"WHEN ? THEN CAST(LEAST(TRY_CAST(min_value AS {data_type}), {new_value}) AS VARCHAR)")
+                max_cases.append(f"WHEN ? THEN CAST(GREATEST(TRY_CAST(max_value AS {data_type}), {new_value}) AS VARCHAR)")
+                bound_params += [col, values[col]]
+        min_sql = f"CASE column_name {' '.join(min_cases)} ELSE min_value END" if min_cases else "min_value"
+        max_sql = f"CASE column_name {' '.join(max_cases)} ELSE max_value END" if max_cases else "max_value"
+        self.conn.execute(
+            f"""
+            UPDATE column_stats SET
+                null_count = null_count + CASE WHEN column_name IN (SELECT UNNEST(?)) THEN 1 ELSE 0 END,
+                distinct_estimate = CASE
+                    WHEN column_name = ? THEN distinct_estimate + 1
+                    WHEN column_name IN (SELECT UNNEST(?)) THEN GREATEST(distinct_estimate, 1)
+                    ELSE distinct_estimate END,
+                min_value = {min_sql},
+                max_value = {max_sql}
+            WHERE table_name = ?;
+            """,
+            (null_columns, unique_key, filled_columns, *bound_params, *bound_params, table_name)
+        )
+
+    def _adjust_stats(self, table_name: str, row_delta: int = 0, columns_stale: bool = True):
+        """UPDATE e DELETE: a contagem continua exata, mas nulos, distintos e min/max ficam desatualizados
+        (columns_stale) até o próximo analyze_table."""
+        self.conn.execute(
+            "UPDATE table_stats SET row_count = row_count + ?, columns_stale = columns_stale OR ?, "
+            "updated_at = CURRENT_TIMESTAMP WHERE table_name = ?;",
+            (row_delta, columns_stale, table_name)
+        )
+
+    def get_table_stats(self, table_name: str):
+        """Estatísticas do catálogo (sem ler a tabela) ou None se a tabela nunca foi analisada.
+        Nunca varre a tabela: com columns_stale, o perfil só é recalculado por analyze_table."""
+        row = self.conn.execute(
+            "SELECT row_count, columns_stale, analyzed_at, updated_at FROM table_stats WHERE table_name = ?;",
+            (table_name,)
+        ).fetchone()
+        if row is None:
+            return None
+        columns = {
+            col: {"null_count": nulls, "distinct_estimate": distinct, "min_value": min_value, "max_value": max_value}
+            for col, nulls, distinct, min_value, max_value in self.conn.execute(
+                "SELECT column_name, null_count, distinct_estimate, min_value, max_value "
+                "FROM column_stats WHERE table_name = ?;",
+                (table_name,)
+            ).fetchall()
+        }
+        return {"row_count": row[0], "columns_stale": row[1], "analyzed_at": row[2], "updated_at": row[3],
+                "columns": columns}
+
+    def list_table_stats(self):
+        """Uma linha por tabela da pipeline com linhas e colunas do catálogo; row_count nulo = nunca analisada."""
+        return self.conn.execute("""
+            SELECT m.table_name, s.row_count, COUNT(c.column_name) AS column_count,
+                   s.columns_stale, s.analyzed_at, s.updated_at
+            FROM table_metadata m
+            LEFT JOIN table_stats s USING (table_name)
+            LEFT JOIN column_stats c USING (table_name)
+            GROUP BY ALL
+            ORDER BY s.row_count DESC NULLS LAST, m.table_name;
+        """).fetchdf()
+
+    def analyze_table(self, table_name: str):
+        """Recalcula as estatísticas com uma varredura completa, para dados alterados fora da pipeline."""
+        types = dict(self.get_table_schema(table_name))
+        primary_keys = [col for col, info in self.get_table_metadata(table_name).items() if info.get("primary_key")]
+        row = self.conn.execute(self._stats_select(types, table_name)).fetchone()
+        columns = {}
+        for i, col in enumerate(types):
+            nulls, distinct, min_value, max_value = row[1 + 4 * i: 5 + 4 * i]
+            # O HLL erra alguns por cento; chave primária única é exata e nada passa do total de não nulos
+            non_null = row[0] - nulls
+            columns[col] = (nulls, non_null if primary_keys == [col] else min(distinct, non_null), min_value, max_value)
+        analyzed_at = self.conn.execute("SELECT CAST(CURRENT_TIMESTAMP AS TIMESTAMP);").fetchone()[0]
+        self._write_stats(table_name, row[0], columns, False, analyzed_at)
+        self._touch_table(table_name)
+        return self.get_table_stats(table_name)
+
+    def analyze(self, table_names=None):
+        """analyze_table para as tabelas indicadas ou para todas as da pipeline."""
+        return {table_name: self.analyze_table(table_name) for table_name in table_names or self.list_tables()}
+
+    def list_tables(self):
+        return list(self._metadata_cache)
+
+    def get_table_data(self, table_name: str):
+        return self.conn.execute(f"SELECT * FROM {table_name};").fetchdf()
+
+    def get_table_schema(self, table_name: str):
+        """Lista (coluna, tipo) direto do catálogo do DuckDB, sem ler dados."""
+        return [(row[0], row[1]) for row in self.conn.execute(f"DESCRIBE {table_name};").fetchall()]
+
+    def _filter_sql(self, table_name: str, filters):
+        """Monta o WHERE a partir de (coluna, operador, valor), validando colunas e operadores."""
+        if not filters:
+            return "", []
+        types = dict(self.get_table_schema(table_name))
+        conditions, params = [], []
+        for column, operator, value in filters:
+            if column not in types:
+                raise ValueError(f"Coluna inexistente em '{table_name}': {column}")
+            if operator not in FILTER_OPERATORS:
+                raise ValueError(f"Operador de filtro inválido: {operator}")
+            if operator == "contém":
+                conditions.append(f"CAST({column} AS VARCHAR) ILIKE ?")
+                params.append(f"%{value}%")
+            else:
+                conditions.append(f"{column} {operator} CAST(? AS {types[column]})")
+                params.append(value)
+        return " WHERE " + " AND ".join(conditions), params
+
+    def count_rows(self, table_name: str, filters=None):
+        """Sem filtros, a contagem vem de table_stats; COUNT(*) só para filtros ou tabelas nunca analisadas."""
+        if not filters:
+            row = self.conn.execute("SELECT row_count FROM table_stats WHERE table_name = ?;", (table_name,)).fetchone()
+            if row:
+                return row[0]
+        where, params = self._filter_sql(table_name, filters)
+        return self.conn.execute(f"SELECT COUNT(*) FROM {table_name}{where};", params).fetchone()[0]
+
+    def get_table_page(self, table_name: str, page_size: int = 100, sort_column: str = None,
+                       descending: bool = False, filters=None, after=None):
+        """Página por keyset: 'after' é o cursor (valor de ordenação, rowid) da última linha da página anterior.
+        Filtros e ordenação rodam no DuckDB e só page_size linhas chegam ao pandas.
+        Retorna o DataFrame da página e o cursor da próxima (None na última página)."""
+        import pandas as pd
+
+        where, params = self._filter_sql(table_name, filters)
+        conditions = [where[len(" WHERE "):]] if where else []
+
+        if sort_column:
+            if sort_column not in dict(self.get_table_schema(table_name)):
+                raise ValueError(f"Coluna inexistente em '{table_name}': {sort_column}")
+            comparison = "<" if descending else ">"
+            order_by = f"{sort_column} {'DESC' if descending else 'ASC'} NULLS LAST, rowid"
+            if after is not None:
+                last_value, last_rowid = after
+                if last_value is None:
+                    conditions.append(f"({sort_column} IS NULL AND rowid > ?)")
+                    params.append(last_rowid)
+                else:
+                    # NULLs ficam no fim em qualquer direção
+                    conditions.append(
+                        f"({sort_column} {comparison} ? OR ({sort_column} = ? AND rowid > ?) OR {sort_column} IS NULL)"
+                    )
+                    params.extend([last_value, last_value, last_rowid])
+        else:
+            order_by = "rowid"
+            if after is not None:
+                conditions.append("rowid > ?")
+                params.append(after[1])
+
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+        df = self.conn.execute(
+            f"SELECT *, rowid AS __rowid FROM {table_name}{where} ORDER BY {order_by} LIMIT {int(page_size)};",
+            params
+        ).fetchdf()
+
+        next_cursor = None
+        if len(df) == page_size:
+            last = df.iloc[-1]
+            last_value = last[sort_column] if sort_column else None
+            if last_value is not None and pd.isna(last_value):
+                last_value = None
+            elif isinstance(last_value, pd.Timestamp):
+                last_value = last_value.to_pydatetime()
+            elif hasattr(last_value, "item"):
+                last_value = last_value.item()  # escalar numpy -> Python, aceito como parâmetro pelo DuckDB
+            next_cursor = (last_value, int(last["__rowid"]))
+        return df.drop(columns="__rowid"), next_cursor
+
+    def sample_table(self, table_name: str, size: int, columns=None):
+        """Amostra aleatória limitada (reservoir) para gráficos, sem trazer a tabela inteira."""
+        column_list = ", ".join(columns) if columns else "*"
+        return self.conn.execute(
+            f"SELECT {column_list} FROM {table_name} USING SAMPLE {int(size)} ROWS;"
+        ).fetchdf()
+
+    def aggregate_for_chart(self, table_name: str, chart_type: str, x: str, y: str = None,
+                            aggregation: str = "count", bins: int = 50):
+        """Reduz a tabela no DuckDB ao que o gráfico precisa (no máximo alguns milhares de pontos):
+        agregação por grupo, histograma, bins 2D ou série com min/max por bucket (downsampling)."""
+        types = {col: dtype.upper() for col, dtype in self.get_table_schema(table_name)}
+        for column in (x, y):
+            if column is not None and column not in types:
+                raise ValueError(f"Coluna inexistente em '{table_name}': {column}")
+        if aggregation not in CHART_AGGREGATIONS:
+            raise ValueError(f"Agregação inválida: {aggregation}")
+        bins = max(1, int(bins))
+
+        def numeric(column):
+            # Datas viram segundos desde a época para poder calcular faixas
+            if types[column].startswith(TEMPORAL_TYPE_PREFIXES):
+                return f"epoch(CAST({column} AS TIMESTAMP))"
+            return f"CAST({column} AS DOUBLE)"
+
+        def restore(expression, column):
+            # Devolve limites de bins de colunas temporais como timestamp para o eixo do gráfico
+            if types[column].startswith(TEMPORAL_TYPE_PREFIXES):
+                return f"to_timestamp({expression})"
+            return expression
+
+        if chart_type == "Barras":
+            value = "COUNT(*)" if aggregation == "count" or y is None else f"{aggregation.upper()}({y})"
+            return self.conn.execute(f"""
+                SELECT {x}, {value} AS valor
+                FROM {table_name}
+                GROUP BY {x}
+                ORDER BY valor DESC NULLS LAST
+                LIMIT {bins};
+            """).fetchdf()
+
+        if chart_type == "Histograma":
+            return self.conn.execute(f"""
+                WITH data AS (SELECT {numeric(x)} AS v FROM {table_name} WHERE {x} IS NOT NULL),
+                bounds AS (SELECT MIN(v) AS lo, (MAX(v) - MIN(v)) / {bins} AS width FROM data)
+                SELECT {restore("lo + bin * width", x)} AS inicio, {restore("lo + (bin + 1) * width", x)} AS fim,
+                       quantidade
+                FROM (
+                    SELECT LEAST(COALESCE(CAST(floor((v - lo) / NULLIF(width, 0)) AS BIGINT), 0), {bins - 1}) AS bin,
+                           COUNT(*) AS quantidade
+                    FROM data, bounds
+                    GROUP BY bin
+                ), bounds
+                ORDER BY bin;
+            """).fetchdf()
+
+        if chart_type == "Dispersão (bins 2D)":
+            if y is None:
+                raise ValueError("O gráfico de bins 2D precisa das colunas X e Y.")
+            return self.conn.execute(f"""
+                WITH data AS (
+                    SELECT {numeric(x)} AS vx, {numeric(y)} AS vy
+                    FROM {table_name} WHERE {x} IS NOT NULL AND {y} IS NOT NULL
+                ),
+                bounds AS (
+                    SELECT MIN(vx) AS lx, (MAX(vx) - MIN(vx)) / {bins} AS wx,
+                           MIN(vy) AS ly, (MAX(vy) - MIN(vy)) / {bins} AS wy
+                    FROM data
+                )
+                SELECT {restore("lx + (bin_x + 0.5) * COALESCE(wx, 0)", x)} AS {x},
+                       {restore("ly + (bin_y + 0.5) * COALESCE(wy, 0)", y)} AS {y},
+                       quantidade
+                FROM (
+                    SELECT LEAST(COALESCE(CAST(floor((vx - lx) / NULLIF(wx, 0)) AS BIGINT), 0), {bins - 1}) AS bin_x,
+                           LEAST(COALESCE(CAST(floor((vy - ly) / NULLIF(wy, 0)) AS BIGINT), 0), {bins - 1}) AS bin_y,
+                           COUNT(*) AS quantidade
+                    FROM data, bounds
+                    GROUP BY bin_x, bin_y
+                ), bounds;
+            """).fetchdf()
+
+        if chart_type == "Linha (min/max)":
+            if y is None:
+                raise ValueError("O gráfico de linha precisa das colunas X e Y.")
+            # Por bucket de X guarda o ponto de menor e o de maior Y: preserva picos com 2 pontos por bucket
+            return self.conn.execute(f"""
+                WITH data AS (
+                    SELECT {x} AS x, {numeric(x)} AS vx, {y} AS y
+                    FROM {table_name} WHERE {x} IS NOT NULL AND {y} IS NOT NULL
+                ),
+                bounds AS (SELECT MIN(vx) AS lo, (MAX(vx) - MIN(vx)) / {bins} AS width FROM data),
+                buckets AS (
+                    SELECT LEAST(COALESCE(CAST(floor((vx - lo) / NULLIF(width, 0)) AS BIGINT), 0), {bins - 1}) AS bucket,
+                           arg_min(x, y) AS x_min, MIN(y) AS y_min,
+                           arg_max(x, y) AS x_max, MAX(y) AS y_max
+                    FROM data, bounds
+                    GROUP BY bucket
+                )
+                SELECT {x}, {y} FROM (
+                    SELECT x_min AS {x}, y_min AS {y} FROM buckets
+                    UNION
+                    SELECT x_max AS {x}, y_max AS {y} FROM buckets
+                )
+                ORDER BY {x};
+            """).fetchdf()
+
+        raise ValueError(f"Tipo de gráfico inválido: {chart_type}")
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,2 @@
+# Compatibilidade: a DuckDBPipeline agora faz parte do pacote datalk (datalk.pipeline)
+from datalk.pipeline import *  # noqa: F401,F403
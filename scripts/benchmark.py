@@ -0,0 +1,10 @@
+import sys
+from pathlib import Path
+
+# Compatibilidade com agendamentos antigos: equivale a "python -m datalk bench"
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from datalk.cli import main
+
+if __name__ == "__main__":
+    sys.exit(main(["bench", *sys.argv[1:]]))
@@ -0,0 +1,132 @@
+import re
+import time
+
+import duckdb
+import psycopg2
+import pytest
+
+from datalk import loader
+from datalk.config import Configuracao
+
+
+# Destinos Postgres simulados com DuckDB em memória: um banco por db_name, com transação própria por conexão.
+# falha(banco, tabela, linhas) decide se uma escrita de dados falha; atraso[banco] atrasa cada COPY.
+class PostgresFalso:
+    def __init__(self):
+        self.bancos = {}
+        self.atraso = {}
+        self.falha = None
+
+    def consultar(self, banco, sql):
+        return self.bancos[banco].execute(sql).fetchall()
+
+    def _verificar(self, banco, tabela, linhas):
+        if self.falha and linhas and self.falha(banco, tabela, linhas):
+            raise psycopg2.Error("falha simulada")
+
+
+class _Cursor:
+    query = None
+
+    def __init__(self, conexao):
+        self.conexao = conexao
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *erro):
+        pass
+
+    def execute(self, query, params=None):
+        if query.strip().startswith(("SAVEPOINT", "RELEASE", "ROLLBACK TO")):
+            return
+        query = query.replace("%s", "?").replace("'public'", "'main'").replace("NOT NULL DEFAULT", "DEFAULT")
+        query = re.sub(r"to_regclass\('(\w+)'\)", r"(SELECT MAX(1) FROM duckdb_tables() WHERE table_name = '\1')", query)
+        self.conexao.iniciar().execute(query, list(params or []))
+
+    def fetchone(self):
+        return self.conexao.duck.fetchone()
+
+    def fetchall(self):
+        return self.conexao.duck.fetchall()
+
+    def copy_expert(self, query, buffer):
+        tabela, colunas = re.match(r"COPY (\w+) \((.*)\) FROM STDIN", query).groups()
+        linhas = [[None if v == "\\N" else v for v in linha.split("\t")] for linha in buffer.read().splitlines()]
+        self.conexao.falso._verificar(self.conexao.banco, tabela, linhas)
+        time.sleep(self.conexao.falso.atraso.get(self.conexao.banco, 0))
+        self.inserir(tabela, colunas, linhas)
+
+    def inserir(self, tabela, colunas, linhas):
+        marcadores = ", ".join("?" * len(linhas[0]))
+        self.conexao.iniciar().executemany(f"INSERT INTO {tabela} ({colunas}) VALUES ({marcadores})", linhas)
+
+
+class _Conexao:
+    closed = False
+
+    def __init__(self, falso, banco):
+        self.falso, self.banco = falso, banco
+        self.duck = falso.bancos[banco].cursor()
+        self.em_transacao = False
+
+    def iniciar(self):
+        if not self.em_transacao:
+            self.duck.begin()
+            self.em_transacao = True
+        return self.duck
+
+    def cursor(self):
+        return _Cursor(self)
+
+    def commit(self):
+        if self.em_transacao:
+            self.duck.commit()
+            self.em_transacao = False
+
+    def rollback(self):
+        if self.em_transacao:
+            self.duck.rollback()
+            self.em_transacao = False
+
+
+@pytest.fixture
+def postgres(monkeypatch):
+    falso = PostgresFalso()
+
+    class Pool:
+        def __init__(self, minimo, maximo, **parametros):
+            self.banco = parametros["database"]
+            falso.bancos.setdefault(self.banco, duckdb.connect())
+
+        def getconn(self):
+            return _Conexao(falso, self.banco)
+
+        def putconn(self, conn, close=False):
+            conn.rollback()
+
+        def closeall(self):
+            pass
+
+    def execute_values(cursor, query, linhas, page_size=None):
+        tabela, colunas = re.match(r"INSERT INTO (\w+) \((.*)\) VALUES %s", query).groups()
+        falso._verificar(cursor.conexao.banco, tabela, linhas)
+        cursor.inserir(tabela, colunas, [list(linha) for linha in linhas])
+
+    monkeypatch.setattr(loader.pool, "ThreadedConnectionPool", Pool)
+    monkeypatch.setattr(loader.extras, "execute_values", execute_values)
+    yield falso
+    loader.fechar_conexoes()
+    for banco in falso.bancos.values():
+        banco.close()
+
+
+# Configuração de um destino simulado que lê o DuckDB em caminho
+@pytest.fixture
+def config_destino():
+    def criar(caminho, banco="pg", **valores):
+        return Configuracao(
+            duckdb_path=str(caminho), supabase_url="x", supabase_key="x", db_host="h", db_name=banco,
+            db_user="u", db_password="p", **valores,
+        )
+    return criar
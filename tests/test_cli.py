@@ -0,0 +1,36 @@
+import duckdb
+
+from datalk.cli import criar_parser, main
+from datalk.config import Configuracao
+
+
+def test_env_file_antes_e_depois_do_subcomando_somam_destinos():
+    args = criar_parser().parse_args(["--env-file", "a.env", "sync", "--env-file", "b.env"])
+    assert (args.env_file, args.env_file_comando) == (["a.env"], ["b.env"])
+
+
+def test_env_file_explicito_vale_sobre_o_ambiente(tmp_path, monkeypatch):
+    arquivo = tmp_path / "destino.env"
+    arquivo.write_text("DB_NAME=staging\n")
+    monkeypatch.setenv("DB_NAME", "producao")
+    monkeypatch.setenv("DB_HOST", "servidor")
+    config = Configuracao.do_ambiente(str(arquivo))
+    assert (config.db_name, config.db_host) == ("staging", "servidor")
+
+
+def test_env_padrao_nao_vale_sobre_o_ambiente(tmp_path, monkeypatch):
+    (tmp_path / ".env").write_text("DB_NAME=staging\n")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("DB_NAME", "producao")
+    assert Configuracao.do_ambiente().db_name == "producao"
+
+
+def test_export_com_falhas_sai_com_erro(tmp_path, monkeypatch):
+    caminho = tmp_path / "base.duckdb"
+    conn = duckdb.connect(str(caminho))
+    conn.execute("CREATE TABLE vendas AS SELECT 1 AS id")
+    conn.close()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("DUCKDB_PATH", str(caminho))
+    assert main(["export", "vendas"]) == 0
+    assert main(["export", "vendas", "inexistente"]) == 1
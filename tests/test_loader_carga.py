@@ -0,0 +1,37 @@
+import logging
+
+import duckdb
+
+from datalk import loader
+
+
+def _origem(tmp_path, linhas):
+    caminho = tmp_path / "origem.duckdb"
+    conn = duckdb.connect(str(caminho))
+    conn.execute(f"CREATE TABLE t AS SELECT i AS id, 'x' || i AS nome FROM range({linhas}) r(i)")
+    conn.close()
+    return caminho
+
+
+def test_primeira_carga_interrompida_retoma_as_faixas_abaixo_do_limiar(postgres, config_destino, tmp_path, caplog):
+    caminho = _origem(tmp_path, 3000)
+    postgres.falha = lambda banco, tabela, linhas: tabela == "t" and int(linhas[0][0]) >= 2000
+    config = config_destino(caminho, batch_size=500, limiar_particao=1000, particoes=3)
+    assert loader.main(config=config) == ["t"]
+    assert postgres.consultar("pg", "SELECT COUNT(*) FROM controle_particoes WHERE concluida_em IS NULL") == [(1,)]
+    with caplog.at_level(logging.INFO, logger=loader.logger.name):
+        loader.exibir_status()
+    assert "t: carregando, 0 linhas gravadas" in caplog.text and "faixas pendentes 1/3" in caplog.text
+
+    # Sem particionar (limiar acima da tabela), a retomada ainda parte das faixas gravadas
+    postgres.falha = None
+    assert loader.main(config=config_destino(caminho, batch_size=500)) == []
+    assert postgres.consultar("pg", "SELECT COUNT(*), COUNT(DISTINCT id) FROM t") == [(3000, 3000)]
+    assert postgres.consultar("pg", "SELECT linhas_carregadas, status FROM controle_cargas") == [(3000, "concluida")]
+
+
+def test_status_nao_escreve_no_destino(postgres, config_destino, tmp_path, caplog):
+    with caplog.at_level(logging.INFO, logger=loader.logger.name):
+        loader.exibir_status(config=config_destino(_origem(tmp_path, 10)))
+    assert "Nenhuma carga registrada" in caplog.text
+    assert postgres.consultar("pg", "SELECT COUNT(*) FROM duckdb_tables()") == [(0,)]
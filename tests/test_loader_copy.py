@@ -0,0 +1,94 @@
+from datetime import date, datetime
+
+import psycopg2
+import pytest
+
+from datalk import loader
+from datalk.config import Configuracao
+from datalk.metricas import METRICAS
+
+
+class CursorFalso:
+    query = None
+
+    def __init__(self, falhar_copy=False):
+        self.falhar_copy = falhar_copy
+        self.comandos = []
+        self.copiado = []
+
+    def execute(self, query, params=None):
+        self.comandos.append(query)
+
+    def copy_expert(self, query, buffer):
+        if self.falhar_copy:
+            raise psycopg2.Error("COPY indisponível")
+        self.copiado.append((query, buffer.read()))
+
+
+@pytest.fixture
+def config(monkeypatch):
+    config = Configuracao(fila_lotes=0)
+    monkeypatch.setattr(loader, "_config", config)
+    METRICAS.reiniciar()
+    return config
+
+
+def _bytes_enviados():
+    return {t["tabela"]: t["contadores"].get("bytes_enviados") for t in METRICAS.tabelas()}
+
+
+def _texto_copy(lote):
+    cursor = CursorFalso()
+    loader._copiar(cursor, "COPY t FROM STDIN", "t", lote)
+    return cursor.copiado[0][1]
+
+
+def test_escapes_do_formato_texto():
+    lote = [("a\tb", "linha\nnova", "barra\\", None, "cr\r")]
+    assert _texto_copy(lote) == "a\\tb\tlinha\\nnova\tbarra\\\\\t\\N\tcr\\r\n"
+
+
+def test_bytea_booleano_e_datas():
+    lote = [(b"\x00\xff", True, date(2024, 1, 2), datetime(2024, 1, 2, 3, 4, 5))]
+    assert _texto_copy(lote) == "\\\\x00ff\tt\t2024-01-02\t2024-01-02 03:04:05\n"
+
+
+def test_arrays_com_nulos_aspas_e_aninhados():
+    lote = [([1, None, 3], ['a"b', "c\\d"], [[1, 2], [3, 4]])]
+    assert _texto_copy(lote) == '{"1",NULL,"3"}\t{"a\\\\"b","c\\\\\\\\d"}\t{{"1","2"},{"3","4"}}\n'
+
+
+def test_lote_serializado_reaproveita_o_texto():
+    lote = loader._serializar([(1, "x")])
+    assert _texto_copy(lote) == "1\tx\n"
+
+
+def test_copy_indisponivel_cai_para_insert(config, monkeypatch):
+    inseridos = []
+
+    def execute_values(cursor, query, lote, page_size=None):
+        inseridos.append((query, lote))
+        cursor.query = b"INSERT ..."
+
+    monkeypatch.setattr(loader.extras, "execute_values", execute_values)
+    cursor = CursorFalso(falhar_copy=True)
+    total = loader._escrever_lotes(cursor, "t", ["a", "b"], iter([[(1, "x")], [(2, "y"), (3, "z")]]))
+    assert total == 3
+    assert cursor.comandos == ["SAVEPOINT copy_lote", "ROLLBACK TO SAVEPOINT copy_lote"]
+    assert inseridos == [
+        ("INSERT INTO t (a, b) VALUES %s", [(1, "x")]),
+        ("INSERT INTO t (a, b) VALUES %s", [(2, "y"), (3, "z")]),
+    ]
+    assert _bytes_enviados() == {"t": 20}
+
+
+def test_copy_verificado_no_primeiro_lote(config):
+    cursor = CursorFalso()
+    assert loader._escrever_lotes(cursor, "t", ["a"], iter([[(1,)], [(2,)]])) == 2
+    assert cursor.comandos == ["SAVEPOINT copy_lote", "RELEASE SAVEPOINT copy_lote"]
+    assert [texto for _, texto in cursor.copiado] == ["1\n", "2\n"]
+
+
+def test_bytes_do_copy_contam_a_codificacao(config):
+    loader._escrever_lotes(CursorFalso(), "t", ["a"], iter([[("ção",)], loader._serializar([("é",)])]))
+    assert _bytes_enviados() == {"t": 6 + 3}
@@ -0,0 +1,48 @@
+from decimal import Decimal
+
+import duckdb
+import pytest
+
+from datalk.loader import _hash_linha_sql, _texto_hash
+
+
+# Modelo do lado Postgres: float8 -> numeric usa "%.15g" (float4: "%.6g") e
+# to_char(numeric, '9.999...EEEE') escreve a notação científica desse numeric (numeric não tem -0)
+def _texto_postgres(valor, digitos):
+    numero = Decimal(f"%.{digitos + 1}g" % valor) + 0
+    return f"%.{digitos}e" % numero
+
+
+@pytest.mark.parametrize("valor", [1.0, 0.1, 1e15, 1e16, 123456789.125, 1 / 3, -2.5, -0.0, 1e-7])
+def test_double_tem_o_mesmo_texto_nos_dois_lados(valor):
+    expressao = _texto_hash("v", "DOUBLE", postgres=False)
+    texto = duckdb.sql(f"SELECT {expressao} FROM (SELECT CAST(? AS DOUBLE) AS v)", params=[valor]).fetchone()[0]
+    assert texto == _texto_postgres(valor, 14)
+
+
+def test_real_usa_seis_digitos():
+    expressao = _texto_hash("v", "FLOAT", postgres=False)
+    texto = duckdb.sql(f"SELECT {expressao} FROM (SELECT CAST(0.1 AS REAL) AS v)").fetchone()[0]
+    assert texto == "1.00000e-01"
+
+
+def test_float_integral_nao_muda_o_hash():
+    # 1.0 e 1 (como o Postgres devolve o float8) precisam dar o mesmo hash de linha
+    conn = duckdb.connect()
+    conn.execute("CREATE TABLE t (id INTEGER, valor DOUBLE, criado TIMESTAMP)")
+    conn.execute("INSERT INTO t VALUES (1, 1.0, TIMESTAMP '2024-01-02 03:04:05'), (2, NULL, NULL)")
+    schema = conn.execute("DESCRIBE t").fetchall()
+    hashes = dict(conn.execute(f"SELECT id, {_hash_linha_sql(schema, False)} FROM t").fetchall())
+    esperado = {
+        1: duckdb.sql("SELECT md5(?)", params=["1\x1f1.00000000000000e+00\x1f2024-01-02 03:04:05.000000"]).fetchone()[0],
+        2: duckdb.sql("SELECT md5(?)", params=["2\x1f\\N\x1f\\N"]).fetchone()[0],
+    }
+    assert hashes == esperado
+
+
+def test_expressoes_postgres():
+    assert _texto_hash("v", "DOUBLE", postgres=True) == "ltrim(to_char(v::numeric, '9.99999999999999EEEE'))"
+    assert _texto_hash("c", "TIMESTAMP WITH TIME ZONE", postgres=True) == (
+        "to_char((c AT TIME ZONE 'UTC'), 'YYYY-MM-DD HH24:MI:SS.US')"
+    )
+    assert _texto_hash("n", "INTEGER", postgres=True) == "CAST(n AS TEXT)"
@@ -0,0 +1,145 @@
+import itertools
+import logging
+import threading
+import time
+
+import duckdb
+import psycopg2
+import pytest
+
+from datalk import loader
+from datalk.config import Configuracao
+
+
+@pytest.fixture
+def config(monkeypatch):
+    config = Configuracao(fila_lotes=2)
+    monkeypatch.setattr(loader, "_config", config)
+    return config
+
+
+def _leitores():
+    return [t for t in threading.enumerate() if t.name.startswith("leitor-")]
+
+
+class Origem:
+    """Lotes sem fim (ou com erro no lote 'falhar'), registrando quantos foram lidos e se a leitura foi fechada."""
+
+    def __init__(self, falhar=None):
+        self.lidos = 0
+        self.fechada = False
+        self.falhar = falhar
+
+    def __iter__(self):
+        try:
+            for indice in itertools.count():
+                if indice == self.falhar:
+                    raise RuntimeError("falha na leitura")
+                self.lidos += 1
+                yield [(indice,)]
+        finally:
+            self.fechada = True
+
+
+class CursorQueFalha:
+    query = None
+
+    def __init__(self, falhar_no_copy):
+        self.copias = 0
+        self.falhar_no_copy = falhar_no_copy
+
+    def execute(self, query, params=None):
+        pass
+
+    def copy_expert(self, query, buffer):
+        self.copias += 1
+        if self.copias == self.falhar_no_copy:
+            raise psycopg2.Error("falha na escrita")
+
+
+def test_erro_do_leitor_chega_ao_escritor(config):
+    origem = Origem(falhar=3)
+    lotes = []
+    with pytest.raises(RuntimeError, match="falha na leitura"):
+        for lote in loader._sobrepor_leitura(iter(origem), "t", False):
+            lotes.append(lote)
+    assert lotes == [[(0,)], [(1,)], [(2,)]]
+    assert origem.fechada and not _leitores()
+
+
+def test_erro_do_escritor_encerra_o_leitor(config):
+    origem = Origem()
+    cursor = CursorQueFalha(falhar_no_copy=3)
+    with pytest.raises(psycopg2.Error, match="falha na escrita"):
+        loader._escrever_lotes(cursor, "t", ["a"], iter(origem))
+    # O leitor para logo: além dos lotes escritos, no máximo a fila cheia e o lote que ele segurava
+    assert origem.fechada and not _leitores()
+    assert origem.lidos <= cursor.copias + config.fila_lotes + 1
+
+
+def test_erro_do_insert_tambem_encerra_o_leitor(config, monkeypatch):
+    def execute_values(cursor, query, lote, page_size=None):
+        raise psycopg2.Error("falha na escrita")
+
+    monkeypatch.setattr(loader.extras, "execute_values", execute_values)
+    config.usar_copy = False
+    origem = Origem()
+    with pytest.raises(psycopg2.Error):
+        loader._escrever_lotes(CursorQueFalha(None), "t", ["a"], iter(origem))
+    assert origem.fechada and not _leitores()
+
+
+# ===== Leitura compartilhada entre destinos =====
+def _origem(tmp_path, linhas):
+    caminho = tmp_path / "origem.duckdb"
+    conn = duckdb.connect(str(caminho))
+    conn.execute(f"CREATE TABLE t AS SELECT i AS id, 'x' || i AS nome FROM range({linhas}) r(i)")
+    conn.close()
+    return caminho
+
+
+def test_teto_de_memoria_e_repartido_entre_destinos(monkeypatch):
+    monkeypatch.setattr(loader, "_config", Configuracao(memoria_maxima_mb=64, batch_size=10**6))
+    schema = [("id", "BIGINT"), ("nome", "VARCHAR")]
+    monkeypatch.setattr(loader, "_destinos", ["a"])
+    um_destino = loader._tamanho_lote(schema)
+    monkeypatch.setattr(loader, "_destinos", ["a", "b"])
+    assert abs(loader._tamanho_lote(schema) - um_destino // 2) <= 1
+
+
+def _contagens(postgres, *bancos):
+    return [postgres.consultar(banco, "SELECT COUNT(*), COUNT(DISTINCT id) FROM t")[0] for banco in bancos]
+
+
+def test_destino_lento_e_desligado_e_recebe_cada_linha_uma_vez(postgres, config_destino, tmp_path, caplog):
+    caminho = _origem(tmp_path, 1500)
+    postgres.atraso["lento"] = 0.1
+    valores = dict(batch_size=100, fila_lotes=2, espera_destino_lento=0.1)
+    destinos = [config_destino(caminho, banco, **valores) for banco in ("rapido", "lento")]
+    with caplog.at_level(logging.WARNING, logger=loader.logger.name):
+        assert loader.main(config=destinos[0], destinos=destinos) == []
+    assert "desligado da leitura compartilhada" in caplog.text
+    assert _contagens(postgres, "rapido", "lento") == [(1500, 1500), (1500, 1500)]
+
+
+def test_destino_com_erro_nao_segura_o_outro(postgres, config_destino, tmp_path):
+    caminho = _origem(tmp_path, 3000)
+    postgres.falha = lambda banco, tabela, linhas: banco == "ruim" and tabela == "t"
+    # Espera longa: se o destino com erro ficasse na difusão, o outro pararia com a fila dele cheia
+    valores = dict(batch_size=100, fila_lotes=2, espera_destino_lento=30.0)
+    destinos = [config_destino(caminho, banco, **valores) for banco in ("bom", "ruim")]
+    inicio = time.monotonic()
+    assert loader.main(config=destinos[0], destinos=destinos) == ["h/ruim: t"]
+    assert time.monotonic() - inicio < 10
+    assert _contagens(postgres, "bom") == [(3000, 3000)]
+    assert postgres.consultar("ruim", "SELECT COUNT(*) FROM t") == [(0,)]
+
+
+def test_participante_ausente_nao_segura_a_leitura_depois_de_sair(postgres, config_destino, tmp_path):
+    loader.configurar(config_destino(_origem(tmp_path, 250), batch_size=100))
+    leitura = loader._LeituraCompartilhada(2)
+    threading.Timer(0.2, leitura.sair).start()
+    inicio = time.monotonic()
+    lotes = list(leitura.ler("SELECT id FROM t ORDER BY id", 100))
+    assert time.monotonic() - inicio < loader._ESPERA_ENCONTRO / 2
+    assert [len(lote) for lote in lotes] == [100, 100, 50]
@@ -0,0 +1,57 @@
+import duckdb
+import pytest
+
+from datalk import parquet_export
+from datalk.config import Configuracao
+
+
+@pytest.fixture
+def banco(tmp_path):
+    caminho = tmp_path / "teste.duckdb"
+    conn = duckdb.connect(str(caminho))
+    conn.execute("CREATE TABLE vendas (id INTEGER, regiao VARCHAR, valor DOUBLE)")
+    conn.execute("INSERT INTO vendas VALUES (1, 'sul', 10), (2, 'norte', 20), (3, NULL, 30)")
+    conn.close()
+    parquet_export.configurar(Configuracao(duckdb_path=str(caminho), particoes_parquet={"vendas": "regiao"}))
+    return caminho
+
+
+def _executar(caminho, sql):
+    conn = duckdb.connect(str(caminho))
+    conn.execute(sql)
+    conn.close()
+
+
+def _exportar():
+    parquet_export.main(["vendas"])
+    return parquet_export.carregar_manifesto()["tabelas"]["vendas"]
+
+
+def _lago():
+    padrao = (parquet_export.lago_path / "vendas" / "**" / "*.parquet").as_posix()
+    return sorted(duckdb.sql(f"SELECT id, valor FROM read_parquet('{padrao}')").fetchall())
+
+
+def test_particao_ja_exportada_recebe_as_linhas_novas(banco):
+    _exportar()
+    _executar(banco, "INSERT INTO vendas VALUES (4, 'sul', 40), (5, NULL, 50)")
+    estado = _exportar()
+    assert _lago() == [(1, 10.0), (2, 20.0), (3, 30.0), (4, 40.0), (5, 50.0)]
+    assert sum(a["linhas"] for a in estado["arquivos"]) == 5
+
+
+def test_particao_alterada_ou_removida_e_reescrita(banco):
+    _exportar()
+    _executar(banco, "UPDATE vendas SET valor = 11 WHERE id = 1")
+    _executar(banco, "DELETE FROM vendas WHERE regiao = 'norte'")
+    estado = _exportar()
+    assert _lago() == [(1, 11.0), (3, 30.0)]
+    assert sorted(a["particao"]["regiao"] for a in estado["arquivos"]) == ["__HIVE_DEFAULT_PARTITION__", "sul"]
+
+
+def test_sem_alteracoes_nao_reexporta(banco):
+    arquivos = _exportar()["arquivos"]
+    assert parquet_export.exportar_tabela(
+        duckdb.connect(str(banco), read_only=True), "vendas", parquet_export.carregar_manifesto(), "x"
+    ) == 0
+    assert _exportar()["arquivos"] == arquivos
@@ -0,0 +1,188 @@
+import os
+
+import duckdb
+import pandas as pd
+import pytest
+
+from datalk.pipeline import DuckDBPipeline
+
+
+@pytest.fixture
+def pipeline(tmp_path):
+    pipeline = DuckDBPipeline(str(tmp_path / "teste.duckdb"))
+    yield pipeline
+    pipeline.close()
+
+
+@pytest.fixture
+def clientes(pipeline):
+    pipeline.create_table_dynamic(
+        "clientes",
+        [{"name": "id", "data_type": "INTEGER", "primary_key": True}, {"name": "nome", "data_type": "VARCHAR"}],
+        use_sequences=True,
+    )
+    return pipeline
+
+
+def _ids(pipeline, tabela="clientes"):
+    return [row[0] for row in pipeline.conn.execute(f"SELECT id FROM {tabela} ORDER BY id;").fetchall()]
+
+
+def test_id_explicito_avanca_a_sequencia(clientes):
+    clientes.insert_data("clientes", {"id": "2", "nome": "b"})
+    clientes.insert_data("clientes", {"id": "", "nome": "c"})
+    clientes.insert_data("clientes", {"nome": "d"})
+    assert _ids(clientes) == [2, 3, 4]
+
+
+def test_id_explicito_no_lote_avanca_a_sequencia(clientes):
+    inserted, rejected = clientes.insert_many("clientes", [{"id": 5, "nome": "a"}, {"nome": "b"}, {"nome": "c"}])
+    assert (inserted, len(rejected)) == (3, 0)
+    clientes.insert_data("clientes", {"nome": "d"})
+    assert _ids(clientes) == [5, 6, 7, 8]
+
+
+def test_ingestao_com_ids_avanca_a_sequencia(clientes, tmp_path):
+    arquivo = tmp_path / "clientes.csv"
+    pd.DataFrame({"id": [10, 11], "nome": ["a", "b"]}).to_csv(arquivo, index=False)
+    clientes.ingest_files("clientes", str(arquivo))
+    clientes.insert_data("clientes", {"nome": "c"})
+    assert _ids(clientes) == [10, 11, 12]
+
+
+def test_id_explicito_muito_grande_nao_percorre_a_sequencia(pipeline):
+    pipeline.create_table_dynamic(
+        "eventos", [{"name": "id", "data_type": "BIGINT", "primary_key": True}], use_sequences=True
+    )
+    pipeline.insert_data("eventos", {"id": 10**12})
+    pipeline.insert_many("eventos", [{"id": 10**15}, {}])
+    pipeline.insert_data("eventos", {})
+    assert _ids(pipeline, "eventos") == [10**12, 10**15, 10**15 + 1, 10**15 + 2]
+
+
+def test_sequencia_como_default_de_banco_antigo_e_removida(tmp_path):
+    caminho = str(tmp_path / "antigo.duckdb")
+    pipeline = DuckDBPipeline(caminho)
+    pipeline.create_table_dynamic(
+        "clientes", [{"name": "id", "data_type": "INTEGER", "primary_key": True}], use_sequences=True
+    )
+    pipeline.conn.execute("DROP TABLE clientes;")
+    pipeline.conn.execute("CREATE TABLE clientes (id INTEGER PRIMARY KEY DEFAULT nextval('clientes_id_seq'));")
+    pipeline.close()
+
+    pipeline = DuckDBPipeline(caminho)
+    assert pipeline.conn.execute(
+        "SELECT column_default FROM duckdb_columns() WHERE table_name = 'clientes';"
+    ).fetchall() == [(None,)]
+    pipeline.insert_data("clientes", {"id": 7})
+    pipeline.insert_data("clientes", {})
+    assert _ids(pipeline) == [7, 8]
+    pipeline.close()
+
+
+def test_nome_de_tabela_invalido_e_rejeitado(pipeline):
+    for nome in ("../x", "a b", "1a", ""):
+        with pytest.raises(ValueError):
+            pipeline.create_table_dynamic(nome, [{"name": "id", "data_type": "INTEGER"}])
+    with pytest.raises(ValueError):
+        pipeline.create_table_dynamic("ok", [{"name": "x;drop", "data_type": "INTEGER"}])
+    assert pipeline.list_tables() == []
+
+
+def test_erro_do_duckdb_vira_value_error(clientes):
+    with pytest.raises(ValueError):
+        clientes.insert_data("clientes", {"id": "abc", "nome": "x"})
+
+
+def test_ingestao_que_falha_nao_deixa_tabela(pipeline, tmp_path):
+    arquivo = tmp_path / "ruim.csv"
+    arquivo.write_text("a,b\n1,x\n")
+    with pytest.raises(ValueError):
+        pipeline.ingest_files("ruim", str(arquivo), [{"name": "a", "data_type": "INTEGER"},
+                                                    {"name": "b", "data_type": "INTEGER"}])
+    assert pipeline.list_tables() == []
+    assert pipeline.get_table_metadata("ruim") == {}
+    assert pipeline.ingest_files("ruim", str(arquivo))["inserted"] == 1
+
+
+@pytest.fixture
+def produtos(pipeline):
+    pipeline.create_table_dynamic(
+        "produtos",
+        [{"name": "id", "data_type": "INTEGER", "primary_key": True},
+         {"name": "nome", "data_type": "VARCHAR"},
+         {"name": "preco", "data_type": "DOUBLE"}],
+    )
+    pipeline.insert_many("produtos", [{"id": 1, "nome": "a", "preco": 1.5}, {"id": 2, "nome": "b", "preco": 2.5}])
+    return pipeline
+
+
+def test_insert_many_rejeita_linhas_com_motivo(produtos):
+    inserted, rejected = produtos.insert_many("produtos", [
+        {"id": 3, "nome": "c", "preco": "3"},
+        {"id": 4, "nome": "d", "preco": "caro"},
+        {"id": 1, "nome": "e", "preco": 1},
+        {"id": 5, "nome": "f", "preco": 5},
+        {"id": 5, "nome": "g", "preco": 6},
+    ])
+    assert inserted == 2
+    assert list(zip(rejected["nome"], rejected["motivo"])) == [
+        ("d", "valor incompatível com o tipo da coluna"),
+        ("e", "chave primária já existe"),
+        ("g", "chave primária duplicada no lote"),
+    ]
+    assert _ids(produtos, "produtos") == [1, 2, 3, 5]
+
+
+def test_update_many_e_delete_many(produtos):
+    assert produtos.update_many("produtos", [{"id": 1, "preco": 9.0}, {"id": 7, "preco": 1.0}]) == 1
+    assert produtos.conn.execute("SELECT preco FROM produtos WHERE id = 1;").fetchone()[0] == 9.0
+    with pytest.raises(ValueError):
+        produtos.update_many("produtos", [{"id": 1, "preco": 1.0}, {"id": 1, "preco": 2.0}])
+    assert produtos.delete_many("produtos", [{"id": 2}, {"id": 8}]) == 1
+    assert _ids(produtos, "produtos") == [1]
+    assert produtos.get_table_stats("produtos")["row_count"] == 1
+
+
+def test_ledger_pula_arquivos_ja_importados(produtos, tmp_path):
+    pasta = tmp_path / "lotes"
+    pasta.mkdir()
+    pd.DataFrame({"id": [10, 11], "nome": ["x", "y"], "preco": [1.0, 2.0]}).to_csv(pasta / "a.csv", index=False)
+    assert produtos.ingest_files("produtos", str(pasta))["inserted"] == 2
+    pd.DataFrame({"id": [12], "nome": ["z"], "preco": [3.0]}).to_csv(pasta / "b.csv", index=False)
+    result = produtos.ingest_files("produtos", str(pasta))
+    assert (result["inserted"], [os.path.basename(path) for path in result["skipped"]]) == (1, ["a.csv"])
+    assert produtos.ingest_files("produtos", str(pasta))["inserted"] == 0
+
+
+def test_estatisticas_seguem_as_escritas(produtos):
+    stats = produtos.get_table_stats("produtos")
+    assert (stats["row_count"], stats["columns_stale"]) == (2, False)
+    assert (stats["columns"]["preco"]["min_value"], stats["columns"]["preco"]["max_value"]) == ("1.5", "2.5")
+
+    # Uma linha: contagem, nulos e min/max somados na mesma transação, sem varrer a tabela
+    produtos.insert_data("produtos", {"nome": "c", "preco": 7.0})
+    produtos.insert_data("produtos", {"id": 9})
+    stats = produtos.get_table_stats("produtos")
+    assert (stats["row_count"], stats["columns_stale"]) == (4, False)
+    assert (stats["columns"]["preco"]["max_value"], stats["columns"]["preco"]["null_count"]) == ("7.0", 1)
+    assert (stats["columns"]["id"]["max_value"], stats["columns"]["id"]["distinct_estimate"]) == ("9", 4)
+
+    # UPDATE/DELETE: só a contagem segue exata; o perfil fica marcado até um ANALYZE explícito
+    produtos.delete_data("produtos", "id = ?", (1,))
+    version = produtos.table_version("produtos")
+    stats = produtos.get_table_stats("produtos")
+    assert (stats["row_count"], stats["columns_stale"]) == (3, True)
+    assert produtos.table_version("produtos") == version
+    assert stats["columns"]["preco"]["min_value"] == "1.5"
+    stats = produtos.analyze_table("produtos")
+    assert (stats["columns_stale"], stats["columns"]["preco"]["min_value"]) == (False, "2.5")
+
+
+def test_escrita_que_falha_nao_altera_a_contagem(produtos):
+    with pytest.raises(ValueError):
+        produtos.insert_data("produtos", {"id": "x", "nome": "c"})
+    with pytest.raises(duckdb.Error):
+        produtos.delete_data("produtos", "coluna_inexistente = ?", (1,))
+    assert produtos.get_table_stats("produtos")["row_count"] == 2
+    assert produtos.count_rows("produtos") == 2